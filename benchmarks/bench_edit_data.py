@@ -0,0 +1,99 @@
+""" Benchmark of the index of the XML document opened for edition by the parser
+
+Usage: python -m benchmarks.bench_edit_data [nb_items] [nb_fields]
+"""
+import sys
+
+from benchmarks.utils import setup_django, best_time, BENCHMARK_NAMESPACE
+
+setup_django()
+
+from lxml import etree
+
+from xml_utils.commons.constants import LXML_SCHEMA_NAMESPACE, SCHEMA_NAMESPACE
+from xml_utils.xsd_tree.xsd_tree import XSDTree
+
+from core_parser_app.tools.parser import parser
+from core_parser_app.tools.parser.parser import XSDParser
+from core_parser_app.tools.parser.utils.edit_data import EditDataIndex
+
+
+class XPathEditDataIndex(EditDataIndex):
+    """ Evaluates every xpath with lxml (behavior before the index was introduced)
+    """
+
+    def __init__(self, xml_tree):
+        self.xml_tree = xml_tree
+
+    def xpath(self, xpath, namespaces=None):
+        return self.xml_tree.xpath(xpath, namespaces=namespaces)
+
+
+def generate_schema(nb_fields):
+    """ Generate a schema with a root element containing an unbounded item of nb_fields string fields
+
+    Args:
+        nb_fields:
+
+    Returns:
+
+    """
+    fields = ''.join(['<xs:element name="field{0}" type="xs:string"/>'.format(index) for index in range(nb_fields)])
+
+    return '<xs:schema xmlns:xs="{0}" xmlns:bm="{1}" targetNamespace="{1}" elementFormDefault="qualified">' \
+           '<xs:element name="root"><xs:complexType><xs:sequence>' \
+           '<xs:element name="item" maxOccurs="unbounded"><xs:complexType><xs:sequence>{2}</xs:sequence>' \
+           '<xs:attribute name="id" type="xs:string"/></xs:complexType></xs:element>' \
+           '</xs:sequence></xs:complexType></xs:element></xs:schema>'.format(SCHEMA_NAMESPACE, BENCHMARK_NAMESPACE,
+                                                                              fields)
+
+
+def generate_record(nb_items, nb_fields):
+    """ Generate a record of the schema with nb_items items
+
+    Args:
+        nb_items:
+        nb_fields:
+
+    Returns:
+
+    """
+    fields = ''.join(['<field{0}>value {0}</field{0}>'.format(index) for index in range(nb_fields)])
+    items = ''.join(['<item id="{0}">{1}</item>'.format(index, fields) for index in range(nb_items)])
+
+    return '<root xmlns="{0}">{1}</root>'.format(BENCHMARK_NAMESPACE, items)
+
+
+def run(nb_items=1000, nb_fields=10):
+    """ Run the benchmark
+
+    Args:
+        nb_items:
+        nb_fields:
+
+    Returns:
+
+    """
+    xsd_tree = XSDTree.build_tree(generate_schema(nb_fields))
+    root = xsd_tree.find("./{0}element".format(LXML_SCHEMA_NAMESPACE))
+    record = generate_record(nb_items, nb_fields)
+
+    print "Record with {0} elements ({1} bytes)".format(nb_items * (nb_fields + 1) + 1, len(record))
+
+    results = []
+    for label, index_class in [('lxml xpath', XPathEditDataIndex), ('index', EditDataIndex)]:
+        def generate():
+            xsd_parser = XSDParser(ignore_modules=True, auto_key_keyref=False)
+            xsd_parser.editing = True
+            results.append(xsd_parser.generate_element(root, xsd_tree, edit_data_tree=etree.XML(record)))
+
+        parser.EditDataIndex = index_class
+        print "{0:>12}: {1:.3f}s".format(label, best_time(generate))
+
+    parser.EditDataIndex = EditDataIndex
+
+    print "Same data structure: {0}".format(results[0] == results[-1])
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,149 @@
+""" Benchmark of the indexes of the data structure element and module collections
+
+Needs a MongoDB server (mongomock has no query planner). The benchmark database is dropped and recreated.
+
+Usage: python -m benchmarks.bench_indexes [mongodb_uri] [nb_elements]
+"""
+import sys
+
+from benchmarks.utils import setup_django
+
+setup_django()
+
+from bson.objectid import ObjectId
+
+from core_main_app.utils.databases.mongoengine_database import Database
+from core_parser_app.components.data_structure_element.models import DataStructureElement
+from core_parser_app.components.module.models import Module
+
+DEFAULT_URI = 'mongodb://localhost:27017/core_parser_app_benchmark'
+FORM_GROUPS = 100
+GROUP_FIELDS = 9
+NB_MODULES = 100
+
+
+def generate_form():
+    """ Generate the documents of a form (root -> groups -> fields)
+
+    Returns:
+
+    """
+    root_id = ObjectId()
+    documents = []
+    group_ids = []
+
+    for group_index in range(FORM_GROUPS):
+        group_id = ObjectId()
+        group_xpath = '/root/group{0}[1]'.format(group_index)
+        field_ids = []
+
+        for field_index in range(GROUP_FIELDS):
+            field_id = ObjectId()
+            documents.append({'_id': field_id, 'tag': 'element', 'parent': group_id, 'root': root_id,
+                              'options': {'xpath': {'xml': '{0}/field{1}[1]'.format(group_xpath, field_index)}}})
+            field_ids.append(field_id)
+
+        documents.append({'_id': group_id, 'tag': 'element', 'parent': root_id, 'root': root_id,
+                          'children': field_ids, 'options': {'xpath': {'xml': group_xpath}}})
+        group_ids.append(group_id)
+
+    documents.append({'_id': root_id, 'tag': 'element', 'root': root_id, 'children': group_ids,
+                      'options': {'xpath': {'xml': '/root[1]'}}})
+    return documents
+
+
+def get_plan_stages(plan):
+    """ Return the stages of a query plan, from the top one (e.g. FETCH > IXSCAN)
+
+    Args:
+        plan:
+
+    Returns:
+
+    """
+    stages = []
+    while plan is not None:
+        stage = plan['stage']
+        if 'indexName' in plan:
+            stage += '({0})'.format(plan['indexName'])
+        stages.append(stage)
+        plan = plan.get('inputStage')
+
+    return ' > '.join(stages)
+
+
+def explain(collection, query, hint=None):
+    """ Explain a query
+
+    Args:
+        collection:
+        query:
+        hint:
+
+    Returns:
+
+    """
+    cursor = collection.find(query)
+    if hint is not None:
+        cursor = cursor.hint(hint)
+
+    explanation = cursor.explain()
+    stats = explanation['executionStats']
+    return get_plan_stages(explanation['queryPlanner']['winningPlan']), \
+        stats['totalDocsExamined'], stats['executionTimeMillis']
+
+
+def run(uri=DEFAULT_URI, nb_elements=1000000):
+    """ Run the benchmark
+
+    Args:
+        uri:
+        nb_elements:
+
+    Returns:
+
+    """
+    database = Database(uri, uri.rsplit('/', 1)[1])
+    database.connect()
+
+    collection = DataStructureElement._get_collection()
+    module_collection = Module._get_collection()
+    collection.drop()
+    module_collection.drop()
+
+    nb_forms = max(1, nb_elements / (FORM_GROUPS * (GROUP_FIELDS + 1) + 1))
+    print "Inserting {0} forms ({1} elements)".format(nb_forms, nb_forms * (FORM_GROUPS * (GROUP_FIELDS + 1) + 1))
+
+    form = None
+    for form_index in range(nb_forms):
+        form = generate_form()
+        collection.insert_many(form)
+
+    module_collection.insert_many([{'name': 'module{0}'.format(index), 'url': '/module/{0}'.format(index),
+                                    'view': 'view', 'multiple': False} for index in range(NB_MODULES)])
+
+    DataStructureElement.ensure_indexes()
+    Module.ensure_indexes()
+
+    # queries on the last inserted form
+    root = form[-1]
+    field = form[0]
+    queries = [
+        ('get_all_by_child_id', collection, {'children': field['_id']}),
+        ('get_all_by_xpath', collection, {'root': root['_id'], 'options.xpath.xml': field['options']['xpath']['xml']}),
+        ('Module.get_by_url', module_collection, {'url': '/module/{0}'.format(NB_MODULES - 1)}),
+    ]
+
+    for label, query_collection, query in queries:
+        print label
+        for plan_label, hint in [('indexed', None), ('collection scan', [('$natural', 1)])]:
+            stages, docs_examined, time_ms = explain(query_collection, query, hint)
+            print "  {0:>16}: {1}, {2} documents examined, {3}ms".format(plan_label, stages, docs_examined, time_ms)
+
+    collection.drop()
+    module_collection.drop()
+    database.disconnect()
+
+
+if __name__ == '__main__':
+    run(*[int(arg) if arg.isdigit() else arg for arg in sys.argv[1:]])
@@ -0,0 +1,61 @@
+""" Benchmark of the python emitters of the renderer fragments (fast rendering)
+
+Usage: python -m benchmarks.bench_rendering [nb_groups] [nb_fields]
+"""
+import sys
+from os.path import join, dirname
+
+from benchmarks.utils import setup_django, generate_schema, best_time
+
+setup_django()
+
+from django.test import override_settings
+from mock import patch
+
+from core_parser_app.tools import parser as parser_package
+from core_parser_app.tools.parser import parser
+from core_parser_app.tools.parser.parser import XSDParser, build_data_structure_element
+from core_parser_app.tools.parser.renderer.list import ListRenderer
+
+RENDERER_TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [join(dirname(parser_package.__file__), 'templates')],
+    },
+]
+
+
+def run(nb_groups=100, nb_fields=50):
+    """ Run the benchmark
+
+    Args:
+        nb_groups:
+        nb_fields:
+
+    Returns:
+
+    """
+    override_settings(TEMPLATES=RENDERER_TEMPLATES).enable()
+
+    # form built in memory, not saved
+    with patch.object(parser, 'load_schema_data_in_db') as mock_load_schema_data_in_db:
+        XSDParser(ignore_modules=True).generate_form(generate_schema(nb_groups, nb_fields))
+    elements = []
+    root = build_data_structure_element(mock_load_schema_data_in_db.call_args[0][0], elements)
+
+    print "Form with {0} nodes".format(len(elements))
+
+    results = []
+    for label, fast_rendering in [('templates', False), ('emitters', True)]:
+        def render():
+            renderer = ListRenderer(root, None)
+            renderer.fast_rendering = fast_rendering
+            results.append(renderer.render())
+
+        print "{0:>10}: {1:.3f}s".format(label, best_time(render))
+
+    print "Same HTML: {0}".format(results[0] == results[-1])
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,44 @@
+""" Benchmark of the sanitizing of the module resources and urls
+
+Usage: python -m benchmarks.bench_sanitize [nb_values]
+"""
+import json
+import sys
+
+from benchmarks.utils import setup_django, best_time
+
+setup_django()
+
+from core_parser_app.tools.modules.sanitize import sanitize
+from tests.tools.modules.tests.tests_unit_sanitize import _reference_sanitize
+
+
+def run(nb_values=10000):
+    """ Run the benchmark
+
+    Args:
+        nb_values:
+
+    Returns:
+
+    """
+    inputs = [
+        ('short strings', ['value {0}'.format(index) for index in range(nb_values)]),
+        ('module urls', json.dumps(['/modules/module-{0}?param={0}'.format(index) for index in range(nb_values)])),
+        ('resources', [json.dumps({'scripts': ['core_module_{0}/js/module.js'.format(index)], 'styles': []})
+                       for index in range(nb_values / 10)]),
+        ('xml', ['<root><element>{0}</element></root>'.format(index) for index in range(nb_values / 10)]),
+    ]
+
+    for label, input_value in inputs:
+        results = []
+        times = []
+        for sanitize_function in [_reference_sanitize, sanitize]:
+            times.append(best_time(lambda: results.append(sanitize_function(input_value))))
+
+        print "{0:>14}: {1:.3f}s -> {2:.3f}s (same output: {3})".format(label, times[0], times[1],
+                                                                        results[0] == results[-1])
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,66 @@
+""" Benchmark of the schema context cache used by the parser
+
+Usage: python -m benchmarks.bench_schema_context
+"""
+from benchmarks.utils import setup_django, generate_schema, best_time
+
+setup_django()
+
+from xml_utils.commons.constants import LXML_SCHEMA_NAMESPACE
+from xml_utils.xsd_tree.xsd_tree import XSDTree
+
+from core_parser_app.tools.parser.parser import XSDParser
+from core_parser_app.tools.parser.utils import schema
+from core_parser_app.tools.parser.utils.schema import SchemaContext, SchemaContextCache
+
+
+class UncachedSchemaContextCache(SchemaContextCache):
+    """ Recomputes the context on every access (behavior before the cache was introduced)
+    """
+
+    def get(self, xml_tree):
+        return SchemaContext(xml_tree)
+
+
+def run(nb_groups=100, nb_fields=30):
+    """ Run the benchmark
+
+    Args:
+        nb_groups:
+        nb_fields:
+
+    Returns:
+
+    """
+    xsd_tree = XSDTree.build_tree(generate_schema(nb_groups, nb_fields))
+    root = xsd_tree.find("./{0}element".format(LXML_SCHEMA_NAMESPACE))
+
+    # count schema serializations
+    calls = {'count': 0}
+    get_namespaces = schema.get_namespaces
+
+    def counting_get_namespaces(xsd_string):
+        calls['count'] += 1
+        return get_namespaces(xsd_string)
+
+    schema.get_namespaces = counting_get_namespaces
+
+    print "Schema with {0} elements".format(nb_groups * (nb_fields + 1) + 1)
+
+    for label, cache_class in [('uncached', UncachedSchemaContextCache), ('cached', SchemaContextCache)]:
+        def generate():
+            parser = XSDParser(ignore_modules=True)
+            parser.schema_contexts = cache_class()
+            parser.generate_element(root, xsd_tree)
+
+        calls['count'] = 0
+        generate()
+        nb_calls = calls['count']
+
+        print "{0:>10}: {1:.3f}s, {2} namespace computations".format(label, best_time(generate), nb_calls)
+
+    schema.get_namespaces = get_namespaces
+
+
+if __name__ == '__main__':
+    run()
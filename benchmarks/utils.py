@@ -0,0 +1,64 @@
+""" Benchmark utils
+"""
+import os
+import timeit
+
+from xml_utils.commons.constants import SCHEMA_NAMESPACE
+
+BENCHMARK_NAMESPACE = 'http://benchmark.example.org/schema'
+
+
+def setup_django():
+    """ Configure Django with the test settings so the parser can be imported
+
+    Returns:
+
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.test_settings')
+
+    import django
+    django.setup()
+
+
+def generate_schema(nb_groups, nb_fields, named_types=False):
+    """ Generate a schema with a root element containing nb_groups groups of nb_fields string fields
+
+    Args:
+        nb_groups:
+        nb_fields:
+        named_types: declare the groups with global named complex types
+
+    Returns:
+
+    """
+    fields = ''.join(['<xs:element name="field{0}" type="xs:string"/>'.format(index)
+                      for index in range(nb_fields)])
+
+    groups = ''
+    types = ''
+    for index in range(nb_groups):
+        if named_types:
+            groups += '<xs:element name="group{0}" type="bm:Group{0}"/>'.format(index)
+            types += '<xs:complexType name="Group{0}"><xs:sequence>{1}</xs:sequence></xs:complexType>'.format(
+                index, fields
+            )
+        else:
+            groups += '<xs:element name="group{0}"><xs:complexType><xs:sequence>{1}</xs:sequence>' \
+                      '</xs:complexType></xs:element>'.format(index, fields)
+
+    return '<xs:schema xmlns:xs="{0}" xmlns:bm="{1}" targetNamespace="{1}" elementFormDefault="qualified">' \
+           '<xs:element name="root"><xs:complexType><xs:sequence>{2}</xs:sequence></xs:complexType></xs:element>' \
+           '{3}</xs:schema>'.format(SCHEMA_NAMESPACE, BENCHMARK_NAMESPACE, groups, types)
+
+
+def best_time(func, repeat=3):
+    """ Return the best execution time of func over repeat runs
+
+    Args:
+        func:
+        repeat:
+
+    Returns:
+
+    """
+    return min(timeit.repeat(func, number=1, repeat=repeat))
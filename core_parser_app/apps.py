@@ -8,3 +8,14 @@ class CoreParserAppConfig(AppConfig):
     name = 'core_parser_app'
     verbose_name = "Core Parser App"
 
+    def ready(self):
+        """ When the app is ready, create the indexes of the collections and resolve the module views.
+        """
+        from core_parser_app.components.data_structure_element.models import DataStructureElement
+        from core_parser_app.components.module.models import Module
+        from core_parser_app.tools.modules.views.module import AbstractModule
+
+        DataStructureElement.ensure_indexes()
+        Module.ensure_indexes()
+        AbstractModule.init_module_views()
+
@@ -2,6 +2,7 @@
 """
 from core_main_app.commons.exceptions import DoesNotExist
 from core_parser_app.components.data_structure_element.models import DataStructureElement
+from core_parser_app.settings import PARSER_RENDER_CACHE
 
 
 def upsert(data_structure_element):
@@ -13,7 +14,112 @@ def upsert(data_structure_element):
     Returns:
 
     """
-    return data_structure_element.save()
+    saved_data_structure_element = data_structure_element.save()
+    update_subtree_version(data_structure_element)
+    return saved_data_structure_element
+
+
+def update_values(element_values):
+    """ Set the values of the given Data Structure Elements in one bulk write
+
+    Args:
+        element_values: list of (id, value)
+
+    Returns:
+        previous value of each updated element, by id
+
+    """
+    return DataStructureElement.update_values(element_values, is_subtree_version_enabled())
+
+
+def insert_child(data_structure_element, child, position):
+    """ Insert a child at the given position in the children of the Data Structure Element (in database only)
+
+    Args:
+        data_structure_element:
+        child:
+        position:
+
+    Returns:
+
+    """
+    DataStructureElement.insert_child(data_structure_element.id, child.id, position)
+    update_subtree_version(data_structure_element)
+
+
+def replace_child(data_structure_element, position, new_child, value):
+    """ Replace the child at the given position and set the value of the Data Structure Element
+
+    Args:
+        data_structure_element:
+        position:
+        new_child:
+        value:
+
+    Returns:
+
+    """
+    child = data_structure_element.children[position]
+    DataStructureElement.replace_child(data_structure_element.id, position, child.id, new_child.id, value)
+    update_subtree_version(data_structure_element)
+
+    data_structure_element.children[position] = new_child
+    data_structure_element.value = value
+
+
+def update_xml_xpaths(xpaths):
+    """ Set the xml xpath of the given Data Structure Elements in one bulk write (in database and in memory)
+
+    Args:
+        xpaths: list of (element, xml xpath)
+
+    Returns:
+
+    """
+    DataStructureElement.set_xml_xpaths([(element.id, xml_xpath) for element, xml_xpath in xpaths])
+
+    for element, xml_xpath in xpaths:
+        element.options['xpath']['xml'] = xml_xpath
+        # incremented in database, the new version is not known here
+        element.set_version(None)
+
+
+def update_module_options(module_element, options):
+    """ Set the given options of a module element, only if they have been modified
+
+    The renderers do not cache the subtrees containing modules: only the version of the module is incremented.
+
+    Args:
+        module_element:
+        options:
+
+    Returns:
+        True if the options have been written
+
+    """
+    modified_options = {key: value for key, value in options.iteritems()
+                        if key not in module_element.options or module_element.options[key] != value}
+
+    if len(modified_options) == 0:
+        return False
+
+    DataStructureElement.set_options(module_element.id, modified_options)
+    module_element.options.update(modified_options)
+    # incremented in database, the new version is not known here
+    module_element.set_version(None)
+    return True
+
+
+def insert_many(data_structure_elements):
+    """ Insert a list of new Data Structure Elements in one bulk write
+
+    Args:
+        data_structure_elements:
+
+    Returns:
+
+    """
+    return DataStructureElement.insert_many(data_structure_elements)
 
 
 def get_all():
@@ -36,6 +142,19 @@ def get_all_by_child_id(child_id):
     return DataStructureElement.get_all_by_child_id(child_id)
 
 
+def get_all_by_xpath(root_id, xpath):
+    """ Get the Data Structure Elements of a tree which have the given xml xpath
+
+    Args:
+        root_id:
+        xpath:
+
+    Returns:
+
+    """
+    return DataStructureElement.get_all_by_xpath(root_id, xpath)
+
+
 def get_by_id(data_structure_element_id):
     """ Return DataStructureElement object with the given id
 
@@ -47,20 +166,56 @@ def get_by_id(data_structure_element_id):
     return DataStructureElement.get_by_id(data_structure_element_id)
 
 
+def delete_branch(data_structure_element_id):
+    """ Delete the Data Structure Element with the given id and all its descendants
+
+    Args:
+        data_structure_element_id:
+
+    Returns:
+        number of deleted elements
+
+    """
+    return DataStructureElement.delete_branch(data_structure_element_id)
+
+
+def get_subtree(data_structure_element):
+    """ Return the element with all its descendants loaded in memory
+
+    Elements already loaded in memory (e.g. a tree freshly generated by the parser) are returned as is.
+
+    Args:
+        data_structure_element:
+
+    Returns:
+
+    """
+    if DataStructureElement.is_subtree_loaded(data_structure_element):
+        return data_structure_element
+
+    return DataStructureElement.get_subtree_by_id(data_structure_element.id)
+
+
 # TODO: needs to be reworked
-def pull_children(data_structure_element, children):
+def pull_children(data_structure_element, children, detach=True):
     """
 
     Args:
         data_structure_element:
         children:
+        detach: False if the pulled elements are deleted by the caller (their parent is not updated)
 
     Returns:
 
     """
     data_structure_element.update(pull__children=children)
+    update_subtree_version(data_structure_element)
     data_structure_element.reload()
 
+    # the pulled elements are not part of the tree anymore
+    if detach:
+        update_parent(children if isinstance(children, list) else [children], None)
+
 
 # TODO: needs to be reworked
 def add_to_set(data_structure_element, children):
@@ -74,8 +229,102 @@ def add_to_set(data_structure_element, children):
 
     """
     data_structure_element.update(add_to_set__children=children)
+    update_subtree_version(data_structure_element)
     data_structure_element.reload()
 
+    update_parent(children, data_structure_element)
+
+
+def update_parent(data_structure_elements, parent):
+    """ Set the parent (and the root of the parent) of the given elements
+
+    Args:
+        data_structure_elements:
+        parent: None to detach the elements from their tree
+
+    Returns:
+
+    """
+    if parent is None:
+        DataStructureElement.update_parent(data_structure_elements, None, None)
+    else:
+        DataStructureElement.update_parent(data_structure_elements, parent.id, get_root_id(parent))
+
+
+def is_subtree_version_enabled():
+    """ Return True if the subtree versions are maintained (they are only used by the render cache)
+
+    Returns:
+
+    """
+    return PARSER_RENDER_CACHE is not None
+
+
+def update_subtree_version(data_structure_element):
+    """ Increment the subtree version of the element and of its ancestors (their rendered HTML is outdated)
+
+    Nothing is written if the render cache is disabled.
+
+    Args:
+        data_structure_element:
+
+    Returns:
+
+    """
+    if data_structure_element.id is None or not is_subtree_version_enabled():
+        return
+
+    ancestor_ids = DataStructureElement.get_ancestor_ids(data_structure_element)
+    # the version of the element is read back: other writes may have incremented it since it was loaded
+    data_structure_element.set_version(DataStructureElement.increment_version(data_structure_element.id))
+    DataStructureElement.increment_versions(ancestor_ids)
+
+
+def update_all_parents():
+    """ Compute and store the parent and root of all the Data Structure Elements
+
+    Returns:
+        number of updated elements
+
+    """
+    return DataStructureElement.update_all_parents()
+
+
+def get_parent_element(data_structure_element):
+    """ Return element's parent (None for a root element)
+
+    Args:
+        data_structure_element:
+
+    Returns:
+
+    """
+    if data_structure_element.parent is not None:
+        return get_by_id(data_structure_element.parent)
+
+    if data_structure_element.root is None:
+        # parent unknown (element created before the parents were stored)
+        parent_list = get_all_by_child_id(data_structure_element.id)
+        if len(parent_list) > 0:
+            return parent_list[0]
+
+    return None
+
+
+def get_root_id(data_structure_element):
+    """ Return the id of element's root
+
+    Args:
+        data_structure_element:
+
+    Returns:
+
+    """
+    if data_structure_element.root is not None:
+        return data_structure_element.root
+
+    return get_root_element(data_structure_element).id
+
 
 def get_root_element(data_structure_element):
     """ Return element's root
@@ -86,10 +335,18 @@ def get_root_element(data_structure_element):
     Returns:
 
     """
+    if data_structure_element.root is not None:
+        if data_structure_element.root == data_structure_element.id:
+            return data_structure_element
+        return get_by_id(data_structure_element.root)
+
+    # root unknown: walk up the tree
     current_element = data_structure_element
-    parent_list = get_all_by_child_id(current_element.id)
-    while len(parent_list) > 0:
-        current_element = parent_list[0]
-        parent_list = get_all_by_child_id(current_element.id)
+    parent_element = get_parent_element(current_element)
+    while parent_element is not None:
+        if parent_element.root is not None:
+            return get_root_element(parent_element)
+        current_element = parent_element
+        parent_element = get_parent_element(current_element)
 
     return current_element
@@ -5,6 +5,10 @@ from django_mongoengine import fields, Document
 from mongoengine import errors as mongoengine_errors
 from core_main_app.commons import exceptions
 from bson.objectid import ObjectId
+from pymongo import UpdateOne, UpdateMany, ReturnDocument
+
+# maximum number of ids sent in a single query when walking or deleting a branch
+BRANCH_BATCH_SIZE = 1000
 
 
 class DataStructureElement(Document):
@@ -13,6 +17,33 @@ class DataStructureElement(Document):
     value = fields.StringField(blank=True)
     options = fields.DictField(default={}, blank=True)
     children = fields.ListField(fields.ReferenceField('self'), blank=True)
+    # ids of the parent and of the root of the tree (the root references itself, None if not known yet)
+    parent = fields.ObjectIdField(blank=True)
+    root = fields.ObjectIdField(blank=True)
+    # version of the subtree of the element, incremented when the element or one of its descendants is modified
+    version = fields.IntField(default=0, blank=True)
+
+    meta = {
+        'indexes': [
+            # parent lookup (get_all_by_child_id)
+            'children',
+            # element lookup by xpath in a form (get_all_by_xpath)
+            ('root', 'options.xpath.xml'),
+        ]
+    }
+
+    def set_version(self, version):
+        """ Sets the version of the element in memory, without marking it as changed
+
+        The version is only written by $inc updates: a save of the element never overwrites it.
+
+        Args:
+            version: None if unknown
+
+        Returns:
+
+        """
+        self._data['version'] = version
 
     @staticmethod
     def get_all():
@@ -23,6 +54,38 @@ class DataStructureElement(Document):
         """
         return DataStructureElement.objects.all()
 
+    @staticmethod
+    def insert_many(data_structure_elements):
+        """ Insert a list of new data structure elements in one bulk write
+
+        Ids (and references to children) have to be set before the insertion.
+
+        Args:
+            data_structure_elements:
+
+        Returns:
+
+        """
+        if len(data_structure_elements) == 0:
+            return []
+
+        try:
+            documents = []
+            for data_structure_element in data_structure_elements:
+                data_structure_element.validate()
+                documents.append(data_structure_element.to_mongo())
+
+            inserted_ids = DataStructureElement._get_collection().insert_many(documents).inserted_ids
+        except Exception as ex:
+            raise exceptions.ModelError(ex.message)
+
+        # the elements are now persisted: following saves only send the modified fields
+        for data_structure_element in data_structure_elements:
+            data_structure_element._clear_changed_fields()
+            data_structure_element._created = False
+
+        return inserted_ids
+
     @staticmethod
     def get_all_by_child_id(child_id):
         """ Get Data structure element object which contains the given child id in its children
@@ -38,6 +101,429 @@ class DataStructureElement(Document):
         except Exception as ex:
             raise exceptions.ModelError(ex.message)
 
+    @staticmethod
+    def get_subtree_by_id(data_structure_element_id):
+        """ Returns the object with the given id and all its descendants
+
+        The subtree is fetched level by level (one query per level of the tree). The children of each element
+        reference the loaded objects, so the subtree can be walked without querying the database.
+
+        Args:
+            data_structure_element_id:
+
+        Returns:
+            DataStructureElement (obj): DataStructureElement object with the given id
+
+        """
+        try:
+            collection = DataStructureElement._get_collection()
+            root_id = ObjectId(str(data_structure_element_id))
+
+            documents = {}
+            level_ids = [root_id]
+            while len(level_ids) > 0:
+                next_level_ids = []
+                for document in collection.find({'_id': {'$in': level_ids}}):
+                    documents[document['_id']] = document
+                    next_level_ids.extend(document.get('children', []))
+                level_ids = [child_id for child_id in set(next_level_ids) if child_id not in documents]
+        except Exception as ex:
+            raise exceptions.ModelError(ex.message)
+
+        if root_id not in documents:
+            raise exceptions.DoesNotExist('No data structure element found with the given id.')
+
+        elements = {}
+        children_ids = {}
+        for element_id, document in documents.iteritems():
+            children_ids[element_id] = document.pop('children', [])
+            elements[element_id] = DataStructureElement._from_son(document)
+
+        for element_id, element in elements.iteritems():
+            element.children = [elements[child_id] for child_id in children_ids[element_id] if child_id in elements]
+            element._clear_changed_fields()
+
+        return elements[root_id]
+
+    @staticmethod
+    def is_subtree_loaded(data_structure_element):
+        """ Checks if the element and all its descendants are in memory (no reference left to dereference)
+
+        Args:
+            data_structure_element:
+
+        Returns:
+
+        """
+        elements = [data_structure_element]
+        while len(elements) > 0:
+            element = elements.pop()
+            for child in element._data.get('children') or []:
+                if not isinstance(child, DataStructureElement):
+                    return False
+                elements.append(child)
+
+        return True
+
+    @staticmethod
+    def delete_branch(data_structure_element_id):
+        """ Deletes the element with the given id and all its descendants
+
+        The ids of the branch are collected level by level, then deleted by batches.
+
+        Args:
+            data_structure_element_id:
+
+        Returns:
+            int: number of deleted elements
+
+        """
+        try:
+            collection = DataStructureElement._get_collection()
+
+            branch_ids = set()
+            level_ids = [ObjectId(str(data_structure_element_id))]
+            while len(level_ids) > 0:
+                branch_ids.update(level_ids)
+                next_level_ids = set()
+                for batch_ids in _get_batches(level_ids):
+                    for document in collection.find({'_id': {'$in': batch_ids}}, {'children': 1}):
+                        next_level_ids.update(document.get('children', []))
+                level_ids = list(next_level_ids - branch_ids)
+
+            deleted_count = 0
+            for batch_ids in _get_batches(list(branch_ids)):
+                deleted_count += collection.delete_many({'_id': {'$in': batch_ids}}).deleted_count
+        except Exception as ex:
+            raise exceptions.ModelError(ex.message)
+
+        return deleted_count
+
+    @staticmethod
+    def update_parent(data_structure_elements, parent_id, root_id):
+        """ Sets the parent and root ids of the given elements
+
+        Args:
+            data_structure_elements:
+            parent_id:
+            root_id:
+
+        Returns:
+
+        """
+        try:
+            DataStructureElement.objects(pk__in=[element.pk for element in data_structure_elements])\
+                .update(set__parent=parent_id, set__root=root_id)
+        except Exception as ex:
+            raise exceptions.ModelError(ex.message)
+
+        for data_structure_element in data_structure_elements:
+            data_structure_element._data['parent'] = parent_id
+            data_structure_element._data['root'] = root_id
+
+    @staticmethod
+    def update_all_parents():
+        """ Computes and stores the parent and root ids of all the elements of the collection
+
+        Returns:
+            int: number of updated elements
+
+        """
+        try:
+            collection = DataStructureElement._get_collection()
+
+            element_ids = []
+            parents = {}
+            for document in collection.find({}, {'children': 1}):
+                element_ids.append(document['_id'])
+                for child_id in document.get('children', []):
+                    parents[child_id] = document['_id']
+
+            roots = {}
+            for element_id in element_ids:
+                # walk up until an element with a known root (or the root itself) is found
+                path = []
+                current_id = element_id
+                while current_id not in roots and current_id in parents and current_id not in path:
+                    path.append(current_id)
+                    current_id = parents[current_id]
+
+                root_id = roots.get(current_id, current_id)
+                roots[current_id] = root_id
+                for path_id in path:
+                    roots[path_id] = root_id
+
+            updated_count = 0
+            for batch_ids in _get_batches(element_ids):
+                requests = [UpdateOne({'_id': element_id},
+                                      {'$set': {'parent': parents.get(element_id), 'root': roots[element_id]}})
+                            for element_id in batch_ids]
+                updated_count += collection.bulk_write(requests).matched_count
+        except Exception as ex:
+            raise exceptions.ModelError(ex.message)
+
+        return updated_count
+
+    @staticmethod
+    def get_ancestor_ids(data_structure_element):
+        """ Returns the ids of the ancestors of the element, from its parent to the root
+
+        Only the parent and root ids of the ancestors are fetched (one query per ancestor).
+
+        Args:
+            data_structure_element:
+
+        Returns:
+
+        """
+        try:
+            collection = DataStructureElement._get_collection()
+
+            ancestor_ids = []
+            element_id = data_structure_element.id
+            parent_id = data_structure_element.parent
+            root_id = data_structure_element.root
+            while element_id is not None:
+                if parent_id is not None:
+                    document = collection.find_one({'_id': parent_id}, {'parent': 1, 'root': 1})
+                elif root_id is None:
+                    # parent unknown (element created before the parents were stored)
+                    document = collection.find_one({'children': element_id}, {'parent': 1, 'root': 1})
+                else:
+                    document = None
+
+                if document is None or document['_id'] in ancestor_ids:
+                    break
+
+                ancestor_ids.append(document['_id'])
+                element_id, parent_id, root_id = document['_id'], document.get('parent'), document.get('root')
+        except Exception as ex:
+            raise exceptions.ModelError(ex.message)
+
+        return ancestor_ids
+
+    @staticmethod
+    def increment_version(data_structure_element_id):
+        """ Increments the subtree version of the element with the given id
+
+        Args:
+            data_structure_element_id:
+
+        Returns:
+            the new version of the element (None if not found)
+
+        """
+        try:
+            document = DataStructureElement._get_collection().find_one_and_update(
+                {'_id': data_structure_element_id}, {'$inc': {'version': 1}}, projection={'version': 1},
+                return_document=ReturnDocument.AFTER
+            )
+        except Exception as ex:
+            raise exceptions.ModelError(ex.message)
+
+        return document['version'] if document is not None else None
+
+    @staticmethod
+    def increment_versions(data_structure_element_ids):
+        """ Increments the subtree version of the elements with the given ids
+
+        Args:
+            data_structure_element_ids:
+
+        Returns:
+
+        """
+        if len(data_structure_element_ids) == 0:
+            return
+
+        try:
+            DataStructureElement._get_collection().update_many({'_id': {'$in': data_structure_element_ids}},
+                                                               {'$inc': {'version': 1}})
+        except Exception as ex:
+            raise exceptions.ModelError(ex.message)
+
+    @staticmethod
+    def insert_child(data_structure_element_id, child_id, position):
+        """ Inserts a child at the given position in the children of the element (atomic positional push)
+
+        Args:
+            data_structure_element_id:
+            child_id:
+            position:
+
+        Returns:
+
+        """
+        try:
+            DataStructureElement._get_collection().update_one(
+                {'_id': data_structure_element_id},
+                {'$push': {'children': {'$each': [child_id], '$position': position}}}
+            )
+        except Exception as ex:
+            raise exceptions.ModelError(ex.message)
+
+    @staticmethod
+    def replace_child(data_structure_element_id, position, child_id, new_child_id, value):
+        """ Replaces the child at the given position in the children of the element and sets the value of the
+        element, in one atomic update
+
+        Args:
+            data_structure_element_id:
+            position:
+            child_id: id of the replaced child (the element is not updated if its children have been modified)
+            new_child_id:
+            value:
+
+        Returns:
+
+        """
+        try:
+            result = DataStructureElement._get_collection().update_one(
+                {'_id': data_structure_element_id, 'children.{0}'.format(position): child_id},
+                {'$set': {'children.{0}'.format(position): new_child_id, 'value': value}}
+            )
+        except Exception as ex:
+            raise exceptions.ModelError(ex.message)
+
+        if result.matched_count == 0:
+            raise exceptions.ModelError('The children of the data structure element have been modified.')
+
+    @staticmethod
+    def set_xml_xpaths(xpaths):
+        """ Sets the xml xpath of the given elements and increments their version, in one bulk write per batch
+
+        Args:
+            xpaths: list of (id, xml xpath)
+
+        Returns:
+
+        """
+        try:
+            collection = DataStructureElement._get_collection()
+
+            for index in range(0, len(xpaths), BRANCH_BATCH_SIZE):
+                requests = [UpdateOne({'_id': element_id},
+                                      {'$set': {'options.xpath.xml': xml_xpath}, '$inc': {'version': 1}})
+                            for element_id, xml_xpath in xpaths[index:index + BRANCH_BATCH_SIZE]]
+                collection.bulk_write(requests)
+        except Exception as ex:
+            raise exceptions.ModelError(ex.message)
+
+    @staticmethod
+    def set_options(data_structure_element_id, options):
+        """ Sets the given options of the element (other options are kept) and increments its version
+
+        Args:
+            data_structure_element_id:
+            options:
+
+        Returns:
+
+        """
+        try:
+            DataStructureElement._get_collection().update_one(
+                {'_id': data_structure_element_id},
+                {'$set': {'options.{0}'.format(key): value for key, value in options.items()}, '$inc': {'version': 1}}
+            )
+        except Exception as ex:
+            raise exceptions.ModelError(ex.message)
+
+    @staticmethod
+    def get_all_ancestor_ids(data_structure_element_ids):
+        """ Returns the ids of all the ancestors of the elements with the given ids
+
+        The ancestors are collected level by level (one query per level of the tree).
+
+        Args:
+            data_structure_element_ids:
+
+        Returns:
+
+        """
+        try:
+            collection = DataStructureElement._get_collection()
+
+            ancestor_ids = set()
+            level_ids = list(data_structure_element_ids)
+            while len(level_ids) > 0:
+                parent_ids = set()
+                for batch_ids in _get_batches(level_ids):
+                    unknown_parent_ids = []
+                    for document in collection.find({'_id': {'$in': batch_ids}}, {'parent': 1, 'root': 1}):
+                        if document.get('parent') is not None:
+                            parent_ids.add(document['parent'])
+                        elif document.get('root') is None:
+                            # parent unknown (element created before the parents were stored)
+                            unknown_parent_ids.append(document['_id'])
+
+                    if len(unknown_parent_ids) > 0:
+                        for document in collection.find({'children': {'$in': unknown_parent_ids}}, {'_id': 1}):
+                            parent_ids.add(document['_id'])
+
+                level_ids = list(parent_ids - ancestor_ids)
+                ancestor_ids.update(level_ids)
+        except Exception as ex:
+            raise exceptions.ModelError(ex.message)
+
+        return list(ancestor_ids)
+
+    @staticmethod
+    def update_values(element_values, increment_versions=True):
+        """ Sets the values of the given elements in one bulk write
+
+        The subtree versions of the elements and of their ancestors are incremented in the same bulk write.
+
+        Args:
+            element_values: list of (id, value)
+            increment_versions: increment the subtree versions (the ancestors are looked up)
+
+        Returns:
+            dict: previous value of each updated element, by id (elements not found are not updated)
+
+        """
+        if len(element_values) == 0:
+            return {}
+
+        try:
+            collection = DataStructureElement._get_collection()
+
+            element_ids = [ObjectId(str(element_id)) for element_id, _ in element_values]
+            previous_values = {}
+            for batch_ids in _get_batches(element_ids):
+                for document in collection.find({'_id': {'$in': batch_ids}}, {'value': 1}):
+                    previous_values[document['_id']] = document.get('value')
+
+            update = {'$inc': {'version': 1}} if increment_versions else {}
+            requests = [UpdateOne({'_id': element_id}, dict(update, **{'$set': {'value': value}}))
+                        for element_id, (_, value) in zip(element_ids, element_values)
+                        if element_id in previous_values]
+            if len(requests) > 0 and increment_versions:
+                ancestor_ids = DataStructureElement.get_all_ancestor_ids(previous_values.keys())
+                requests += [UpdateMany({'_id': {'$in': batch_ids}}, {'$inc': {'version': 1}})
+                             for batch_ids in _get_batches(ancestor_ids)]
+            if len(requests) > 0:
+                collection.bulk_write(requests)
+        except Exception as ex:
+            raise exceptions.ModelError(ex.message)
+
+        return previous_values
+
+    @staticmethod
+    def get_all_by_xpath(root_id, xpath):
+        """ Returns the elements of the tree with the given root which have the given xml xpath
+
+        Args:
+            root_id:
+            xpath:
+
+        Returns:
+
+        """
+        try:
+            return DataStructureElement.objects(root=ObjectId(str(root_id)), options__xpath__xml=xpath).all()
+        except Exception as ex:
+            raise exceptions.ModelError(ex.message)
+
     @staticmethod
     def get_by_id(data_structure_element_id):
         """ Returns the object with the given id
@@ -55,3 +541,15 @@ class DataStructureElement(Document):
             raise exceptions.DoesNotExist(e.message)
         except Exception as ex:
             raise exceptions.ModelError(ex.message)
+
+
+def _get_batches(ids):
+    """ Splits a list of ids in batches of BRANCH_BATCH_SIZE ids
+
+    Args:
+        ids:
+
+    Returns:
+
+    """
+    return [ids[index:index + BRANCH_BATCH_SIZE] for index in range(0, len(ids), BRANCH_BATCH_SIZE)]
@@ -1,10 +1,28 @@
 """API for modules
 """
+import threading
+import uuid
+
+from django.core.cache import caches
+
+from core_main_app.commons.exceptions import DoesNotExist
 from core_main_app.components.template import api as template_api
 from core_parser_app.components.module.models import Module
-from core_parser_app.settings import MODULE_TAG_NAME
+from core_parser_app.settings import MODULE_TAG_NAME, PARSER_MODULE_REGISTRY_CACHE
 from xml_utils.xsd_tree.operations.appinfo import add_appinfo_element, delete_appinfo_element
 
+# key of the generation of the registry in the shared cache, changed when the modules are modified
+GENERATION_CACHE_KEY = 'core_parser_app:module_registry:generation'
+
+# Registry of the modules by url, loaded once per process and reloaded when the modules are modified through this api
+# (by any process if the generation is shared): (generation, registry)
+_module_registry = None
+# generation of the registry in this process, changed when the modules are modified by this process
+_local_generation = 0
+# generation of the registry shared by the processes, read once per parse or request by refresh_module_registry
+_shared_generation = None
+_lock = threading.Lock()
+
 
 def get_by_id(module_id):
     """Returns a module by its id
@@ -30,6 +48,91 @@ def get_by_url(module_url):
     return Module.get_by_url(module_url)
 
 
+def get_registered_module(module_url):
+    """Returns a module by its url, from the registry of the modules (no database query once loaded)
+
+    Args:
+        module_url:
+
+    Returns:
+
+    """
+    module_registry = _get_module_registry()
+
+    if module_url not in module_registry:
+        raise DoesNotExist("No module registered for the given url.")
+
+    return module_registry[module_url]
+
+
+def is_registered_url(module_url):
+    """Checks if a module is registered for the url, from the registry of the modules
+
+    Args:
+        module_url:
+
+    Returns:
+
+    """
+    return module_url in _get_module_registry()
+
+
+def refresh_module_registry():
+    """Reads the generation of the registry shared by the processes: the registry is reloaded on next access if the
+    modules have been modified by another process (no cache query by the lookups)
+
+    Returns:
+
+    """
+    global _shared_generation
+
+    if PARSER_MODULE_REGISTRY_CACHE is None:
+        return
+
+    shared_cache = caches[PARSER_MODULE_REGISTRY_CACHE]
+    generation = shared_cache.get(GENERATION_CACHE_KEY)
+    if generation is None:
+        shared_cache.add(GENERATION_CACHE_KEY, uuid.uuid4().hex, None)
+        generation = shared_cache.get(GENERATION_CACHE_KEY)
+
+    _shared_generation = generation
+
+
+def _get_module_registry():
+    """Returns the registry of the modules, loads it on first access and after a modification of the modules
+
+    Returns:
+
+    """
+    global _module_registry
+
+    generation = (_local_generation, _shared_generation)
+    module_registry = _module_registry
+
+    if module_registry is None or module_registry[0] != generation:
+        # tagged with the generation read before the load: reloaded if the modules are modified during the load
+        module_registry = (generation, {module.url: module for module in Module.get_all()})
+        _module_registry = module_registry
+
+    return module_registry[1]
+
+
+def _clear_module_registry():
+    """Clears the registry of the modules (of all the processes if the generation is shared), reloaded on next access
+
+    Returns:
+
+    """
+    global _module_registry, _local_generation
+
+    with _lock:
+        _local_generation += 1
+        _module_registry = None
+
+    if PARSER_MODULE_REGISTRY_CACHE is not None:
+        caches[PARSER_MODULE_REGISTRY_CACHE].set(GENERATION_CACHE_KEY, uuid.uuid4().hex, None)
+
+
 def upsert(module):
     """Saves or updates a module
 
@@ -39,7 +142,11 @@ def upsert(module):
     Returns:
 
     """
-    return module.save()
+    try:
+        return module.save()
+    finally:
+        # cleared after the write: a registry loaded during the write is not kept
+        _clear_module_registry()
 
 
 def get_all():
@@ -66,7 +173,11 @@ def delete_all():
     Returns:
 
     """
-    Module.delete_all()
+    try:
+        Module.delete_all()
+    finally:
+        # cleared after the write: a registry loaded during the write is not kept
+        _clear_module_registry()
 
 
 def add_module(template, module_id, xpath):
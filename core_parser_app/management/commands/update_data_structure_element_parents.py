@@ -0,0 +1,13 @@
+""" Stores the parent and root ids of the data structure elements created before they were tracked
+"""
+from django.core.management.base import BaseCommand
+
+from core_parser_app.components.data_structure_element import api as data_structure_element_api
+
+
+class Command(BaseCommand):
+    help = 'Computes and stores the parent and root ids of all the data structure elements.'
+
+    def handle(self, *args, **options):
+        updated_count = data_structure_element_api.update_all_parents()
+        self.stdout.write('{0} data structure elements updated.'.format(updated_count))
@@ -7,3 +7,43 @@ if not settings.configured:
 MODULES_ROOT = join(dirname(realpath(__file__)).replace('\\', '/'), 'tools', 'modules')
 
 MODULE_TAG_NAME = getattr(settings, 'MODULE_TAG_NAME', 'module')
+
+# Cache of the schemas imported or included by the parsed schemas
+# time in seconds before checking if a cached schema has been modified (None to never check)
+PARSER_SCHEMA_CACHE_TTL = getattr(settings, 'PARSER_SCHEMA_CACHE_TTL', 3600)
+# maximum size in bytes of the cached schemas (None for no limit)
+PARSER_SCHEMA_CACHE_SIZE = getattr(settings, 'PARSER_SCHEMA_CACHE_SIZE', 50 * 1024 * 1024)
+# read the schemas from this local directory instead of downloading them (path of the url = path of the file)
+PARSER_SCHEMA_CACHE_DIRECTORY = getattr(settings, 'PARSER_SCHEMA_CACHE_DIRECTORY', None)
+
+# maximum number of compiled (flattened and indexed) schemas kept in memory by the parser (None for no limit), compiled
+# again when one of their included schemas has been modified (checked after PARSER_SCHEMA_CACHE_TTL)
+PARSER_COMPILED_SCHEMA_CACHE_SIZE = getattr(settings, 'PARSER_COMPILED_SCHEMA_CACHE_SIZE', 20)
+
+# maximum number of compiled XPath expressions kept in memory by the parser (None for no limit)
+PARSER_XPATH_CACHE_SIZE = getattr(settings, 'PARSER_XPATH_CACHE_SIZE', 1000)
+
+# render the fixed fragments of the forms (ul, li, input, buttons) with python instead of the templates
+# (same HTML, only used with the templates shipped with the parser)
+PARSER_FAST_RENDERING = getattr(settings, 'PARSER_FAST_RENDERING', False)
+
+# cache (alias in settings.CACHES) of the HTML rendered for the subtrees of the forms (None to disable)
+# the rendered HTML is invalidated by the data structure element api (upsert, add_to_set, pull_children)
+# the subtree versions are only maintained while the cache is enabled: clear the cache when enabling it again
+PARSER_RENDER_CACHE = getattr(settings, 'PARSER_RENDER_CACHE', None)
+# time in seconds before a rendered subtree is removed from the cache (None to keep it until evicted)
+PARSER_RENDER_CACHE_TIMEOUT = getattr(settings, 'PARSER_RENDER_CACHE_TIMEOUT', 24 * 3600)
+
+# maximum number of values saved by a single request to the batch save endpoint
+PARSER_MAX_SAVED_VALUES = getattr(settings, 'PARSER_MAX_SAVED_VALUES', 500)
+
+# bundles of the resources (scripts and styles) of the modules, by list of modules
+# maximum number of bundles kept in memory (None for no limit)
+PARSER_MODULE_RESOURCES_CACHE_SIZE = getattr(settings, 'PARSER_MODULE_RESOURCES_CACHE_SIZE', 100)
+# cache (alias in settings.CACHES) sharing the bundles between the processes (None to keep them in memory only)
+PARSER_MODULE_RESOURCES_CACHE = getattr(settings, 'PARSER_MODULE_RESOURCES_CACHE', None)
+
+# cache (alias in settings.CACHES) sharing the generation of the registry of the modules between the processes: the
+# registry of each process is reloaded when the modules are modified by another process, the generation being read
+# once per parse (None for this process only)
+PARSER_MODULE_REGISTRY_CACHE = getattr(settings, 'PARSER_MODULE_REGISTRY_CACHE', None)
@@ -12,5 +12,8 @@ def delete_branch_task(data_structure_element_root_id):
     Args:
         data_structure_element_root_id: Data Structure Element Root id.
 
+    Returns:
+        Number of deleted Data Structure Elements.
+
     """
-    parser.delete_branch_from_db(data_structure_element_root_id)
+    return parser.delete_branch_from_db(data_structure_element_root_id)
@@ -5,6 +5,7 @@ from mongoengine.errors import ValidationError
 from core_parser_app.components.module import api as module_api
 from core_parser_app.components.module.models import Module
 from core_parser_app.tools.modules.exceptions import ModuleError
+from core_parser_app.tools.modules.resources import get_resources_bundle_cache
 from core_parser_app.tools.modules.views.module import AbstractModule
 
 
@@ -40,3 +41,6 @@ def discover_modules(urls):
         # something went wrong, delete already added modules
         module_api.delete_all()
         raise e
+    finally:
+        # the resources of the modules are bundled again
+        get_resources_bundle_cache().clear()
@@ -0,0 +1,281 @@
+"""Bundles of the resources (scripts and styles) of the modules
+"""
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.contrib.staticfiles import finders
+from django.core.cache import caches
+from django.utils.http import quote_etag
+
+from core_parser_app.settings import PARSER_MODULE_RESOURCES_CACHE, PARSER_MODULE_RESOURCES_CACHE_SIZE
+from core_parser_app.tools.modules.sanitize import sanitize
+from core_parser_app.tools.modules.views.module import AbstractModule
+
+# key of the generation of the bundles in the shared cache, changed when the modules are discovered
+GENERATION_CACHE_KEY = 'core_parser_app:module_resources:generation'
+
+
+class ResourcesBundle(object):
+    """Scripts and styles of a list of modules, aggregated in one response
+    """
+
+    def __init__(self, content, static_files, generation=None):
+        """Initializes the bundle
+
+        Args:
+            content: JSON response
+            static_files: modification time of the static files read in the bundle, by path
+            generation: generation of the bundles when the bundle was built
+        """
+        self.content = content
+        self.etag = quote_etag(hashlib.md5(content).hexdigest())
+        self.static_files = static_files
+        self.generation = generation
+
+    def is_up_to_date(self):
+        """Checks that the static files of the bundle have not been modified
+
+        Returns:
+
+        """
+        for path, modification_time in self.static_files.iteritems():
+            if _get_modification_time(path) != modification_time:
+                return False
+
+        return True
+
+
+def _get_modification_time(path):
+    """Returns the modification time of the file, None if it does not exist
+
+    Args:
+        path:
+
+    Returns:
+
+    """
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _get_module_resources(url, request):
+    """Returns the resources of the module
+
+    Args:
+        url:
+        request: request of the resources
+
+    Returns:
+
+    """
+    module_view = AbstractModule.get_module_view(url)
+    mod_resources = module_view(request).content
+
+    mod_resources = sanitize(mod_resources)
+    return json.loads(mod_resources)
+
+
+def build_resources_bundle(urls_to_load, urls_loaded, request):
+    """Aggregates the resources of the modules to load, without the resources of the modules already loaded
+
+    Args:
+        urls_to_load:
+        urls_loaded:
+        request:
+
+    Returns:
+
+    """
+    # Request hack to get module resources
+    request.GET = {
+        'resources': True
+    }
+
+    # List of resources
+    resources = {
+        'scripts': [],
+        'styles': []
+    }
+
+    # Add all resources from requested modules
+    for url in urls_to_load:
+        mod_resources = _get_module_resources(url, request)
+
+        # Append resource to the list
+        for key in resources.keys():
+            if mod_resources[key] is None:
+                continue
+
+            for resource in mod_resources[key]:
+                if resource not in resources[key]:
+                    resources[key].append(resource)
+
+    # Remove possible dependencies form already loaded modules
+    for url in urls_loaded:
+        mod_resources = _get_module_resources(url, request)
+
+        # Remove resources already loaded
+        for key in resources.keys():
+            if mod_resources[key] is None:
+                continue
+
+            for resource in mod_resources[key]:
+                if resource in resources[key]:
+                    i = resources[key].index(resource)
+                    del resources[key][i]
+
+    # Build response content
+    response = {
+        'scripts': "",
+        'styles': ""
+    }
+    static_files = {}
+
+    # Aggregate scripts
+    for script in resources['scripts']:
+        if script.startswith('http://') or script.startswith('https://'):
+            script_tag = '<script class="module" src="' + script + '"></script>'
+        else:
+            script_path = finders.find(script)
+            static_files[script_path] = _get_modification_time(script_path)
+            with open(script_path, 'r') as script_file:
+                script_tag = '<script class="module">' + script_file.read() + '</script>'
+
+        response['scripts'] += script_tag
+
+    # Aggregate styles
+    for style in resources['styles']:
+        if style.startswith('http://') or style.startswith('https://'):
+            script_tag = '<link class="module" rel="stylesheet" type="text/css" href="' + style + '"></link>'
+        else:
+            style_path = finders.find(style)
+            static_files[style_path] = _get_modification_time(style_path)
+            with open(style_path, 'r') as script_file:
+                script_tag = '<style class="module">' + script_file.read() + '</style>'
+
+        response['styles'] += script_tag
+
+    return ResourcesBundle(json.dumps(response), static_files)
+
+
+class ResourcesBundleCache(object):
+    """Resources bundles by list of modules, kept in memory (and in a shared Django cache if configured), the least
+    recently used ones being removed when the cache is full
+    """
+
+    def __init__(self, max_size=None, shared_cache_alias=None):
+        """Initializes the cache
+
+        Args:
+            max_size: maximum number of bundles kept in memory (None for no limit)
+            shared_cache_alias: alias of the Django cache shared by the processes (None for memory only)
+        """
+        self.max_size = max_size
+        self.shared_cache_alias = shared_cache_alias
+
+        self._bundles = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _get_shared_cache(self):
+        """Returns the Django cache shared by the processes, None if not configured
+
+        Returns:
+
+        """
+        return caches[self.shared_cache_alias] if self.shared_cache_alias is not None else None
+
+    def _get_generation(self, shared_cache):
+        """Returns the current generation of the bundles (None without shared cache)
+
+        Args:
+            shared_cache:
+
+        Returns:
+
+        """
+        if shared_cache is None:
+            return None
+
+        generation = shared_cache.get(GENERATION_CACHE_KEY)
+        if generation is None:
+            shared_cache.add(GENERATION_CACHE_KEY, uuid.uuid4().hex, None)
+            generation = shared_cache.get(GENERATION_CACHE_KEY)
+
+        return generation
+
+    def get(self, urls_to_load, urls_loaded, request):
+        """Returns the bundle of the modules, builds it on first access or if a static file has been modified
+
+        Args:
+            urls_to_load: urls of the modules to load (their order is kept in the bundle)
+            urls_loaded: urls of the modules already loaded
+            request:
+
+        Returns:
+
+        """
+        key = hashlib.md5(json.dumps([urls_to_load, sorted(set(urls_loaded))])).hexdigest()
+        shared_cache = self._get_shared_cache()
+        generation = self._get_generation(shared_cache)
+
+        with self._lock:
+            bundle = self._bundles.pop(key, None)
+
+        if bundle is not None and (bundle.generation != generation or not bundle.is_up_to_date()):
+            bundle = None
+
+        shared_key = 'core_parser_app:module_resources:{0}:{1}'.format(generation, key)
+        if bundle is None and shared_cache is not None:
+            bundle = shared_cache.get(shared_key)
+            if bundle is not None and not bundle.is_up_to_date():
+                bundle = None
+
+        if bundle is None:
+            bundle = build_resources_bundle(urls_to_load, urls_loaded, request)
+            bundle.generation = generation
+
+            if shared_cache is not None:
+                shared_cache.set(shared_key, bundle, None)
+
+        with self._lock:
+            # most recently used bundles at the end
+            self._bundles[key] = bundle
+
+            if self.max_size is not None and len(self._bundles) > self.max_size:
+                self._bundles.popitem(last=False)
+
+        return bundle
+
+    def clear(self):
+        """Removes all the bundles (of all the processes if the cache is shared)
+
+        Returns:
+
+        """
+        with self._lock:
+            self._bundles.clear()
+
+        shared_cache = self._get_shared_cache()
+        if shared_cache is not None:
+            shared_cache.set(GENERATION_CACHE_KEY, uuid.uuid4().hex, None)
+
+    def __len__(self):
+        return len(self._bundles)
+
+
+_resources_bundle_cache = ResourcesBundleCache(PARSER_MODULE_RESOURCES_CACHE_SIZE, PARSER_MODULE_RESOURCES_CACHE)
+
+
+def get_resources_bundle_cache():
+    """Returns the resources bundle cache of the process
+
+    Returns:
+
+    """
+    return _resources_bundle_cache
@@ -1,51 +1,89 @@
 """Sanitize util
 """
 import json
+import threading
+
 from lxml import etree
 from django.utils.html import escape
 from lxml.etree import XMLSyntaxError
 
+# first characters (after the leading whitespaces) of the strings that can be parsed as XML: element, declaration or
+# comment, and byte order marks or first bytes of the encodings detected by the parser (UTF-16, UCS-4)
+_XML_FIRST_CHARACTERS = ('<', '\xef', '\xfe', '\xff', '\x00')
+_XML_FIRST_UNICODE_CHARACTERS = (u'<', u'\ufeff')
+# first bytes of a XML declaration encoded in EBCDIC (detected by the parser)
+_EBCDIC_XML_DECLARATION = '\x4c\x6f\xa7\x94'
+# first characters (after the leading whitespaces) of the strings that can be parsed as JSON
+_JSON_FIRST_CHARACTERS = frozenset('{["-0123456789tfnNI')
+# whitespaces skipped by the JSON decoder
+_JSON_WHITESPACES = ' \t\n\r'
+
+# XML cleaning parsers, one per thread (lxml parsers can not be shared between threads)
+_xml_cleaner_parsers = threading.local()
+
+
+def _get_xml_cleaner_parser():
+    """Returns the XML cleaning parser of the current thread
+
+    :return:
+    """
+    parser = getattr(_xml_cleaner_parsers, 'parser', None)
+
+    if parser is None:
+        parser = etree.XMLParser(remove_blank_text=True)
+        _xml_cleaner_parsers.parser = parser
+
+    return parser
 
-def sanitize(input_value):
-    """Sanitize the strings in the input
+
+def _sanitize_string(input_value):
+    """Sanitize a string of characters
 
     :param input_value:
     :return:
     """
-    # get the type of the input
-    input_type = type(input_value)
+    first_character = input_value.lstrip()[:1]
 
-    # input is a list
-    if input_type == list:
-        clean_value = []
-        for item in input_value:
-            clean_value.append(sanitize(item))
+    if type(input_value) == unicode:
+        is_xml_candidate = first_character in _XML_FIRST_UNICODE_CHARACTERS
+    else:
+        is_xml_candidate = first_character in _XML_FIRST_CHARACTERS or input_value.startswith(_EBCDIC_XML_DECLARATION)
 
-        return clean_value
-    # input is a dict
-    elif input_type == dict:
-        return {sanitize(key): sanitize(val) for key, val in input_value.items()}
-    # input is a string of characters
-    elif input_type == str or input_type == unicode:
+    # XML cleaning, only for the strings starting like a XML document
+    if is_xml_candidate:
         try:
-            # XML cleaning
-            xml_cleaner_parser = etree.XMLParser(remove_blank_text=True)
-            xml_data = etree.fromstring(input_value, parser=xml_cleaner_parser)
+            xml_data = etree.fromstring(input_value, parser=_get_xml_cleaner_parser())
 
-            input_value = etree.tostring(xml_data)
+            # serialized XML is not JSON
+            return escape(etree.tostring(xml_data))
         except XMLSyntaxError:
             # input is not XML, pass
             pass
-        finally:
-            try:
-                json_value = json.loads(input_value)
-                sanitized_value = sanitize(json_value)
+    # input is JSON, only for the strings starting like a JSON value
+    elif input_value.lstrip(_JSON_WHITESPACES)[:1] in _JSON_FIRST_CHARACTERS:
+        try:
+            json_value = json.loads(input_value)
+
+            return json.dumps(sanitize(json_value))
+        except ValueError:
+            # input is not JSON (or its content can not be sanitized), pass
+            pass
+
+    return escape(input_value)
 
-                clean_value = json.dumps(sanitized_value)
-            except ValueError:
-                clean_value = escape(input_value)
 
-        return clean_value
+def _sanitize_value(input_value):
+    """Sanitize a value which is not a list or a dict
+
+    :param input_value:
+    :return:
+    """
+    # get the type of the input
+    input_type = type(input_value)
+
+    # input is a string of characters
+    if input_type == str or input_type == unicode:
+        return _sanitize_string(input_value)
     # input is a number
     elif input_type == int or input_type == float:
         return input_value
@@ -53,3 +91,39 @@ def sanitize(input_value):
     else:
         # Default sanitizing
         return escape(str(input_value))
+
+
+def sanitize(input_value):
+    """Sanitize the strings in the input
+
+    Nested lists and dicts are walked iteratively (no recursion limit on the depth of the input).
+
+    :param input_value:
+    :return:
+    """
+    input_type = type(input_value)
+    if input_type != list and input_type != dict:
+        return _sanitize_value(input_value)
+
+    clean_value = [] if input_type == list else {}
+
+    # containers to sanitize, with their sanitized copy
+    containers = [(input_value, clean_value)]
+    while len(containers) > 0:
+        container, clean_container = containers.pop()
+        is_list = type(container) == list
+
+        for key, item in (enumerate(container) if is_list else container.items()):
+            item_type = type(item)
+            if item_type == list or item_type == dict:
+                clean_item = [] if item_type == list else {}
+                containers.append((item, clean_item))
+            else:
+                clean_item = _sanitize_value(item)
+
+            if is_list:
+                clean_container.append(clean_item)
+            else:
+                clean_container[_sanitize_value(key)] = clean_item
+
+    return clean_value
@@ -2,6 +2,7 @@
 """
 import importlib
 import json
+import logging
 from abc import ABCMeta, abstractmethod
 
 from django.http import HttpResponse
@@ -14,6 +15,11 @@ from core_parser_app.components.data_structure_element import api as data_struct
 from core_parser_app.components.module import api as module_api
 from core_parser_app.tools.modules.exceptions import ModuleError
 
+logger = logging.getLogger(__name__)
+
+# view functions (as_view) of the modules by view path, created once per process
+_module_view_functions = {}
+
 
 class AbstractModule(View):
     """Abstract module class
@@ -69,8 +75,9 @@ class AbstractModule(View):
 
         """
         module_id = request.GET['module_id']
-        url = request.GET['url'] if 'url' in request.GET else \
-            data_structure_element_api.get_by_id(module_id) .options['url']
+        # get module element
+        module_element = data_structure_element_api.get_by_id(module_id)
+        url = request.GET['url'] if 'url' in request.GET else module_element.options['url']
         template_data = {
             'module_id': module_id,
             'module': '',
@@ -86,16 +93,8 @@ class AbstractModule(View):
             # get nodule's data rendering
             template_data['display'] = self._render_data(request)
 
-            # get module element
-            module_element = data_structure_element_api.get_by_id(module_id)
-            # get its options
-            options = module_element.options
-            # update module element data
-            options['data'] = self.data
-            # set updated options
-            module_element.options = options
-            # save module element
-            data_structure_element_api.upsert(module_element)
+            # save module element data (if modified)
+            data_structure_element_api.update_module_options(module_element, {'data': self.data})
         except Exception, e:
             raise ModuleError('Something went wrong during module initialization: ' + e.message)
 
@@ -134,21 +133,18 @@ class AbstractModule(View):
             # retrieve module's data
             self.data = self._retrieve_data(request)
             template_data['display'] = self._render_data(request)
-            options = module_element.options
 
             # TODO: needs to be updated
             if type(self.data) == dict:
-                options['data'] = self.data['data']
-                options['attributes'] = self.data['attributes']
+                options = {'data': self.data['data'], 'attributes': self.data['attributes']}
             else:
-                options['data'] = self.data
+                options = {'data': self.data}
 
             # TODO Implement this system instead
             # options['content'] = self._get_content(request)
             # options['attributes'] = self._get_attributes(request)
 
-            module_element.options = options
-            data_structure_element_api.upsert(module_element)
+            data_structure_element_api.update_module_options(module_element, options)
         except Exception, e:
             raise ModuleError('Something went wrong during module update: ' + e.message)
 
@@ -215,8 +211,33 @@ class AbstractModule(View):
         :param url:
         :return:
         """
-        module = module_api.get_by_url(url)
-        return AbstractModule.get_view_from_view_path(module.view).as_view()
+        module_api.refresh_module_registry()
+        module = module_api.get_registered_module(url)
+        return AbstractModule.get_view_function_from_view_path(module.view)
+
+    @staticmethod
+    def get_view_function_from_view_path(view):
+        """Returns module view function (as_view) from its view string, resolved once per process
+
+        :param view:
+        :return:
+        """
+        if view not in _module_view_functions:
+            _module_view_functions[view] = AbstractModule.get_view_from_view_path(view).as_view()
+
+        return _module_view_functions[view]
+
+    @staticmethod
+    def init_module_views():
+        """Resolves the view functions of all the registered modules
+
+        :return:
+        """
+        for module in module_api.get_all():
+            try:
+                AbstractModule.get_view_function_from_view_path(module.view)
+            except Exception, e:
+                logger.warning("Module view {0} could not be resolved: {1}".format(module.view, e.message))
 
     @staticmethod
     def get_view_from_view_path(view):
@@ -225,7 +246,6 @@ class AbstractModule(View):
         :param view:
         :return:
         """
-        # module = module_api.get_by_url(url)
         pkglist = view.split('.')
 
         pkgs = '.'.join(pkglist[:-1])
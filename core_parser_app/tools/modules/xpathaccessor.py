@@ -55,17 +55,24 @@ class XPathAccessor(object):
     def _get_element(self, form_id, xpath):
         form_root = data_structure_element_api.get_by_id(form_id)
 
-        if self.element_has_xpath(form_root, xpath):
-            return form_root
+        # the xpath is usually held by a single element of the form: found with one indexed query
+        if form_root.root == form_root.id:
+            elements = data_structure_element_api.get_all_by_xpath(form_root.id, xpath)
+            if len(elements) == 1:
+                return elements[0]
 
-        if len(form_root.children) == 0:
-            return None
+        # several elements hold the xpath (or root ids not stored): first one in document order
+        return self._find_element(data_structure_element_api.get_subtree(form_root), xpath)
 
-        for child in form_root.children:
-            element = self._get_element(child.pk, xpath)
+    def _find_element(self, element, xpath):
+        if self.element_has_xpath(element, xpath):
+            return element
+
+        for child in element.children:
+            found_element = self._find_element(child, xpath)
 
-            if element is not None:
-                return element
+            if found_element is not None:
+                return found_element
 
     @staticmethod
     def element_has_xpath(element, xpath):
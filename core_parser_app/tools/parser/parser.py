@@ -5,27 +5,25 @@ import numbers
 import re
 import sys
 import traceback
-import urllib2
 from urlparse import parse_qsl
 
+from bson.objectid import ObjectId
 from lxml import etree
 
 from core_main_app.commons.exceptions import CoreError
-from core_main_app.utils.xsd_flattener.xsd_flattener_database_url import XSDFlattenerDatabaseOrURL
 from core_parser_app.components.data_structure_element import api as data_structure_element_api
 from core_parser_app.components.data_structure_element.models import DataStructureElement
 from core_parser_app.components.module import api as module_api
-from core_parser_app.settings import MODULE_TAG_NAME
 from core_parser_app.tools.parser.exceptions import ParserError
 from core_parser_app.tools.parser.renderer.list import ListRenderer
+from core_parser_app.tools.parser.utils.edit_data import EditDataIndex
 from core_parser_app.tools.parser.utils.rendering import format_tooltip
-from core_parser_app.tools.parser.utils.xml import get_app_info_options, \
+from core_parser_app.tools.parser.utils.schema import SchemaContextCache, get_compiled_schema, get_xsd_types_set, \
+    get_compiled_dependency, get_compiled_schema_of_tree
+from core_parser_app.tools.parser.utils.xml import AppInfoCache, \
     get_element_occurrences, get_attribute_occurrences, get_module_url
 from xml_utils.commons.constants import LXML_SCHEMA_NAMESPACE
-from xml_utils.xsd_tree.operations.appinfo import add_appinfo_child_to_element
-from xml_utils.xsd_tree.operations.namespaces import get_namespaces, get_default_prefix, get_target_namespace
-from xml_utils.xsd_tree.xsd_tree import XSDTree
-from xml_utils.xsd_types.xsd_types import get_xsd_types
+from xml_utils.xsd_tree.operations.namespaces import get_target_namespace
 
 logger = logging.getLogger(__name__)
 
@@ -34,13 +32,40 @@ logger = logging.getLogger(__name__)
 # Part I: Utilities
 ##################################################
 
-def load_schema_data_in_db(xsd_data):
+def load_schema_data_in_db(xsd_data, parent=None):
     """
     Load data in database
     :param xsd_data:
+    :param parent: element the tree is attached to (None for a new tree)
+    :return:
+    """
+    parent_id = None
+    root_id = None
+    if parent is not None:
+        parent_id = parent.id
+        root_id = data_structure_element_api.get_root_id(parent)
+
+    data_structure_elements = []
+    root_element = build_data_structure_element(xsd_data, data_structure_elements, parent_id, root_id)
+
+    # Saving the whole tree in one bulk insert
+    data_structure_element_api.insert_many(data_structure_elements)
+    return root_element
+
+
+def build_data_structure_element(xsd_data, data_structure_elements, parent_id=None, root_id=None):
+    """
+    Build the data structure elements of a tree, with pre-allocated ids, without saving them
+    :param xsd_data:
+    :param data_structure_elements: list collecting all built elements
+    :param parent_id:
+    :param root_id: id of the root of the tree (None if the element is the root)
     :return:
     """
     xsd_element = DataStructureElement()
+    xsd_element.id = ObjectId()
+    xsd_element.parent = parent_id
+    xsd_element.root = root_id if root_id is not None else xsd_element.id
     xsd_element.tag = xsd_data['tag']
 
     if xsd_data['value'] is not None:
@@ -66,7 +91,7 @@ def load_schema_data_in_db(xsd_data):
         children = []
 
         for child in xsd_data['children']:
-            child_db = load_schema_data_in_db(child)
+            child_db = build_data_structure_element(child, data_structure_elements, xsd_element.id, xsd_element.root)
             children.append(child_db)
 
         if len(children) > 0:
@@ -79,24 +104,17 @@ def load_schema_data_in_db(xsd_data):
             child_index = int(xsd_element.value)
             xsd_element.value = str(xsd_element.children[child_index].pk)
 
-    data_structure_element_api.upsert(xsd_element)
+    data_structure_elements.append(xsd_element)
     return xsd_element
 
 
-# TODO: look into using delete cascade
-# FIXME: not removing all data structure elements
 def delete_branch_from_db(element_id):
     """
     Delete a branch from the database
     :param element_id:
-    :return:
+    :return: number of deleted elements
     """
-    element = data_structure_element_api.get_by_id(element_id)
-
-    for child in element.children:
-        delete_branch_from_db(str(child.pk))
-
-    element.delete()
+    return data_structure_element_api.delete_branch(element_id)
 
 
 def update_branch_xpath(element):
@@ -106,11 +124,17 @@ def update_branch_xpath(element):
     :return:
     """
     element_xpath = element.options['xpath']['xml']
-    xpath_index = 1
+    # renumbered in memory, then written in one bulk write
+    branch = data_structure_element_api.get_subtree(element)
+    xpaths = []
+
+    for xpath_index, child in enumerate(branch.children, 1):
+        xpaths.extend(get_root_xpath_updates(child, element_xpath, xpath_index))
+
+    data_structure_element_api.update_xml_xpaths(xpaths)
 
-    for child in element.children:
-        update_root_xpath(child, element_xpath, xpath_index)
-        xpath_index += 1
+    # the descendants have been modified
+    data_structure_element_api.update_subtree_version(element)
 
 
 # TODO: needs to be reworked
@@ -124,8 +148,8 @@ def remove_child_element(data_structure_element, to_remove):
     Returns:
 
     """
-    # remove child from element
-    data_structure_element_api.pull_children(data_structure_element, to_remove)
+    # remove child from element (deleted below, not detached)
+    data_structure_element_api.pull_children(data_structure_element, to_remove, detach=False)
     # update children xpaths
     update_branch_xpath(data_structure_element)
 
@@ -157,20 +181,38 @@ def update_root_xpath(element, xpath, index):
     :param index:
     :return:
     """
-    element_options = element.options
+    branch = data_structure_element_api.get_subtree(element)
+    data_structure_element_api.update_xml_xpaths(get_root_xpath_updates(branch, xpath, index))
 
-    if 'xpath' in element_options:
-        xml_xpath = element_options['xpath']['xml']
-        element_options['xpath']['xml'] = xml_xpath.replace(xpath + '[1]', xpath + '[' + str(index) + ']', 1)
 
-        element.update(set__options=element_options)
-        element.reload()
+def get_root_xpath_updates(element, xpath, index, current_index=1):
+    """
+    Return the new xml xpaths of the element and of its descendants, with the root at the given index
+    :param element: element with its descendants loaded in memory
+    :param xpath:
+    :param index:
+    :param current_index: index of the root in the current xpaths
+    :return: list of (element, xml xpath), for the modified xpaths only
+    """
+    xpaths = []
+    elements = [element]
+
+    while len(elements) > 0:
+        current_element = elements.pop()
 
-    for child in element.children:
-        update_root_xpath(child, xpath, index)
+        if 'xpath' in current_element.options:
+            xml_xpath = current_element.options['xpath']['xml']
+            new_xml_xpath = xml_xpath.replace(xpath + '[' + str(current_index) + ']', xpath + '[' + str(index) + ']', 1)
 
+            if new_xml_xpath != xml_xpath:
+                xpaths.append((current_element, new_xml_xpath))
 
-def get_nodes_xpath(elements, xml_tree, download_enabled=True):
+        elements.extend(reversed(current_element.children))
+
+    return xpaths
+
+
+def get_nodes_xpath(elements, xml_tree, download_enabled=True, schema_contexts=None):
     """Perform a lookup in subelements to build xpath.
 
     Get nodes' xpath, only one level deep. It's not going to every leaves. Only need to know if the
@@ -180,9 +222,13 @@ def get_nodes_xpath(elements, xml_tree, download_enabled=True):
         elements: XML element
         xml_tree: xml_tree
         download_enabled:
+        schema_contexts: schema contexts of the current parse
     """
     # FIXME Making one function with get_subnode_xpath should be possible, both are doing the same job
     # FIXME same problems as in get_subnodes_xpath
+    if schema_contexts is None:
+        schema_contexts = SchemaContextCache()
+
     xpaths = []
     element_tag = None
     schema_location = None
@@ -199,21 +245,23 @@ def get_nodes_xpath(elements, xml_tree, download_enabled=True):
                     element_tag = 'attribute'
 
                 # get schema namespaces
-                xml_tree_str = etree.tostring(xml_tree)
-                namespaces = get_namespaces(xml_tree_str)
+                namespaces = schema_contexts.get(xml_tree).namespaces
                 ref = element.attrib['ref']
                 ref_element, ref_tree, schema_location = get_ref_element(xml_tree, ref, namespaces,
                                                                          element_tag, schema_location,
-                                                                         download_enabled=download_enabled)
+                                                                         download_enabled=download_enabled,
+                                                                         schema_contexts=schema_contexts)
 
                 if ref_element is not None:
                     xpaths.append({'name': ref_element.attrib.get('name'), 'element': ref_element})
         else:
-            xpaths.extend(get_nodes_xpath(element, xml_tree, download_enabled=download_enabled))
+            xpaths.extend(get_nodes_xpath(element, xml_tree, download_enabled=download_enabled,
+                                          schema_contexts=schema_contexts))
     return xpaths
 
 
-def lookup_occurs(element, xml_tree, full_path, edit_data_tree, download_enabled=True):
+def lookup_occurs(element, xml_tree, full_path, edit_data_tree, download_enabled=True, schema_contexts=None,
+                  edit_data_index=None):
     """Do a lookup in data to get the number of occurrences of a sequence or choice without a name (not within a named
     complextype).
 
@@ -230,38 +278,47 @@ def lookup_occurs(element, xml_tree, full_path, edit_data_tree, download_enabled
         xml_tree: XML schema tree
         full_path: current node XPath
         edit_data_tree: XML data tree
+        download_enabled:
+        schema_contexts: schema contexts of the current parse
+        edit_data_index: index of the XML data tree
     """
+    if schema_contexts is None:
+        schema_contexts = SchemaContextCache()
+
+    if edit_data_index is None:
+        edit_data_index = EditDataIndex(edit_data_tree)
+
     # FIXME this function is not returning the correct output
     # get all possible xpaths of sub nodes
-    xpaths = get_nodes_xpath(element, xml_tree, download_enabled=download_enabled)
+    xpaths = get_nodes_xpath(element, xml_tree, download_enabled=download_enabled, schema_contexts=schema_contexts)
     elements_found = []
 
     # get target namespace prefix if one declared
-    xml_tree_str = etree.tostring(xml_tree)
-    namespaces = get_namespaces(xml_tree_str)
-    target_namespace, target_namespace_prefix = get_target_namespace(xml_tree, namespaces)
+    schema_context = schema_contexts.get(xml_tree)
+    namespaces = schema_context.namespaces
+    target_namespace = schema_context.target_namespace
+    target_namespace_prefix = schema_context.target_namespace_prefix
 
     # check if xpaths find a match in the document
     for xpath in xpaths:
-        edit_elements = edit_data_tree.xpath(full_path + '/' + target_namespace_prefix + xpath['name'],
-                                             namespaces=namespaces)
         element_path = get_xml_xpath(xml_tree, full_path, "element", xpath['name'], target_namespace,
                                      target_namespace_prefix)
-        edit_elements = edit_data_tree.xpath(element_path, namespaces=namespaces)
+        edit_elements = edit_data_index.xpath(element_path, namespaces=namespaces)
         elements_found.extend(edit_elements)
 
     return elements_found
 
 
-def is_module_multiple(element):
+def is_module_multiple(element, app_info_cache=None):
     """ Checks if the module is multiple (means it manages the occurrences)
 
     :param element:
+    :param app_info_cache: app info of the current parse
     :return:
     """
-    module_url = get_module_url(element)
+    module_url = app_info_cache.get_module_url(element) if app_info_cache is not None else get_module_url(element)
     if module_url is not None:
-        module = module_api.get_by_url(module_url.path)
+        module = module_api.get_registered_module(module_url.path)
         return module.multiple
 
     return False
@@ -311,7 +368,7 @@ def get_xml_element_data(xsd_element, xml_element):
 
 
 def get_element_type(element, xml_tree, namespaces, default_prefix, target_namespace_prefix, schema_location=None,
-                     attr='type', download_enabled=True):
+                     attr='type', download_enabled=True, schema_contexts=None):
     """ Get XSD type to render. Returns the tree where the type was found.
 
     Parameters:
@@ -323,6 +380,7 @@ def get_element_type(element, xml_tree, namespaces, default_prefix, target_names
         schema_location:
         attr:
         download_enabled
+        schema_contexts: schema contexts of the current parse (named types resolved once per parse)
 
     Returns the type if found
         - complexType
@@ -336,7 +394,52 @@ def get_element_type(element, xml_tree, namespaces, default_prefix, target_names
         - tree where the type has been found
         - schema location where the type has been found
     """
+    type_name = element.attrib.get(attr)
+
+    # types declared below the element and built-in types are not looked up in the schemas
+    if type_name is None or type_name in get_xsd_types_set(default_prefix):
+        return _resolve_element_type(element, xml_tree, namespaces, default_prefix, target_namespace_prefix,
+                                     schema_location, attr, download_enabled)
+
+    if schema_contexts is None:
+        schema_contexts = SchemaContextCache()
+
+    # qualified name as written, with the namespace of its prefix where the element is declared
+    type_ns_prefix = type_name.split(':')[0] if ':' in type_name else None
+    qname = (element.nsmap.get(type_ns_prefix, namespaces.get(type_ns_prefix)), type_name)
+
+    def resolve():
+        return _resolve_element_type(element, xml_tree, namespaces, default_prefix, target_namespace_prefix, None,
+                                     attr, download_enabled)
+
+    element_type, type_tree, type_schema_location = schema_contexts.get_component(xml_tree, qname, 'type', resolve)
 
+    # type found in the same tree
+    if type_tree is xml_tree:
+        type_schema_location = schema_location
+
+    return element_type, type_tree, type_schema_location
+
+
+def _resolve_element_type(element, xml_tree, namespaces, default_prefix, target_namespace_prefix,
+                          schema_location=None, attr='type', download_enabled=True):
+    """ Look for the XSD type to render (see get_element_type)
+
+    Parameters:
+        element: XML element
+        xml_tree: XSD tree of the template
+        namespaces:
+        default_prefix:
+        target_namespace_prefix:
+        schema_location:
+        attr:
+        download_enabled
+
+    Returns:
+        - type
+        - tree where the type has been found
+        - schema location where the type has been found
+    """
     element_type = None
     try:
         if attr not in element.attrib:  # element with type declared below it
@@ -346,7 +449,7 @@ def get_element_type(element, xml_tree, namespaces, default_prefix, target_names
                     element_type = element[i]
                     break
         else:  # element with type attribute
-            if element.attrib.get(attr) in get_xsd_types(default_prefix):
+            if element.attrib.get(attr) in get_xsd_types_set(default_prefix):
                 element_type = element.attrib.get(attr)
                 # if default prefix in type name
                 if element_type.startswith(default_prefix) and default_prefix != "":
@@ -356,6 +459,8 @@ def get_element_type(element, xml_tree, namespaces, default_prefix, target_names
                 # TODO: manage namespaces
                 # test if type of the element is a simpleType
                 type_name = element.attrib.get(attr)
+                type_namespace = None
+                is_imported = False
                 if ':' in type_name:
                     type_ns_prefix = type_name.split(":")[0]
                     type_name = type_name.split(":")[1]
@@ -366,25 +471,23 @@ def get_element_type(element, xml_tree, namespaces, default_prefix, target_names
                         # find the referred document using the prefix
                         # the namespace is declared inline
                         if type_ns_prefix in element.nsmap:
-                            for el_import in imports:
-                                import_ns = el_import.attrib['namespace']
-                                if element.nsmap[type_ns_prefix] == import_ns:
-                                    xml_tree, schema_location = import_xml_tree(el_import, download_enabled)
-                                    break
-                        else:
-                            if type_ns_prefix in namespaces:
-                                for el_import in imports:
-                                    import_ns = el_import.attrib['namespace']
-                                    if namespaces[type_ns_prefix] == import_ns:
-                                        xml_tree, schema_location = import_xml_tree(el_import, download_enabled)
-                                        break
-
-                xpath = "./{0}complexType[@name='{1}']".format(LXML_SCHEMA_NAMESPACE, type_name)
-                element_type = xml_tree.find(xpath)
-                if element_type is None:
-                    # test if type of the element is a simpleType
-                    xpath = "./{0}simpleType[@name='{1}']".format(LXML_SCHEMA_NAMESPACE, type_name)
-                    element_type = xml_tree.find(xpath)
+                            type_namespace = element.nsmap[type_ns_prefix]
+                        elif type_ns_prefix in namespaces:
+                            type_namespace = namespaces[type_ns_prefix]
+
+                        for el_import in imports:
+                            import_ns = el_import.attrib['namespace']
+                            if type_namespace is not None and type_namespace == import_ns:
+                                xml_tree, schema_location = import_xml_tree(el_import, download_enabled)
+                                is_imported = True
+                                break
+
+                # type from another namespace, not imported by the tree: not a type of the tree
+                if type_namespace is not None and not is_imported and \
+                        type_namespace != xml_tree.getroot().attrib.get('targetNamespace'):
+                    return None, xml_tree, schema_location
+
+                element_type = find_type(xml_tree, type_name)
     except Exception as e:
         exception_message = "Something went wrong in get_element_type:  " + str(e)
         logger.fatal(exception_message)
@@ -406,29 +509,85 @@ def import_xml_tree(el_import, download_enabled=True):
     schema_location = ref_xml_schema_url
     # download the file
     if download_enabled:
-        ref_xml_schema_file = urllib2.urlopen(ref_xml_schema_url)
-        # read the content of the file
-        ref_xml_schema_content = ref_xml_schema_file.read()
-        # build the tree
-        xml_tree = XSDTree.build_tree(ref_xml_schema_content)
-        # look for includes
-        includes = xml_tree.findall('//{}include'.format(LXML_SCHEMA_NAMESPACE))
-        # if includes are present
-        if len(includes) > 0:
-            # create a flattener with the file content
-            flattener = XSDFlattenerDatabaseOrURL(ref_xml_schema_content, download_enabled)
-            # flatten the includes
-            ref_xml_schema_content = flattener.get_flat()
-            # build the tree
-            xml_tree = XSDTree.build_tree(ref_xml_schema_content)
+        # get the tree from the compiled schemas (downloaded and flattened once per content)
+        xml_tree = get_compiled_dependency(ref_xml_schema_url, download_enabled).xml_tree
         return xml_tree, schema_location
     else:
         raise ParserError('Dependency could not be downloaded')
 
 
-def get_ref_element(xml_tree, ref, namespaces, element_tag, schema_location=None, download_enabled=True):
+def find_type(xml_tree, type_name):
+    """
+    Return the global complex type, or else simple type, with the given name (None if not found)
+    :param xml_tree:
+    :param type_name:
+    :return:
+    """
+    compiled_schema = get_compiled_schema_of_tree(xml_tree)
+    if compiled_schema is not None:
+        return compiled_schema.get_type(type_name)
+
+    element_type = xml_tree.find("./{0}complexType[@name='{1}']".format(LXML_SCHEMA_NAMESPACE, type_name))
+    if element_type is None:
+        # test if type of the element is a simpleType
+        element_type = xml_tree.find("./{0}simpleType[@name='{1}']".format(LXML_SCHEMA_NAMESPACE, type_name))
+    return element_type
+
+
+def find_component(xml_tree, element_tag, name):
+    """
+    Return the global component with the given tag and name (None if not found)
+    :param xml_tree:
+    :param element_tag:
+    :param name:
+    :return:
+    """
+    compiled_schema = get_compiled_schema_of_tree(xml_tree)
+    if compiled_schema is not None:
+        return compiled_schema.get_component(element_tag, name)
+
+    return xml_tree.find("./{0}{1}[@name='{2}']".format(LXML_SCHEMA_NAMESPACE, element_tag, name))
+
+
+def get_ref_element(xml_tree, ref, namespaces, element_tag, schema_location=None, download_enabled=True,
+                    schema_contexts=None):
     """
 
+    Parameters:
+        xml_tree:
+        ref:
+        namespaces:
+        element_tag:
+        schema_location:
+        download_enabled:
+        schema_contexts: schema contexts of the current parse (refs resolved once per parse)
+
+    Returns
+        - ref_element: ref element when found
+        - xml_tree: xml tree where element was found
+        - schema_location: location of the schema where the element was found
+    """
+    if schema_contexts is None:
+        schema_contexts = SchemaContextCache()
+
+    # qualified name as written, with the namespace of its prefix
+    qname = (namespaces.get(ref.split(':')[0]) if ':' in ref else None, ref)
+
+    def resolve():
+        return _resolve_ref_element(xml_tree, ref, namespaces, element_tag, None, download_enabled)
+
+    ref_element, ref_tree, ref_schema_location = schema_contexts.get_component(xml_tree, qname, element_tag, resolve)
+
+    # element found in the same tree
+    if ref_tree is xml_tree:
+        ref_schema_location = schema_location
+
+    return ref_element, ref_tree, ref_schema_location
+
+
+def _resolve_ref_element(xml_tree, ref, namespaces, element_tag, schema_location=None, download_enabled=True):
+    """ Look for the referenced element (see get_ref_element)
+
     Parameters:
         xml_tree:
         ref:
@@ -453,8 +612,7 @@ def get_ref_element(xml_tree, ref, namespaces, element_tag, schema_location=None
         target_namespace, target_namespace_prefix = get_target_namespace(xml_tree, namespaces)
         # ref is in the same file
         if target_namespace_prefix == ref_namespace_prefix:
-            ref_element = xml_tree.find("./{0}{1}[@name='{2}']".format(LXML_SCHEMA_NAMESPACE,
-                                                                       element_tag, ref_name))
+            ref_element = find_component(xml_tree, element_tag, ref_name)
         else:  # the ref might be in one of the imports
             # get all import elements
             imports = xml_tree.findall('//{}import'.format(LXML_SCHEMA_NAMESPACE))
@@ -464,11 +622,10 @@ def get_ref_element(xml_tree, ref, namespaces, element_tag, schema_location=None
                 if namespaces[ref_namespace_prefix] == import_ns:
                     xml_tree, schema_location = import_xml_tree(el_import, download_enabled)
 
-                    ref_element = xml_tree.find("./{0}{1}[@name='{2}']".format(LXML_SCHEMA_NAMESPACE,
-                                                                               element_tag, ref_name))
+                    ref_element = find_component(xml_tree, element_tag, ref_name)
                     break
     else:
-        ref_element = xml_tree.find("./{0}{1}[@name='{2}']".format(LXML_SCHEMA_NAMESPACE, element_tag, ref))
+        ref_element = find_component(xml_tree, element_tag, ref)
 
     return ref_element, xml_tree, schema_location
 
@@ -551,29 +708,42 @@ def get_element_namespace(element, xsd_tree):
     return element_ns
 
 
-def get_extensions(xml_doc_tree, base_type_name):
+def get_extensions(xml_doc_tree, base_type_name, schema_contexts=None, download_enabled=True):
     """
-    Get all XML extensions of the XML Schema
+    Get all XML extensions of the XML Schema, and of the schemas it imports
+
+    When the download is enabled, every schema imported by the tree is looked up: an imported schema not used
+    otherwise is downloaded on the first lookup (once per process by the schema cache, revalidated after
+    PARSER_SCHEMA_CACHE_TTL, and once per parse by the schema contexts). An import that can't be downloaded is logged
+    and skipped for the rest of the parse.
     :param xml_doc_tree:
     :param base_type_name:
+    :param schema_contexts: schema contexts of the current parse
+    :param download_enabled: False to look up the extensions of the tree only
     :return:
     """
-    # TODO: look for extensions in imported documents
-    # get all extensions of the document
-    extensions = xml_doc_tree.findall(".//{0}extension".format(LXML_SCHEMA_NAMESPACE))
-    # keep only simple/complex type extensions, no built-in types
-    custom_type_extensions = []
-    for extension in extensions:
-        base = extension.attrib['base']
-        # TODO: manage namespaces
-        if ":" in base:
-            base = base.split(':')[1]
-        if base_type_name == base:
-            # get parent type that contains the extension
-            type_extension = extension.getparent()
-            while 'simpleType' not in type_extension.tag and 'complexType' not in type_extension.tag:
-                type_extension = type_extension.getparent()
-            custom_type_extensions.append(type_extension)
+    if schema_contexts is None:
+        schema_contexts = SchemaContextCache()
+
+    # extensions of the document, indexed once per tree
+    schema_context = schema_contexts.get(xml_doc_tree)
+    custom_type_extensions = schema_context.get_extensions(base_type_name)
+
+    if download_enabled:
+        # extensions of the type in the imported documents (base type from the target namespace of the document)
+        for namespace, schema_location in schema_context.get_imports():
+            try:
+                import_tree = schema_contexts.get_dependency_tree(schema_location, download_enabled)
+            except Exception, e:
+                logger.warning("Extensions of {0} could not be looked up in {1}: {2}".format(base_type_name,
+                                                                                             schema_location,
+                                                                                             str(e)))
+                continue
+
+            custom_type_extensions.extend(
+                schema_contexts.get(import_tree).get_extensions(base_type_name,
+                                                                base_namespace=schema_context.target_namespace)
+            )
 
     return custom_type_extensions
 
@@ -659,21 +829,66 @@ class XSDParser(object):
         self.keys = {}
         self.keyrefs = {}
 
-    def generate_form(self, xsd_doc_data, xml_doc_data=None):
+        # namespace information of the schema trees, computed once per parse
+        self.schema_contexts = SchemaContextCache()
+        # app info and modules of the schema elements, parsed once per parse
+        self.app_info_cache = AppInfoCache()
+        # index of the XML data loaded for edition
+        self.edit_data_index = None
+        # occurrences ('min', 'max') replacing the ones of the schema, by schema element (the schema is read only)
+        self.forced_occurrences = {}
+
+    def get_element_occurrences(self, element):
+        """ Return the min/max occurrences of the element, from the schema or from the forced occurrences
+
+        Args:
+            element:
+
+        Returns:
+
+        """
+        min_occurs, max_occurs = get_element_occurrences(element)
+
+        forced_occurrences = self.forced_occurrences.get(element)
+        if forced_occurrences is not None:
+            min_occurs = forced_occurrences.get('min', min_occurs)
+            max_occurs = forced_occurrences.get('max', max_occurs)
+
+        return min_occurs, max_occurs
+
+    def get_edit_data_index(self, edit_data_tree):
+        """ Return the index of the XML data tree, built on first access
+
+        Args:
+            edit_data_tree:
+
+        Returns:
+
+        """
+        if self.edit_data_index is None or self.edit_data_index.xml_tree is not edit_data_tree:
+            self.edit_data_index = EditDataIndex(edit_data_tree)
+
+        return self.edit_data_index
+
+    def generate_form(self, xsd_doc_data, xml_doc_data=None, template_id=None):
         """ Generate form data structure form XML Schema
 
         Args:
             xsd_doc_data:
             xml_doc_data:
+            template_id: id of the template of the schema, used to cache the compiled schema
 
         Returns:
 
         """
+        # start the parse with fresh schema contexts
+        self.schema_contexts.clear()
+        self.app_info_cache.clear()
+        module_api.refresh_module_registry()
 
-        # flatten the includes
-        flattener = XSDFlattenerDatabaseOrURL(xsd_doc_data, self.download_dependencies)
-        xml_doc_tree_str = flattener.get_flat()
-        xml_doc_tree = XSDTree.build_tree(xml_doc_tree_str)
+        # get the flattened schema (flattened once per template and content)
+        compiled_schema = get_compiled_schema(xsd_doc_data, template_id, self.download_dependencies)
+        xml_doc_tree = compiled_schema.xml_tree
 
         # if editing, get the XML data to fill the form
         edit_data_tree = None
@@ -690,13 +905,15 @@ class XSDParser(object):
                 self.editing = True
                 # load the XML tree from the text
                 edit_data_tree = etree.XML(str(xml_doc_data.encode('utf-8')))
+                # index the XML tree in one pass
+                self.get_edit_data_index(edit_data_tree)
             else:
                 self.editing = False
         else:  # no data found, not editing
             self.editing = False
 
         # find all root elements
-        elements = xml_doc_tree.findall("./{0}element".format(LXML_SCHEMA_NAMESPACE))
+        elements = compiled_schema.global_elements
 
         try:
             form_content = ""
@@ -708,7 +925,7 @@ class XSDParser(object):
                 # look if a default choice to render is defined
                 default_choice = False
                 for element in elements:
-                    app_info = get_app_info_options(element)
+                    app_info = self.app_info_cache.get_app_info_options(element)
                     if 'default' in app_info:
                         form_content = self.generate_element(element,
                                                              xml_doc_tree,
@@ -722,12 +939,12 @@ class XSDParser(object):
             else:  # len(elements) == 0 (no root element)
                 # fixed always false because fixed cannot be on the type
                 # TODO: does it make sense to get all simple types too?
-                complex_types = xml_doc_tree.findall("./{0}complexType".format(LXML_SCHEMA_NAMESPACE))
+                complex_types = compiled_schema.complex_types
                 if len(complex_types) > 0:
                     # look if a default choice to render is defined
                     default_choice = False
                     for complex_type in complex_types:
-                        app_info = get_app_info_options(complex_type)
+                        app_info = self.app_info_cache.get_app_info_options(complex_type)
                         if 'default' in app_info:
                             form_content = self.generate_choice_extensions([complex_type],
                                                                            xml_doc_tree,
@@ -739,7 +956,7 @@ class XSDParser(object):
                                                                        xml_doc_tree,
                                                                        edit_data_tree=edit_data_tree)
                 else:  # len(complex_types) == 0
-                    simple_types = xml_doc_tree.findall("./{0}simpleType".format(LXML_SCHEMA_NAMESPACE))
+                    simple_types = compiled_schema.simple_types
                     if len(simple_types) == 1:  # 1 simple type found
                         form_content = self.generate_simple_type(simple_types[0],
                                                                  xml_doc_tree,
@@ -769,6 +986,8 @@ class XSDParser(object):
 
             self.editing = False
             raise Exception(exception_message)
+        finally:
+            self.edit_data_index = None
 
     def generate_element(self, element, xml_tree, choice_counter=None, full_path="", edit_data_tree=None,
                          schema_location=None, xml_element=None, force_generation=False):
@@ -790,16 +1009,16 @@ class XSDParser(object):
         # FIXME if elif without else need to be corrected
         # FIXME Support for unique is not present
         # FIXME Support for key / keyref
-        app_info = get_app_info_options(element)
+        app_info = self.app_info_cache.get_app_info_options(element)
 
         # check if the element has a module
         _has_module = False
         _is_multiple = False
         if not self.ignore_modules:
-            module_url = get_module_url(element)
+            module_url = self.app_info_cache.get_module_url(element)
             _has_module = True if module_url is not None else False
             # check if the module manages the occurrences by itself
-            _is_multiple = is_module_multiple(element) if _has_module else False
+            _is_multiple = is_module_multiple(element, self.app_info_cache) if _has_module else False
 
         # FIXME see if we can avoid these basic initialization
         # FIXME this is not necessarily true (see attributes)
@@ -813,15 +1032,14 @@ class XSDParser(object):
 
         # check if XML element or attribute
         if element.tag == "{0}element".format(LXML_SCHEMA_NAMESPACE):
-            min_occurs, max_occurs = get_element_occurrences(element)
+            min_occurs, max_occurs = self.get_element_occurrences(element)
             element_tag = 'element'
         elif element.tag == "{0}attribute".format(LXML_SCHEMA_NAMESPACE):
             min_occurs, max_occurs = get_attribute_occurrences(element)
             element_tag = 'attribute'
 
         # get schema namespaces
-        xml_tree_str = etree.tostring(xml_tree)
-        namespaces = get_namespaces(xml_tree_str)
+        namespaces = self.schema_contexts.get(xml_tree).namespaces
 
         db_element = {
             'tag': element_tag,  # 'element' or 'attribute'
@@ -848,14 +1066,15 @@ class XSDParser(object):
             download_enabled = self.download_dependencies
             ref_element, xml_tree, schema_location = get_ref_element(xml_tree, ref, namespaces,
                                                                      element_tag, schema_location,
-                                                                     download_enabled=download_enabled)
+                                                                     download_enabled=download_enabled,
+                                                                     schema_contexts=self.schema_contexts)
             if ref_element is not None:
                 text_capitalized = ref_element.attrib.get('name')
                 element = ref_element
                 # check if the element has a module
                 _has_module = False
                 if not self.ignore_modules:
-                    module_url = get_module_url(element)
+                    module_url = self.app_info_cache.get_module_url(element)
                     _has_module = True if module_url is not None else False
             else:
                 # the element was not found where it was supposed to be
@@ -867,9 +1086,10 @@ class XSDParser(object):
         else:
             text_capitalized = element.attrib.get('name')
 
-        xml_tree_str = etree.tostring(xml_tree)
-        namespaces = get_namespaces(xml_tree_str)
-        target_namespace, target_namespace_prefix = get_target_namespace(xml_tree, namespaces)
+        schema_context = self.schema_contexts.get(xml_tree)
+        namespaces = schema_context.namespaces
+        target_namespace = schema_context.target_namespace
+        target_namespace_prefix = schema_context.target_namespace_prefix
 
         full_path = get_xml_xpath(xml_tree, full_path, element_tag, text_capitalized, target_namespace,
                                   target_namespace_prefix, is_ref)
@@ -895,7 +1115,7 @@ class XSDParser(object):
         if self.editing:
             if xml_element is None:
                 # get the number of occurrences in the data
-                edit_elements = edit_data_tree.xpath(full_path, namespaces=namespaces)
+                edit_elements = self.get_edit_data_index(edit_data_tree).xpath(full_path, namespaces=namespaces)
                 nb_occurrences_data = len(edit_elements)
             else:
                 if xml_element is False:  # explicitly say to not generate the element
@@ -927,14 +1147,11 @@ class XSDParser(object):
         # set the element namespace
         # tag_ns = ' xmlns="{0}" '.format(element_ns) if element_ns is not None else ''
         ns_prefix = None
-        if element_tag == "attribute" and target_namespace is not None:
-            for prefix, ns in namespaces.iteritems():
-                if ns == target_namespace:
-                    ns_prefix = prefix
-                    break
+        if element_tag == "attribute":
+            ns_prefix = schema_context.ns_prefix
 
         # get the element type
-        default_prefix = get_default_prefix(namespaces)
+        default_prefix = schema_context.default_prefix
 
         db_element['options']['schema_location'] = schema_location
         db_element['options']['xmlns'] = element_ns
@@ -943,7 +1160,8 @@ class XSDParser(object):
         download_enabled = self.download_dependencies
         element_type, xml_tree, schema_location = get_element_type(element, xml_tree, namespaces,
                                                                    default_prefix, target_namespace_prefix,
-                                                                   schema_location, download_enabled=download_enabled)
+                                                                   schema_location, download_enabled=download_enabled,
+                                                                   schema_contexts=self.schema_contexts)
 
         # management of elements inside a choice (don't display if not part of the currently selected choice)
         if choice_counter is not None:
@@ -1080,7 +1298,7 @@ class XSDParser(object):
 
         return db_element
 
-    def generate_element_absent(self, request, element_id, xsd_doc_data, renderer_class=ListRenderer):
+    def generate_element_absent(self, request, element_id, xsd_doc_data, renderer_class=ListRenderer, template_id=None):
         """ Generate data structure for an XML element absent from the tree
 
         Args:
@@ -1088,53 +1306,42 @@ class XSDParser(object):
             element_id:
             xsd_doc_data:
             renderer_class:
+            template_id: id of the template of the schema, used to cache the compiled schema
 
         Returns:
 
         """
+        # start the parse with fresh schema contexts
+        self.schema_contexts.clear()
+        self.app_info_cache.clear()
+        module_api.refresh_module_registry()
 
         sub_element = data_structure_element_api.get_by_id(element_id)
-        element_list = data_structure_element_api.get_all_by_child_id(element_id)
+        schema_element = data_structure_element_api.get_parent_element(sub_element)
 
         if self.auto_key_keyref:
             self.init_key_keyref(sub_element)
 
-        if len(element_list) == 0:
+        if schema_element is None:
             raise ValueError("No SchemaElement found")
-        elif len(element_list) > 1:
-            raise ValueError("More than one SchemaElement found")
-
-        schema_element = element_list[0]
 
         schema_location = None
         if 'schema_location' in schema_element.options:
             schema_location = schema_element.options['schema_location']
 
         # if the xml element is from an imported schema
+        download_enabled = self.download_dependencies
         if schema_location is not None:
-            # open the imported file
-            download_enabled = self.download_dependencies
+            # get the imported schema (downloaded and flattened once per content)
             if download_enabled:
-                ref_xml_schema_file = urllib2.urlopen(schema_element.options['schema_location'])
-                # get the content of the file
-                ref_xml_schema_content = ref_xml_schema_file.read()
-                # build the XML tree
-                xml_doc_tree = XSDTree.build_tree(ref_xml_schema_content)
-                # get the namespaces from the imported schema
-                namespaces = get_namespaces(ref_xml_schema_content)
+                compiled_schema = get_compiled_dependency(schema_location, download_enabled)
             else:
                 raise ParserError('Dependency could not be downloaded')
         else:
-            # build the XML tree
-            xml_doc_tree = XSDTree.build_tree(xsd_doc_data)
-            # get the namespaces
-            namespaces = get_namespaces(xsd_doc_data)
+            # get the flattened schema (flattened once per template and content)
+            compiled_schema = get_compiled_schema(xsd_doc_data, template_id, download_enabled)
 
-        # flatten the includes
-        download_enabled = self.download_dependencies
-        flattener = XSDFlattenerDatabaseOrURL(etree.tostring(xml_doc_tree), download_enabled)
-        xml_doc_tree_str = flattener.get_flat()
-        xml_doc_tree = XSDTree.build_tree(xml_doc_tree_str)
+        xml_doc_tree = compiled_schema.xml_tree
 
         xpath_element = schema_element.options['xpath']
         xsd_xpath = xpath_element['xsd']
@@ -1143,61 +1350,72 @@ class XSDParser(object):
         if 'xml' in xpath_element:
             xml_xpath = xpath_element['xml']
 
-        xml_element = xml_doc_tree.xpath(xsd_xpath, namespaces=namespaces)[0]
+        xml_element = compiled_schema.get_element_by_xpath(xsd_xpath)
 
-        if 'min' in schema_element.options:
-            xml_element.attrib['minOccurs'] = str(schema_element.options['min'])
+        # occurrences of the schema element, given to the generation (the compiled schema is shared, read only)
+        self.forced_occurrences = {
+            xml_element: {name: schema_element.options[name] for name in ('min', 'max')
+                          if name in schema_element.options}
+        }
 
-        if 'max' in schema_element.options:
-            if schema_element.options['max'] != -1:
-                xml_element.attrib['maxOccurs'] = str(schema_element.options['max'])
+        try:
+            # generating a choice, generate the parent element
+            if schema_element.tag == "choice":
+                # can use generate_element to generate a choice never generated
+                db_tree = self.generate_choice(xml_element, xml_doc_tree,
+                                               full_path=xml_xpath,
+                                               force_generation=True)
+            elif schema_element.tag == 'sequence':
+                db_tree = self.generate_sequence(xml_element, xml_doc_tree,
+                                                 full_path=xml_xpath,
+                                                 force_generation=True)
             else:
-                xml_element.attrib['maxOccurs'] = "unbounded"
-
-        # generating a choice, generate the parent element
-        if schema_element.tag == "choice":
-            # can use generate_element to generate a choice never generated
-            db_tree = self.generate_choice(xml_element, xml_doc_tree,
-                                           full_path=xml_xpath,
-                                           force_generation=True)
-        elif schema_element.tag == 'sequence':
-            db_tree = self.generate_sequence(xml_element, xml_doc_tree,
-                                             full_path=xml_xpath,
-                                             force_generation=True)
-        else:
-            # can't directly use generate_element because only need the body of the element not its title
-            # provide xpath without element name because already generated in generate_element
-            db_tree = self.generate_element(xml_element, xml_doc_tree, full_path=xml_xpath.rsplit('/', 1)[0],
-                                            force_generation=True)
-
-        # Saving the tree in MongoDB
-        tree_root = load_schema_data_in_db(db_tree)
+                # can't directly use generate_element because only need the body of the element not its title
+                # provide xpath without element name because already generated in generate_element
+                db_tree = self.generate_element(xml_element, xml_doc_tree, full_path=xml_xpath.rsplit('/', 1)[0],
+                                                force_generation=True)
+        finally:
+            self.forced_occurrences = {}
+
+        # Building the tree in memory: the generated element is attached to the schema element, its wrapper (built
+        # last) is only used for the rendering and is never saved
+        data_structure_elements = []
+        tree_root = build_data_structure_element(db_tree, data_structure_elements, schema_element.id,
+                                                 data_structure_element_api.get_root_id(schema_element))
         generated_element = tree_root.children[0]
+        generated_element.parent = schema_element.id
 
-        # Updating the schema element
-        children = schema_element.children
-        element_index = children.index(sub_element)
-
-        children.insert(element_index + 1, generated_element)
-        schema_element.update(set__children=children)
+        element_index = schema_element.children.index(sub_element)
+        is_sub_element_pulled = len(sub_element.children) == 0
 
-        if len(sub_element.children) == 0:
-            schema_element_to_pull = data_structure_element_api.get_by_id(element_id)
-            schema_element.update(pull__children=schema_element_to_pull)
+        # numbering the xpaths of the generated branch at its final position, before saving it
+        xpath_index = element_index + 1 if is_sub_element_pulled else element_index + 2
+        for element, xml_xpath in get_root_xpath_updates(generated_element, schema_element.options['xpath']['xml'],
+                                                         xpath_index):
+            element.options['xpath']['xml'] = xml_xpath
 
-        schema_element.reload()
-        update_branch_xpath(schema_element)
+        # Saving the new elements in one bulk insert, inserting the generated element after the sub element
+        data_structure_element_api.insert_many(data_structure_elements[:-1])
+        data_structure_element_api.insert_child(schema_element, generated_element, element_index + 1)
 
-        tree_root_options = tree_root.options
-        tree_root_options['real_root'] = str(schema_element.pk)
+        if is_sub_element_pulled:
+            # the empty sub element is replaced by the generated element: the next siblings keep their xpaths
+            data_structure_element_api.pull_children(schema_element, sub_element, detach=False)
+            data_structure_element_api.delete_branch(sub_element.id)
+        else:
+            # the next siblings are shifted by the generated element: only their xpaths are renumbered
+            xpaths = []
+            for xpath_index, sibling in enumerate(schema_element.children[element_index + 1:], element_index + 2):
+                xpaths.extend(get_root_xpath_updates(data_structure_element_api.get_subtree(sibling),
+                                                     schema_element.options['xpath']['xml'],
+                                                     xpath_index + 1, xpath_index))
+            data_structure_element_api.update_xml_xpaths(xpaths)
 
-        tree_root.update(set__options=tree_root_options)
-        tree_root.reload()
+        tree_root.options['real_root'] = str(schema_element.pk)
 
         renderer = renderer_class(tree_root, request)
         html_form = renderer.render(True)
 
-        tree_root.delete()
         return html_form
 
     def generate_sequence(self, element, xml_tree, choice_counter=None, full_path="", edit_data_tree=None,
@@ -1219,7 +1437,7 @@ class XSDParser(object):
         # (annotation?,(element|group|choice|sequence|any)*)
         # FIXME implement group, any
 
-        min_occurs, max_occurs = get_element_occurrences(element)
+        min_occurs, max_occurs = self.get_element_occurrences(element)
 
         # XSD xpath
         xsd_xpath = xml_tree.getpath(element)
@@ -1249,7 +1467,9 @@ class XSDParser(object):
                 # get the number of occurrences in the data
                 download_enabled = self.download_dependencies
                 elements_found = lookup_occurs(element, xml_tree, full_path, edit_data_tree,
-                                               download_enabled=download_enabled)
+                                               download_enabled=download_enabled,
+                                               schema_contexts=self.schema_contexts,
+                                               edit_data_index=self.get_edit_data_index(edit_data_tree))
                 if max_occurs != 1:
                     nb_occurrences_data = len(elements_found)
                 else:
@@ -1450,7 +1670,7 @@ class XSDParser(object):
             db_element['options']['xpath']['xsd'] = xsd_xpath
 
             # get element's min/max occurs attributes
-            min_occurs, max_occurs = get_element_occurrences(element)
+            min_occurs, max_occurs = self.get_element_occurrences(element)
             nb_occurrences_data = min_occurs  # nb of occurrences in loaded data or in form being rendered (can be 0)
 
             # loading data in the form
@@ -1458,7 +1678,9 @@ class XSDParser(object):
                 # get the number of occurrences in the data
                 download_enabled = self.download_dependencies
                 elements_found = lookup_occurs(element, xml_tree, full_path, edit_data_tree,
-                                               download_enabled=download_enabled)
+                                               download_enabled=download_enabled,
+                                               schema_contexts=self.schema_contexts,
+                                               edit_data_index=self.get_edit_data_index(edit_data_tree))
                 nb_occurrences_data = len(elements_found)
                 if max_occurs != 1:
                     nb_occurrences_data = len(elements_found)
@@ -1488,6 +1710,13 @@ class XSDParser(object):
         if force_generation:
             nb_occurrences = 1
 
+        # get the schema namespaces
+        schema_context = self.schema_contexts.get(xml_tree)
+        # add the XSI prefix used by extensions
+        namespaces = schema_context.get_namespaces(xsi=True)
+        target_namespace = schema_context.target_namespace
+        target_namespace_prefix = schema_context.target_namespace_prefix
+
         for x in range(0, int(nb_occurrences)):
             db_child = {
                 'tag': 'choice-iter',
@@ -1514,13 +1743,6 @@ class XSDParser(object):
                         if ':' in choiceChild.attrib.get('ref'):
                             opt_label = opt_label.split(':')[1]
 
-                    # get the schema namespaces
-                    xml_tree_str = etree.tostring(xml_tree)
-                    namespaces = get_namespaces(xml_tree_str)
-                    # add the XSI prefix used by extensions
-                    namespaces['xsi'] = "http://www.w3.org/2001/XMLSchema-instance"
-                    target_namespace, target_namespace_prefix = get_target_namespace(xml_tree, namespaces)
-
                     if self.editing:
                         # TODO: manage unbounded choices for sequences/choices as well
                         if max_occurs != 1:
@@ -1534,7 +1756,8 @@ class XSDParser(object):
                             # TODO: create prefix if no prefix?
                             element_path = get_xml_xpath(xml_tree, full_path, "element", opt_label, target_namespace,
                                                          target_namespace_prefix)
-                            if len(edit_data_tree.xpath(element_path, namespaces=namespaces)) != 0:
+                            edit_data_index = self.get_edit_data_index(edit_data_tree)
+                            if len(edit_data_index.xpath(element_path, namespaces=namespaces)) != 0:
                                 db_child['value'] = counter
                     element_result = self.generate_element(choiceChild, xml_tree,
                                                            counter,
@@ -1567,7 +1790,7 @@ class XSDParser(object):
 
         return db_element
 
-    def generate_choice_absent(self, request, element_id, xsd_doc_data, renderer_class=ListRenderer):
+    def generate_choice_absent(self, request, element_id, xsd_doc_data, renderer_class=ListRenderer, template_id=None):
         """ Generate data structure for an XML choice
 
         Args:
@@ -1575,52 +1798,42 @@ class XSDParser(object):
             element_id:
             xsd_doc_data:
             renderer_class:
+            template_id: id of the template of the schema, used to cache the compiled schema
 
         Returns:
 
         """
+        # start the parse with fresh schema contexts
+        self.schema_contexts.clear()
+        self.app_info_cache.clear()
+        module_api.refresh_module_registry()
+
         element = data_structure_element_api.get_by_id(element_id)
-        parents = data_structure_element_api.get_all_by_child_id(element_id)
+        parent = data_structure_element_api.get_parent_element(element)
 
         if self.auto_key_keyref:
             self.init_key_keyref(element)
 
-        if len(parents) == 0:
+        if parent is None:
             raise ValueError("No SchemaElement found")
-        elif len(parents) > 1:
-            raise ValueError("More than one SchemaElement found")
-
-        parent = parents[0]
 
         schema_location = None
         if 'schema_location' in element.options:
             schema_location = element.options['schema_location']
 
         # if the xml element is from an imported schema
+        download_enabled = self.download_dependencies
         if schema_location is not None:
-            # open the imported file
-            download_enabled = self.download_dependencies
+            # get the imported schema (downloaded and flattened once per content)
             if download_enabled:
-                ref_xml_schema_file = urllib2.urlopen(element.options['schema_location'])
-                # get the content of the file
-                ref_xml_schema_content = ref_xml_schema_file.read()
-                # build the XML tree
-                xml_doc_tree = XSDTree.build_tree(ref_xml_schema_content)
-                # get the namespaces from the imported schema
-                namespaces = get_namespaces(ref_xml_schema_content)
+                compiled_schema = get_compiled_dependency(schema_location, download_enabled)
             else:
                 raise ParserError('Dependency could not be downloaded')
         else:
-            # build the XML tree
-            xml_doc_tree = XSDTree.build_tree(xsd_doc_data)
-            # get the namespaces
-            namespaces = get_namespaces(xsd_doc_data)
+            # get the flattened schema (flattened once per template and content)
+            compiled_schema = get_compiled_schema(xsd_doc_data, template_id, download_enabled)
 
-        # flatten the includes
-        download_enabled = self.download_dependencies
-        flattener = XSDFlattenerDatabaseOrURL(etree.tostring(xml_doc_tree), download_enabled)
-        xml_doc_tree_str = flattener.get_flat()
-        xml_doc_tree = XSDTree.build_tree(xml_doc_tree_str)
+        xml_doc_tree = compiled_schema.xml_tree
 
         xpath_element = element.options['xpath']
         xsd_xpath = xpath_element['xsd']
@@ -1629,7 +1842,7 @@ class XSDParser(object):
         if 'xml' in xpath_element:
             xml_xpath = xpath_element['xml']
 
-        xml_element = xml_doc_tree.xpath(xsd_xpath, namespaces=namespaces)[0]
+        xml_element = compiled_schema.get_element_by_xpath(xsd_xpath)
 
         # FIXME: Support all possibilities
         if element.tag == 'element':
@@ -1641,18 +1854,13 @@ class XSDParser(object):
             raise ParserError('Element cannot be generated: not implemented.')
 
         # Saving the tree in MongoDB
-        tree_root = load_schema_data_in_db(db_tree)
-
-        # Replacing the children with the generated branch
-        children = parent.children
-        element_index = children.index(element)
+        tree_root = load_schema_data_in_db(db_tree, parent)
 
-        children[element_index] = tree_root
-
-        parent.update(set__children=children)
-        parent.update(set__value=str(tree_root.pk))
-
-        parent.reload()
+        # Replacing the child with the generated branch
+        element_index = parent.children.index(element)
+        data_structure_element_api.replace_child(parent, element_index, tree_root, str(tree_root.pk))
+        # the replaced element is not part of the tree anymore
+        data_structure_element_api.update_parent([element], None)
 
         renderer = renderer_class(tree_root, request)
         html_form = renderer.render(False)
@@ -1688,19 +1896,10 @@ class XSDParser(object):
         }
 
         # get namespace prefix to reference extension in xsi:type
-        xml_tree_str = etree.tostring(xml_tree)
-        namespaces = get_namespaces(xml_tree_str)
-        target_namespace, target_namespace_prefix = get_target_namespace(xml_tree, namespaces)
-        ns_prefix = None
-        if target_namespace is not None:
-            for prefix, ns in namespaces.iteritems():
-                if ns == target_namespace:
-                    ns_prefix = prefix
-                    break
-        db_element['options']['ns_prefix'] = ns_prefix
+        db_element['options']['ns_prefix'] = self.schema_contexts.get(xml_tree).ns_prefix
 
         if not self.ignore_modules:
-            if get_module_url(element) is not None:
+            if self.app_info_cache.get_module_url(element) is not None:
                 # XSD xpath: /element/complexType/sequence
                 xsd_xpath = xml_tree.getpath(element)
                 module = self.generate_module(element, xsd_xpath, full_path, xml_tree=xml_tree,
@@ -1713,7 +1912,8 @@ class XSDParser(object):
         # check if the type has a name (can be referenced by an extension)
         if 'name' in element.attrib and implicit_extension:
             # check if types extend this one
-            extensions = get_extensions(xml_tree, element.attrib['name'])
+            extensions = get_extensions(xml_tree, element.attrib['name'], schema_contexts=self.schema_contexts,
+                                        download_enabled=self.download_dependencies)
 
             # the type has some possible extensions
             if len(extensions) > 0:
@@ -1808,21 +2008,10 @@ class XSDParser(object):
         }
 
         # get namespace prefix to reference extension in xsi:type
-        xml_tree_str = etree.tostring(xml_tree)
-        namespaces = get_namespaces(xml_tree_str)
-        target_namespace, target_namespace_prefix = get_target_namespace(xml_tree, namespaces)
-        ns_prefix = None
-
-        if target_namespace is not None:
-            for prefix, ns in namespaces.iteritems():
-                if ns == target_namespace:
-                    ns_prefix = prefix
-                    break
-
-        db_element['options']['ns_prefix'] = ns_prefix
+        db_element['options']['ns_prefix'] = self.schema_contexts.get(xml_tree).ns_prefix
 
         if not self.ignore_modules:
-            if get_module_url(element) is not None:
+            if self.app_info_cache.get_module_url(element) is not None:
                 # XSD xpath: /element/complexType/sequence
                 xsd_xpath = xml_tree.getpath(element)
                 module = self.generate_module(element, xsd_xpath, full_path, xml_tree=xml_tree,
@@ -1834,7 +2023,8 @@ class XSDParser(object):
         # check if the type has a name (can be referenced by an extension)
         if 'name' in element.attrib and implicit_extension:
             # check if types extend this one
-            extensions = get_extensions(xml_tree, element.attrib['name'])
+            extensions = get_extensions(xml_tree, element.attrib['name'], schema_contexts=self.schema_contexts,
+                                        download_enabled=self.download_dependencies)
 
             # the type has some possible extensions
             if len(extensions) > 0:
@@ -1952,11 +2142,11 @@ class XSDParser(object):
                         return db_element
 
         # get the schema namespaces
-        xml_tree_str = etree.tostring(xml_tree)
-        namespaces = get_namespaces(xml_tree_str)
+        schema_context = self.schema_contexts.get(xml_tree)
         # add the XSI prefix used by extensions
-        namespaces['xsi'] = "http://www.w3.org/2001/XMLSchema-instance"
-        target_namespace, target_namespace_prefix = get_target_namespace(xml_tree, namespaces)
+        namespaces = schema_context.get_namespaces(xsi=True)
+        target_namespace = schema_context.target_namespace
+        target_namespace_prefix = schema_context.target_namespace_prefix
 
         # if root xsi:type
         if full_path == "":
@@ -1982,23 +2172,27 @@ class XSDParser(object):
 
                 if choiceChild.tag == "{0}simpleType".format(LXML_SCHEMA_NAMESPACE) or \
                         choiceChild.tag == "{0}complexType".format(LXML_SCHEMA_NAMESPACE):
+                    # extensions can come from imported schemas
+                    choice_tree, choice_schema_location = self.schema_contexts.get_element_tree(choiceChild,
+                                                                                                xml_tree,
+                                                                                                schema_location)
 
                     if choiceChild.tag == "{0}complexType".format(LXML_SCHEMA_NAMESPACE):
-                        result = self.generate_complex_type(choiceChild, xml_tree,
+                        result = self.generate_complex_type(choiceChild, choice_tree,
                                                             full_path=full_path,
                                                             edit_data_tree=edit_data_tree,
                                                             default_value=default_value,
                                                             is_fixed=is_fixed,
-                                                            schema_location=schema_location,
+                                                            schema_location=choice_schema_location,
                                                             implicit_extension=False)
 
                     elif choiceChild.tag == "{0}simpleType".format(LXML_SCHEMA_NAMESPACE):
-                        result = self.generate_simple_type(choiceChild, xml_tree,
+                        result = self.generate_simple_type(choiceChild, choice_tree,
                                                            full_path=full_path,
                                                            edit_data_tree=edit_data_tree,
                                                            default_value=default_value,
                                                            is_fixed=is_fixed,
-                                                           schema_location=schema_location,
+                                                           schema_location=choice_schema_location,
                                                            implicit_extension=False)
 
                     # Find the default element
@@ -2016,8 +2210,9 @@ class XSDParser(object):
                         ns_element_path = '{0}[@xsi:type="{1}{2}"]'.format(full_path, ns_prefix, opt_label)
                         element_path = '{0}[@xsi:type="{1}"]'.format(full_path, opt_label)
 
-                        ns_elements = edit_data_tree.xpath(ns_element_path, namespaces=namespaces)
-                        elements = edit_data_tree.xpath(element_path, namespaces=namespaces)
+                        edit_data_index = self.get_edit_data_index(edit_data_tree)
+                        ns_elements = edit_data_index.xpath(ns_element_path, namespaces=namespaces)
+                        elements = edit_data_index.xpath(element_path, namespaces=namespaces)
 
                         if len(ns_elements) != 0 or len(elements) != 0:
                             db_child['value'] = counter
@@ -2099,13 +2294,13 @@ class XSDParser(object):
             'children': []
         }
         # FIXME: refactor get module url
-        module_url = get_module_url(element)
+        module_url = self.app_info_cache.get_module_url(element)
 
         # check if a module is set for this element
         if module_url is not None:
 
             try:
-                module = module_api.get_by_url(module_url.path)
+                module = module_api.get_registered_module(module_url.path)
 
                 # add extra parameters coming from url parameters
                 if module_url.query != '':
@@ -2124,9 +2319,8 @@ class XSDParser(object):
 
                 if self.editing:
                     # get the schema namespaces
-                    xml_tree_str = etree.tostring(xml_tree)
-                    namespaces = get_namespaces(xml_tree_str)
-                    edit_elements = edit_data_tree.xpath(xml_xpath, namespaces=namespaces)
+                    namespaces = self.schema_contexts.get(xml_tree).namespaces
+                    edit_elements = self.get_edit_data_index(edit_data_tree).xpath(xml_xpath, namespaces=namespaces)
 
                     if module.multiple:
                         reload_data = ""
@@ -2231,56 +2425,20 @@ class XSDParser(object):
         enumeration = element.findall('{0}enumeration'.format(LXML_SCHEMA_NAMESPACE))
 
         if len(enumeration) > 0:
-            option_list = []
-
-            if is_fixed:
-                # Fixed
-                for enum in enumeration:
-                    db_child = {
-                        'tag': 'enumeration',
-                        'value': enum.attrib.get('value')
-                    }
-
-                    if enum.attrib.get('value') == default_value:
-                        entry = (enum.attrib.get('value'), enum.attrib.get('value'), True)
-                        db_element['value'] = default_value
-                    else:
-                        entry = (enum.attrib.get('value'), enum.attrib.get('value'), False)
+            # values stored in the restriction (no element per value)
+            enumeration_values = [enum.attrib.get('value') for enum in enumeration]
+            db_element['options']['enumeration'] = enumeration_values
 
-                    option_list.append(entry)
-                    db_element['children'].append(db_child)
-            elif self.editing:
-                # Edition
-                default_value = default_value if default_value is not None else ''
+            if is_fixed or self.editing:
+                # Fixed or Edition
+                if self.editing and not is_fixed:
+                    default_value = default_value if default_value is not None else ''
 
-                for enum in enumeration:
-                    db_child = {
-                        'tag': 'enumeration',
-                        'value': enum.attrib.get('value')
-                    }
-
-                    if default_value is not None and enum.attrib.get('value') == default_value:
-                        entry = (enum.attrib.get('value'), enum.attrib.get('value'), True)
-                        db_element['value'] = default_value
-                    else:
-                        entry = (enum.attrib.get('value'), enum.attrib.get('value'), False)
-
-                    option_list.append(entry)
-                    db_element['children'].append(db_child)
+                if default_value in enumeration_values:
+                    db_element['value'] = default_value
             else:
                 # New document
-                for enum in enumeration:
-                    db_child = {
-                        'tag': 'enumeration',
-                        'value': enum.attrib.get('value')
-                    }
-
-                    entry = (enum.attrib.get('value'), enum.attrib.get('value'), False)
-                    option_list.append(entry)
-
-                    db_element['children'].append(db_child)
-
-                db_element['value'] = db_element['children'][0]['value']
+                db_element['value'] = enumeration_values[0]
         else:
             simple_type = element.find('{0}simpleType'.format(LXML_SCHEMA_NAMESPACE))
             if simple_type is not None:
@@ -2335,15 +2493,28 @@ class XSDParser(object):
         # 'base' (required) is the only attribute to parse
         ##################################################
         if 'base' in element.attrib:
-            xml_tree_str = etree.tostring(xml_tree)
-            namespaces = get_namespaces(xml_tree_str)
-            default_prefix = get_default_prefix(namespaces)
+            schema_context = self.schema_contexts.get(xml_tree)
+            namespaces = schema_context.namespaces
+            default_prefix = schema_context.default_prefix
+            target_namespace_prefix = schema_context.target_namespace_prefix
 
-            target_namespace, target_namespace_prefix = get_target_namespace(xml_tree, namespaces)
             download_enabled = self.download_dependencies
-            base_type, xml_tree, schema_location = get_element_type(element, xml_tree, namespaces, default_prefix,
-                                                                    target_namespace_prefix, schema_location, 'base',
-                                                                    download_enabled=download_enabled)
+            base_type, base_tree, base_schema_location = get_element_type(element, xml_tree, namespaces,
+                                                                          default_prefix, target_namespace_prefix,
+                                                                          schema_location, 'base',
+                                                                          download_enabled=download_enabled,
+                                                                          schema_contexts=self.schema_contexts)
+
+            # base type from a schema of the parse not imported by the tree (e.g. extension from an imported schema,
+            # found for a type of the main schema)
+            if base_type is None:
+                base_name = element.attrib['base']
+                base_prefix = base_name.split(':')[0] if ':' in base_name else None
+                base_type, base_tree = self.schema_contexts.find_type(element.nsmap.get(base_prefix),
+                                                                      base_name.split(':')[-1])
+                if base_type is not None:
+                    base_tree, base_schema_location = self.schema_contexts.get_element_tree(base_type, xml_tree,
+                                                                                            schema_location)
 
             # test if base is a built-in data types
             if not isinstance(base_type, etree._Element):
@@ -2359,21 +2530,21 @@ class XSDParser(object):
             else:  # not a built-in data type
                 # fixed not allowed for extensions with base complex type
                 if base_type.tag == "{0}complexType".format(LXML_SCHEMA_NAMESPACE):
-                    complex_type_result = self.generate_complex_type(base_type, xml_tree,
+                    complex_type_result = self.generate_complex_type(base_type, base_tree,
                                                                      full_path=full_path,
                                                                      edit_data_tree=edit_data_tree,
                                                                      default_value=default_value,
-                                                                     schema_location=schema_location,
+                                                                     schema_location=base_schema_location,
                                                                      implicit_extension=False)
 
                     db_element['children'].append(complex_type_result)
                 elif base_type.tag == "{0}simpleType".format(LXML_SCHEMA_NAMESPACE):
-                    simple_type_result = self.generate_simple_type(base_type, xml_tree,
+                    simple_type_result = self.generate_simple_type(base_type, base_tree,
                                                                    full_path=full_path,
                                                                    edit_data_tree=edit_data_tree,
                                                                    default_value=default_value,
                                                                    is_fixed=is_fixed,
-                                                                   schema_location=schema_location,
+                                                                   schema_location=base_schema_location,
                                                                    implicit_extension=False)
 
                     db_element['children'].append(simple_type_result)
@@ -2447,7 +2618,7 @@ class XSDParser(object):
         for key in self.keys.keys():
             if self.keys[key]['xpath'] == xpath:
                 if self.keys[key]['module'] is not None:
-                    add_appinfo_child_to_element(element, MODULE_TAG_NAME, self.keys[key]['module'])
+                    self.app_info_cache.set_module(element, self.keys[key]['module'])
                     return True
         return False
 
@@ -2468,7 +2639,7 @@ class XSDParser(object):
             xpath = re.sub(r'{}:'.format(prefix), '', xpath)
         for keyref in self.keyrefs.keys():
             if self.keyrefs[keyref]['xpath'] == xpath:
-                add_appinfo_child_to_element(element, MODULE_TAG_NAME, 'module-auto-keyref?keyref={}'.format(keyref))
+                self.app_info_cache.set_module(element, 'module-auto-keyref?keyref={}'.format(keyref))
                 return True
         return False
 
@@ -2511,7 +2682,7 @@ class XSDParser(object):
                     # print key_field
 
                 # look if a module is attached to the key
-                module_url = get_module_url(key)
+                module_url = self.app_info_cache.get_module_url(key)
                 if module_url is not None:
                     module = "{0}?key={1}".format(module_url.path, key_name)
                 else:
@@ -5,11 +5,20 @@ from os.path import join
 
 from django.template import loader
 from django.template.backends.django import Template
+from django.template.base import UNKNOWN_SOURCE
 
+from core_parser_app.components.data_structure_element import api as data_structure_element_api
 from core_parser_app.components.data_structure_element.models import DataStructureElement
+from core_parser_app.settings import PARSER_FAST_RENDERING
+from core_parser_app.tools.parser.utils.rendering import get_fragment_emitter
 
 
 class DefaultRenderer(object):
+    # render the fixed fragments with their python emitters instead of the templates
+    fast_rendering = PARSER_FAST_RENDERING
+
+    # fragments not depending on the data (buttons), rendered once per renderer class and templates in the process
+    _static_fragments = {}
 
     def __init__(self, xsd_data, template_list=None):
         """Default renderer for the HTML form
@@ -31,7 +40,8 @@ class DefaultRenderer(object):
                     template_type = str(type(template_list))
                     raise TypeError("template value type is wrong (" + template_type + " received, dict needed")
 
-        self.data = xsd_data
+        # load the whole subtree at once, the renderers walk it without querying the database
+        self.data = data_structure_element_api.get_subtree(xsd_data)
         self.warnings = []
 
         default_renderer_path = join('renderer', 'default')
@@ -53,6 +63,9 @@ class DefaultRenderer(object):
         if template_list is not None:
             self.templates.update(template_list)
 
+        # python emitters of the templates, found on first use
+        self._fragment_emitters = {}
+
     def _load_template(self, tpl_key, tpl_data=None):
         """Loads an HTML template
 
@@ -75,8 +88,44 @@ class DefaultRenderer(object):
         if tpl_data is not None:
             context.update(tpl_data)
 
+        if self.fast_rendering:
+            if tpl_key not in self._fragment_emitters:
+                self._fragment_emitters[tpl_key] = get_fragment_emitter(self.templates[tpl_key])
+
+            if self._fragment_emitters[tpl_key] is not None:
+                return self._fragment_emitters[tpl_key](context)
+
         return self.templates[tpl_key].render(context)
 
+    def _render_static_fragment(self, fragment_key, tpl_keys, render):
+        """Renders a fragment not depending on the data, once per renderer class and templates
+
+        Args:
+            fragment_key: key of the fragment (e.g. flags of the buttons)
+            tpl_keys: keys of the templates rendered in the fragment
+            render: function rendering the fragment
+
+        Returns:
+
+        """
+        cache_key = (type(self), fragment_key)
+
+        for tpl_key in tpl_keys:
+            template = self.templates[tpl_key]
+            origin = template.origin
+            # templates not loaded from a file, or reloaded when modified (debug)
+            if origin.name == UNKNOWN_SOURCE or template.backend.engine.debug:
+                return render()
+
+            cache_key += (origin.name, origin.template_name)
+
+        fragment = DefaultRenderer._static_fragments.get(cache_key)
+        if fragment is None:
+            fragment = render()
+            DefaultRenderer._static_fragments[cache_key] = fragment
+
+        return fragment
+
     def _render_form_error(self, err_message):
         """Renders errors
 
@@ -223,12 +272,13 @@ class DefaultRenderer(object):
         if del_button_type is not bool:
             raise TypeError('add_button type is wrong (' + str(del_button_type) + 'received, bool needed')
 
-        form_string = ""
-
         # Fixed number of occurences, don't need buttons
         if not add_button and not delete_button:
-            pass
-        else:
+            return ""
+
+        def render():
+            form_string = ""
+
             if add_button:
                 form_string += self._load_template('btn_add', {'is_hidden': False})
             else:
@@ -239,7 +289,9 @@ class DefaultRenderer(object):
             else:
                 form_string += self._load_template('btn_del', {'is_hidden': True})
 
-        return form_string
+            return form_string
+
+        return self._render_static_fragment(('buttons', add_button, delete_button), ['btn_add', 'btn_del'], render)
 
     def _render_collapse_button(self):
         """Renders a collapse button
@@ -247,4 +299,5 @@ class DefaultRenderer(object):
         Returns:
 
         """
-        return self._load_template('btn_collapse')
+        return self._render_static_fragment('collapse', ['btn_collapse'],
+                                            lambda: self._load_template('btn_collapse'))
@@ -1,18 +1,38 @@
 """List Renderer class
 """
+import hashlib
 import logging
+from functools import wraps
 from os.path import join
 from types import *
 
 from django.template import loader
+from django.template.base import UNKNOWN_SOURCE
 
-from core_parser_app.components.module import api as module_api
+from core_parser_app.settings import PARSER_RENDER_CACHE_TIMEOUT
 from core_parser_app.tools.modules.views.module import AbstractModule
 from core_parser_app.tools.parser.renderer import DefaultRenderer
+from core_parser_app.tools.parser.utils.rendering import get_subtree_cache, get_subtree_cache_key
 
 logger = logging.getLogger(__name__)
 
 
+def cached_subtree(render_method):
+    """Caches the HTML rendered by the method for the current version of the subtree (see PARSER_RENDER_CACHE)
+
+    Args:
+        render_method:
+
+    Returns:
+
+    """
+    @wraps(render_method)
+    def render_subtree(self, element, *args, **kwargs):
+        return self._render_subtree(render_method, element, *args, **kwargs)
+
+    return render_subtree
+
+
 class AbstractListRenderer(DefaultRenderer):
 
     def __init__(self, xsd_data):
@@ -96,6 +116,10 @@ class ListRenderer(AbstractListRenderer):
         super(ListRenderer, self).__init__(xsd_data)
         self.request = request  # FIXME Find a way to avoid the use of request
         self.partial = False
+        # number of modules rendered, subtrees with modules are not cached
+        self.nb_rendered_modules = 0
+        # key of the renderer class and templates in the subtree cache, computed on first use
+        self._renderer_key = None
 
     def render(self, partial=False):
         """Renders form as a list
@@ -126,6 +150,69 @@ class ListRenderer(AbstractListRenderer):
         else:
             return html_content
 
+    def _get_renderer_key(self):
+        """Returns the key of the renderer class and templates in the subtree cache, None if the templates can change
+        (not loaded from a file, or reloaded when modified in debug)
+
+        Returns:
+
+        """
+        if self._renderer_key is None:
+            key_parts = [type(self).__module__, type(self).__name__]
+
+            for tpl_key in sorted(self.templates.keys()):
+                template = self.templates[tpl_key]
+                if template.origin.name == UNKNOWN_SOURCE or template.backend.engine.debug:
+                    return None
+
+                key_parts += [tpl_key, template.origin.name]
+
+            self._renderer_key = hashlib.md5(u'\n'.join(key_parts).encode('utf-8')).hexdigest()
+
+        return self._renderer_key
+
+    def _render_subtree(self, render_method, element, *args, **kwargs):
+        """Renders the subtree of the element, or returns the HTML rendered for the same version of the subtree
+
+        Args:
+            render_method:
+            element:
+            *args:
+            **kwargs:
+
+        Returns:
+
+        """
+        subtree_cache = get_subtree_cache()
+        renderer_key = self._get_renderer_key() if subtree_cache is not None else None
+
+        # version unknown (incremented in database since the element was loaded)
+        if renderer_key is None or element.pk is None or element.version is None:
+            return render_method(self, element, *args, **kwargs)
+
+        # the partial rendering changes the li class of the root elements
+        render_key = ':'.join([render_method.__name__, str(self.partial)] + [str(arg) for arg in args] +
+                              ['{0}={1}'.format(key, value) for key, value in sorted(kwargs.items())])
+        cache_key = get_subtree_cache_key(renderer_key, element, render_key)
+
+        cached_html = subtree_cache.get(cache_key)
+        if cached_html is not None:
+            html_content, warnings = cached_html
+            self.warnings.extend(warnings)
+            return html_content
+
+        nb_warnings = len(self.warnings)
+        nb_rendered_modules = self.nb_rendered_modules
+
+        html_content = render_method(self, element, *args, **kwargs)
+
+        # the modules are rendered by their views (request dependent, not versioned with the subtree)
+        if self.nb_rendered_modules == nb_rendered_modules:
+            subtree_cache.set(cache_key, (html_content, self.warnings[nb_warnings:]), PARSER_RENDER_CACHE_TIMEOUT)
+
+        return html_content
+
+    @cached_subtree
     def render_element(self, element):
         """Renders an element
 
@@ -352,6 +439,7 @@ class ListRenderer(AbstractListRenderer):
 
         return final_html
 
+    @cached_subtree
     def render_sequence(self, element, force_full_display=False):
         """Renders a sequence
 
@@ -443,6 +531,7 @@ class ListRenderer(AbstractListRenderer):
 
         return final_html
 
+    @cached_subtree
     def render_choice(self, element):
         """Renders a choice
 
@@ -655,10 +744,11 @@ class ListRenderer(AbstractListRenderer):
         Returns:
 
         """
-        options = []
+        options = [(value, value, value == element.value) for value in element.options.get('enumeration', [])]
         subhtml = ''
 
         for child in element.children:
+            # enumeration stored as children by previous versions
             if child.tag == 'enumeration':
                 options.append((child.value, child.value, child.value == element.value))
             elif child.tag == 'simple_type':
@@ -683,11 +773,12 @@ class ListRenderer(AbstractListRenderer):
         Returns:
 
         """
+        self.nb_rendered_modules += 1
+
         module_options = element.options
         module_url = module_options['url']
 
-        module = module_api.get_by_url(module_url)
-        module_view = AbstractModule.get_view_from_view_path(module.view).as_view()
+        module_view = AbstractModule.get_module_view(module_url)
 
         module_request = self.request
         module_request.method = 'GET'
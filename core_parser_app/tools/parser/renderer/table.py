@@ -330,10 +330,11 @@ class TableRenderer(AbstractTableRenderer):
 
         """
         print "rest"
-        options = []
+        options = [(value, value, False) for value in element['options'].get('enumeration', [])]
         subhtml = ''
 
         for child in element['children']:
+            # enumeration stored as children by previous versions
             if child['tag'] == 'enumeration':
                 options.append((child['value'], child['value'], False))
             elif child['tag'] == 'input':
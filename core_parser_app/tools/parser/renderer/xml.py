@@ -2,7 +2,6 @@
 """
 from django.template import loader
 from os.path import join
-from bson.objectid import ObjectId
 import numbers
 
 from core_parser_app.components.data_structure_element import api as data_structure_element_api
@@ -48,24 +47,65 @@ class AbstractXmlRenderer(DefaultRenderer):
         return self._load_template('xml', data)
 
 
-def get_parent_element(element):
+def get_parent_element(element, parents=None):
     """Gets the parent element (tag is element not direct parent) of the current element
 
     Args:
         element:
+        parents: parents of the rendered elements (see get_parents), not fetched from the database
 
     Returns:
 
     """
+    if parents is None:
+        parents = {}
+
     try:
-        parent = data_structure_element_api.get_all_by_child_id(ObjectId(element.id))
-        while parent.tag != 'element':
-            parent = data_structure_element_api.get_all_by_child_id(ObjectId(parent.id))
+        parent = _get_parent(element, parents)
+        while parent is not None and parent.tag != 'element':
+            parent = _get_parent(parent, parents)
         return parent
     except:
         return None
 
 
+def _get_parent(element, parents):
+    """Gets the direct parent of an element
+
+    Args:
+        element:
+        parents:
+
+    Returns:
+
+    """
+    if id(element) in parents:
+        return parents[id(element)]
+
+    return data_structure_element_api.get_parent_element(element)
+
+
+def get_parents(element):
+    """Maps the elements of a subtree loaded in memory to their parent
+
+    Args:
+        element:
+
+    Returns:
+
+    """
+    parents = {}
+    elements = [element]
+
+    while len(elements) > 0:
+        current_element = elements.pop()
+        for child in current_element.children:
+            parents[id(child)] = current_element
+            elements.append(child)
+
+    return parents
+
+
 class XmlRenderer(AbstractXmlRenderer):
     """XML Renderer class
     """
@@ -78,6 +118,7 @@ class XmlRenderer(AbstractXmlRenderer):
         """
         self.isRoot = True
         super(XmlRenderer, self).__init__(xsd_data)
+        self.parents = get_parents(self.data)
 
     def render(self):
         """Renders form as XML
@@ -168,7 +209,7 @@ class XmlRenderer(AbstractXmlRenderer):
                     self.warnings.append(message)
 
                 # namespaces
-                parent = get_parent_element(element)
+                parent = get_parent_element(element, self.parents)
                 if parent is not None:
                     if 'xmlns' in element.options and element.options['xmlns'] is not None:
                         if 'xmlns' in parent.options and element.options['xmlns'] != parent.options['xmlns']:
@@ -226,7 +267,7 @@ class XmlRenderer(AbstractXmlRenderer):
             # namespaces
             if 'xmlns' in element.options and element.options['xmlns'] is not None:
                 # check that element isn't declaring the same namespace xmlns=""
-                parent = get_parent_element(element)
+                parent = get_parent_element(element, self.parents)
                 xmlns = ''
                 if parent is not None:
                     if 'xmlns' in parent.options and parent.options['xmlns'] is not None and \
@@ -435,7 +476,7 @@ class XmlRenderer(AbstractXmlRenderer):
                         ns_prefix = ''
                         xmlns = ''
                         if 'ns_prefix' in child.options and child.options['ns_prefix'] is not None:
-                            parent = get_parent_element(child)
+                            parent = get_parent_element(child, self.parents)
                             if parent is not None:
                                 if 'xmlns' in parent.options and child.options['xmlns'] != parent.options['xmlns']:
                                     ns_prefix = child.options['ns_prefix']
@@ -449,7 +490,7 @@ class XmlRenderer(AbstractXmlRenderer):
                         ns_prefix = ''
                         xmlns = ''
                         if 'ns_prefix' in child.options and child.options['ns_prefix'] is not None:
-                            parent = get_parent_element(child)
+                            parent = get_parent_element(child, self.parents)
                             if parent is not None:
                                 if 'xmlns' in parent.options and child.options['xmlns'] != parent.options['xmlns']:
                                     ns_prefix = child.options['ns_prefix']
@@ -518,9 +559,14 @@ class XmlRenderer(AbstractXmlRenderer):
         content = ['', '', '']
         value = element.value
 
+        if 'enumeration' in element.options:
+            content[1] = value if value is not None else ''
+            value = None
+
         for child in element.children:
             tmp_content = ['', '', '']
 
+            # enumeration stored as children by previous versions
             if child.tag == 'enumeration':
                 tmp_content[1] = value if value is not None else ''
                 value = None  # Avoid to copy the value several times
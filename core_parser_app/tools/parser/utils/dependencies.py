@@ -0,0 +1,416 @@
+"""Schema dependencies utils
+"""
+import hashlib
+import logging
+import threading
+import time
+import urllib2
+from collections import OrderedDict
+from email.utils import formatdate
+from os.path import join, getmtime, isfile
+from urlparse import urlparse
+
+from core_main_app.utils.urls import get_template_download_pattern
+from core_main_app.utils.xsd_flattener.xsd_flattener_database_url import XSDFlattenerDatabaseOrURL
+from core_parser_app.settings import PARSER_SCHEMA_CACHE_TTL, PARSER_SCHEMA_CACHE_SIZE, \
+    PARSER_SCHEMA_CACHE_DIRECTORY
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaResponse(object):
+    """Content of a schema returned by a backend, with its validators
+    """
+
+    def __init__(self, content, etag=None, last_modified=None):
+        """Initializes the response
+
+        Args:
+            content:
+            etag:
+            last_modified:
+        """
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class URLSchemaBackend(object):
+    """Downloads the schemas
+    """
+
+    def fetch(self, url, etag=None, last_modified=None):
+        """Downloads a schema, unless it has not been modified since the given validators
+
+        Args:
+            url:
+            etag:
+            last_modified:
+
+        Returns:
+            SchemaResponse, None if not modified
+
+        """
+        request = urllib2.Request(url)
+
+        if etag is not None:
+            request.add_header('If-None-Match', etag)
+
+        if last_modified is not None:
+            request.add_header('If-Modified-Since', last_modified)
+
+        try:
+            response = urllib2.urlopen(request)
+        except urllib2.HTTPError, e:
+            if e.code == 304:
+                return None
+            raise
+
+        headers = response.info()
+        return SchemaResponse(response.read(), headers.getheader('ETag'), headers.getheader('Last-Modified'))
+
+
+class DirectorySchemaBackend(object):
+    """Reads the schemas from a local directory, where the path of the url is the path of the file
+    """
+
+    def __init__(self, directory):
+        """Initializes the backend
+
+        Args:
+            directory:
+        """
+        self.directory = directory
+
+    def fetch(self, url, etag=None, last_modified=None):
+        """Reads a schema, unless it has not been modified since the given validators
+
+        Args:
+            url:
+            etag:
+            last_modified:
+
+        Returns:
+            SchemaResponse, None if not modified
+
+        """
+        file_path = join(self.directory, urlparse(url).path.lstrip('/'))
+
+        if not isfile(file_path):
+            raise urllib2.URLError('{0} not found in {1}'.format(url, self.directory))
+
+        with open(file_path, 'rb') as schema_file:
+            content = schema_file.read()
+
+        file_etag = '"{0}"'.format(hashlib.sha1(content).hexdigest())
+        file_last_modified = formatdate(getmtime(file_path), usegmt=True)
+
+        if etag is not None and etag == file_etag:
+            return None
+
+        return SchemaResponse(content, file_etag, file_last_modified)
+
+
+class SchemaCacheEntry(object):
+    """Cached schema
+    """
+
+    def __init__(self, response):
+        """Initializes the entry
+
+        Args:
+            response:
+        """
+        self.content = response.content
+        self.content_hash = hashlib.sha256(response.content).hexdigest()
+        self.etag = response.etag
+        self.last_modified = response.last_modified
+        self.flat_content = None
+        # content hashes of the dependencies by url, when the flattened content was built
+        self.flat_dependencies = None
+        self.checked_at = time.time()
+
+    def get_size(self):
+        """Returns the size of the cached contents
+
+        Returns:
+
+        """
+        return len(self.content) + (len(self.flat_content) if self.flat_content is not None else 0)
+
+
+class SchemaCache(object):
+    """Cache of the schemas dependencies by url
+
+    The schemas are fetched once, then revalidated (ETag/Last-Modified) when older than the ttl. The least recently
+    used schemas are removed when the size of the cached contents exceeds max_size.
+    """
+
+    def __init__(self, backend=None, ttl=None, max_size=None):
+        """Initializes the cache
+
+        Args:
+            backend: URLSchemaBackend by default
+            ttl: time in seconds before revalidating a schema (None to never revalidate)
+            max_size: maximum size of the cached contents in bytes (None for no limit)
+        """
+        self.backend = backend if backend is not None else URLSchemaBackend()
+        self.ttl = ttl
+        self.max_size = max_size
+
+        self.nb_downloads = 0
+        self.nb_revalidations = 0
+
+        self._entries = OrderedDict()
+        # events of the fetches and of the flattenings running, by url: the other callers wait for them
+        self._fetching = {}
+        self._flattening = {}
+        self._lock = threading.RLock()
+
+    def get_content(self, url):
+        """Returns the content of the schema
+
+        Args:
+            url:
+
+        Returns:
+
+        """
+        return self.get_entry(url).content
+
+    def get_flat_content(self, url, flatten):
+        """Returns the flattened content of the schema, flattened once per content of the schema and of its
+        dependencies
+
+        Args:
+            url:
+            flatten: function flattening a schema content, returning the flattened content and the content hashes of
+                the dependencies by url
+
+        Returns:
+            flattened content, content hashes of the dependencies by url
+
+        """
+        entry = self.get_entry(url)
+
+        with self._lock:
+            flat_content, flat_dependencies = entry.flat_content, entry.flat_dependencies
+
+        if flat_content is not None and not self.is_modified(flat_dependencies):
+            return flat_content, flat_dependencies
+
+        while True:
+            with self._lock:
+                flattening = self._flattening.get(url)
+                if flattening is None:
+                    flattening = self._flattening[url] = threading.Event()
+                    break
+
+            # flattened by another caller: uses its result
+            flattening.wait()
+            entry = self.get_entry(url)
+            with self._lock:
+                if entry.flat_content is not None:
+                    return entry.flat_content, entry.flat_dependencies
+
+        try:
+            # flattened outside of the lock: may download the dependencies of the schema
+            flat_content, flat_dependencies = flatten(entry.content)
+
+            with self._lock:
+                entry.flat_content, entry.flat_dependencies = flat_content, flat_dependencies
+                self._evict()
+        finally:
+            with self._lock:
+                del self._flattening[url]
+            flattening.set()
+
+        return flat_content, flat_dependencies
+
+    def is_modified(self, dependencies):
+        """Checks if one of the schemas has been modified (revalidated when older than the ttl)
+
+        Args:
+            dependencies: content hashes of the schemas by url
+
+        Returns:
+
+        """
+        return any(self.get_entry(url).content_hash != content_hash for url, content_hash in dependencies.iteritems())
+
+    def clear(self):
+        """Removes all the schemas
+
+        Returns:
+
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def get_size(self):
+        """Returns the size of the cached contents
+
+        Returns:
+
+        """
+        with self._lock:
+            return sum(entry.get_size() for entry in self._entries.itervalues())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_entry(self, url):
+        """Returns the cache entry of the url (content and content hash), fetched or revalidated if needed
+
+        Args:
+            url:
+
+        Returns:
+
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(url)
+                if entry is not None and (self.ttl is None or time.time() - entry.checked_at < self.ttl):
+                    # most recently used entries at the end
+                    self._entries[url] = self._entries.pop(url)
+                    return entry
+
+                fetching = self._fetching.get(url)
+                if fetching is None:
+                    fetching = self._fetching[url] = threading.Event()
+                    break
+
+            # fetched by another caller: uses its entry (fetched again if the fetch failed)
+            fetching.wait()
+            with self._lock:
+                entry = self._entries.get(url)
+                if entry is not None:
+                    return entry
+
+        try:
+            # fetched outside of the lock: a slow url does not block the other schemas
+            if entry is None:
+                entry = SchemaCacheEntry(self.backend.fetch(url))
+                with self._lock:
+                    self.nb_downloads += 1
+            else:
+                entry = self._revalidate(url, entry)
+
+            with self._lock:
+                self._entries.pop(url, None)
+                self._entries[url] = entry
+                self._evict()
+        finally:
+            with self._lock:
+                del self._fetching[url]
+            fetching.set()
+
+        return entry
+
+    def _revalidate(self, url, entry):
+        """Checks if the schema has been modified, returns the up to date entry
+
+        Args:
+            url:
+            entry:
+
+        Returns:
+
+        """
+        with self._lock:
+            self.nb_revalidations += 1
+
+        try:
+            response = self.backend.fetch(url, entry.etag, entry.last_modified)
+        except urllib2.URLError, e:
+            logger.warning("Schema {0} could not be revalidated, using the cached version: {1}".format(url, str(e)))
+            return entry
+
+        if response is None:
+            entry.checked_at = time.time()
+            return entry
+
+        new_entry = SchemaCacheEntry(response)
+        with self._lock:
+            self.nb_downloads += 1
+
+        # same content: the flattened content is still valid
+        if new_entry.content_hash == entry.content_hash:
+            new_entry.flat_content = entry.flat_content
+            new_entry.flat_dependencies = entry.flat_dependencies
+
+        return new_entry
+
+    def _evict(self):
+        """Removes the least recently used entries while the cache is too large (keeps the last used one)
+
+        Returns:
+
+        """
+        if self.max_size is None:
+            return
+
+        # size computed from the stored entries: an entry evicted while flattened is not counted
+        size = self.get_size()
+        while size > self.max_size and len(self._entries) > 1:
+            url, entry = self._entries.popitem(last=False)
+            size -= entry.get_size()
+
+
+_schema_cache = None
+
+
+def get_schema_cache():
+    """Returns the schema cache of the process, configured by the settings
+
+    Returns:
+
+    """
+    global _schema_cache
+
+    if _schema_cache is None:
+        backend = None
+        if PARSER_SCHEMA_CACHE_DIRECTORY is not None:
+            backend = DirectorySchemaBackend(PARSER_SCHEMA_CACHE_DIRECTORY)
+
+        _schema_cache = SchemaCache(backend, PARSER_SCHEMA_CACHE_TTL, PARSER_SCHEMA_CACHE_SIZE)
+
+    return _schema_cache
+
+
+class XSDFlattenerDatabaseOrCache(XSDFlattenerDatabaseOrURL):
+    """Get the content of the dependency from the database or from the schema cache
+    """
+
+    def __init__(self, xml_string, download_enabled=True, schema_cache=None):
+        """Initializes the flattener
+
+        Args:
+            xml_string:
+            download_enabled:
+            schema_cache: schema cache of the process by default
+        """
+        XSDFlattenerDatabaseOrURL.__init__(self, xml_string=xml_string, download_enabled=download_enabled)
+        self.schema_cache = schema_cache if schema_cache is not None else get_schema_cache()
+        # content hashes of the dependencies read from the schema cache, by url
+        self.dependency_hashes = {}
+
+    def get_dependency_content(self, uri):
+        """Get the content of a template from the database, or of any other dependency from the schema cache
+
+        Args:
+            uri:
+
+        Returns:
+
+        """
+        if get_template_download_pattern().match(urlparse(uri).path):
+            return super(XSDFlattenerDatabaseOrCache, self).get_dependency_content(uri)
+
+        if not self.download_enabled:
+            return ""
+
+        entry = self.schema_cache.get_entry(uri)
+        self.dependency_hashes[uri] = entry.content_hash
+        return entry.content
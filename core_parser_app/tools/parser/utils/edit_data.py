@@ -0,0 +1,208 @@
+"""Edit data utils
+"""
+import re
+
+from core_parser_app.tools.parser.utils.xml import xpath as evaluate_xpath
+
+# step of the xpaths built by the parser: name, prefix:name or *[local-name()="name"] (@ for attributes), followed by
+# an optional position and an optional xsi:type
+_STEP_PATTERN = re.compile(r'^(?P<attribute>@)?'
+                           r'(?:\*\[local-name\(\)="(?P<local_name>[^"]+)"\]|(?:(?P<prefix>[^\W\d][\w.-]*):)?'
+                           r'(?P<name>[^\W\d][\w.-]*))'
+                           r'(?:\[(?P<position>[1-9][0-9]*)\])?'
+                           r'(?:\[@xsi:type="(?P<xsi_type>[^"]*)"\])?$', re.UNICODE)
+
+
+class EditDataIndex(object):
+    """Index of the elements of the XML document loaded for edition
+
+    The children of each element are indexed by tag and by local name in one pass over the document. The xpaths built
+    by the parser (absolute paths of names, positions and xsi:type) are resolved from the index, the nodes found for
+    each normalized path being kept for the next lookups. Other xpaths are compiled once and evaluated by lxml.
+    """
+
+    def __init__(self, xml_tree):
+        """Initializes the index
+
+        Args:
+            xml_tree: root element of the document
+        """
+        self.xml_tree = xml_tree
+
+        # children of each element by tag ('{ns}name') and by local name (('*', 'name')), in document order
+        # (only the elements with children are indexed)
+        self._children = {None: self._index_children([xml_tree])}
+        for element in xml_tree.iter():
+            if len(element) > 0:
+                self._children[element] = self._index_children(element)
+
+        # nodes found by normalized path
+        self._nodes_by_path = {(): [None]}
+        # parsed steps of the xpaths
+        self._steps = {}
+
+    @staticmethod
+    def _index_children(children):
+        """Returns the children by tag and by local name
+
+        Args:
+            children:
+
+        Returns:
+
+        """
+        indexed_children = {}
+
+        for child in children:
+            tag = child.tag
+            # skip comments and processing instructions
+            if not isinstance(tag, basestring):
+                continue
+
+            indexed_children.setdefault(tag, []).append(child)
+            indexed_children.setdefault(('*', tag.rsplit('}', 1)[-1]), []).append(child)
+
+        return indexed_children
+
+    def xpath(self, xpath, namespaces=None):
+        """Returns the nodes (elements or attribute values) found at the xpath
+
+        Args:
+            xpath:
+            namespaces: prefixes used in the xpath
+
+        Returns:
+
+        """
+        namespaces = namespaces if namespaces is not None else {}
+        path = self._normalize(xpath, namespaces)
+
+        # not a path built by the parser
+        if path is None:
+            return evaluate_xpath(self.xml_tree, xpath, namespaces)
+
+        if path[-1][0] == '@':
+            return [value for element in self._get_nodes(path[:-1])
+                    for value in self._get_attribute_values(element, path[-1][1])]
+
+        return list(self._get_nodes(path))
+
+    def _normalize(self, xpath, namespaces):
+        """Returns the path as a tuple of steps, None if the xpath is not supported by the index
+
+        A step is (tag or ('*', local name), position, (xsi:type attribute, value)), or ('@', name or ('*', local name))
+        for an attribute.
+
+        Args:
+            xpath:
+            namespaces:
+
+        Returns:
+
+        """
+        if not xpath.startswith('/'):
+            return None
+
+        steps = xpath[1:].split('/')
+        path = []
+
+        for index, step in enumerate(steps):
+            parsed_step = self._parse_step(step)
+            if parsed_step is None:
+                return None
+
+            is_attribute, local_name, prefix, name, position, xsi_type = parsed_step
+
+            if local_name is not None:
+                name = ('*', local_name)
+            elif prefix is not None:
+                # unknown prefixes are reported by lxml
+                if prefix not in namespaces:
+                    return None
+                name = '{{{0}}}{1}'.format(namespaces[prefix], name)
+
+            if is_attribute:
+                # attributes can only be the last step, without predicates
+                if index != len(steps) - 1 or position is not None or xsi_type is not None:
+                    return None
+                path.append(('@', name))
+            else:
+                if xsi_type is not None:
+                    if 'xsi' not in namespaces:
+                        return None
+                    xsi_type = ('{{{0}}}type'.format(namespaces['xsi']), xsi_type)
+
+                path.append((name, position, xsi_type))
+
+        return tuple(path)
+
+    def _parse_step(self, step):
+        """Returns the parts of a step (is attribute, local name, prefix, name, position, xsi:type), None if the step
+        is not supported by the index
+
+        Args:
+            step:
+
+        Returns:
+
+        """
+        # the same steps are found in most xpaths
+        if step in self._steps:
+            return self._steps[step]
+
+        parsed_step = None
+        match = _STEP_PATTERN.match(step)
+        if match is not None:
+            position = int(match.group('position')) if match.group('position') is not None else None
+            parsed_step = (match.group('attribute') is not None, match.group('local_name'), match.group('prefix'),
+                           match.group('name'), position, match.group('xsi_type'))
+
+        self._steps[step] = parsed_step
+        return parsed_step
+
+    def _get_nodes(self, path):
+        """Returns the elements found at the normalized path
+
+        Args:
+            path:
+
+        Returns:
+
+        """
+        nodes = self._nodes_by_path.get(path)
+        if nodes is not None:
+            return nodes
+
+        nodes = []
+        name, position, xsi_type = path[-1]
+
+        for parent in self._get_nodes(path[:-1]):
+            children = self._children.get(parent, {}).get(name, [])
+
+            if position is not None:
+                children = children[position - 1:position]
+
+            if xsi_type is not None:
+                children = [child for child in children if child.get(xsi_type[0]) == xsi_type[1]]
+
+            nodes.extend(children)
+
+        self._nodes_by_path[path] = nodes
+        return nodes
+
+    @staticmethod
+    def _get_attribute_values(element, name):
+        """Returns the values of the attributes of the element with the given name
+
+        Args:
+            element:
+            name: attribute name or ('*', local name)
+
+        Returns:
+
+        """
+        if isinstance(name, tuple):
+            return [value for key, value in element.attrib.iteritems() if key.rsplit('}', 1)[-1] == name[1]]
+
+        value = element.get(name)
+        return [value] if value is not None else []
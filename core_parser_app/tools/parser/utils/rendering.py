@@ -2,6 +2,22 @@
 """
 import textwrap
 import re
+from os.path import join, dirname, realpath
+
+from django.core.cache import caches
+from django.template import Context
+from django.template.base import render_value_in_context
+from django.utils.encoding import force_text
+from django.utils.html import conditional_escape
+from django.utils.safestring import mark_safe
+
+from core_parser_app.settings import PARSER_RENDER_CACHE
+
+# templates shipped with the parser
+TEMPLATES_DIR = join(dirname(dirname(realpath(__file__))), 'templates')
+
+# context used to convert the values like the templates do (localization, autoescape)
+_VALUE_CONTEXT = Context(autoescape=True)
 
 
 def format_tooltip(text, width=80):
@@ -15,3 +31,179 @@ def format_tooltip(text, width=80):
 
     """
     return textwrap.fill(re.sub(r'\s+', ' ', text.strip()), width)
+
+
+def _render_value(value):
+    """Converts a value as {{ value }} does in a template
+
+    Args:
+        value:
+
+    Returns:
+
+    """
+    return render_value_in_context(value, _VALUE_CONTEXT)
+
+
+def render_list_ul(data):
+    """Renders renderer/list/ul.html
+
+    Args:
+        data:
+
+    Returns:
+
+    """
+    element_id = data.get('element_id')
+
+    return mark_safe(u'<ul{0}{1}>\n    {2}\n</ul>'.format(
+        u' id="{0}"'.format(_render_value(element_id)) if element_id else u'',
+        u' class="hidden"' if data.get('is_hidden') else u'',
+        force_text(data.get('content'))
+    ))
+
+
+def render_list_li(data):
+    """Renders renderer/list/li.html
+
+    Args:
+        data:
+
+    Returns:
+
+    """
+    return mark_safe(u'<li class="{0}" id="{1}">\n    {2}\n</li>'.format(
+        _render_value(data.get('li_class')),
+        _render_value(data.get('li_id')),
+        force_text(data.get('content'))
+    ))
+
+
+def render_input(data):
+    """Renders renderer/default/inputs/input.html
+
+    Args:
+        data:
+
+    Returns:
+
+    """
+    use = data.get('use')
+    value = data.get('value')
+    placeholder = data.get('placeholder')
+    tooltip = data.get('tooltip')
+
+    html = u'<input type="text" id="{0}" class="default{1}"\n    {2}\n    {3}\n    {4}/>\n'.format(
+        _render_value(data.get('id')),
+        u' ' + conditional_escape(force_text(use)) if use else u'',
+        u' value="{0}"'.format(conditional_escape(force_text(value))) if value else u' value=""',
+        u' placeholder="{0}"'.format(_render_value(placeholder)) if placeholder != "" else u'',
+        u' disabled ' if data.get('fixed') else u''
+    )
+
+    if tooltip != "":
+        html += u'\n<div class="tooltip-use"><i class="fa fa-question-circle"></i>\n' \
+                u'  <span class="tooltip-text">{0}</span>\n</div>\n'.format(_render_value(tooltip))
+
+    return mark_safe(html)
+
+
+def render_add_button(data):
+    """Renders renderer/default/buttons/add.html
+
+    Args:
+        data:
+
+    Returns:
+
+    """
+    return mark_safe(u'<span style="color:green;" class=\'icon add fa fa-plus-circle{0}\'></span>'.format(
+        u' hidden' if data.get('is_hidden') else u''
+    ))
+
+
+def render_delete_button(data):
+    """Renders renderer/default/buttons/delete.html
+
+    Args:
+        data:
+
+    Returns:
+
+    """
+    return mark_safe(u'<span style="color:red;" class=\'icon remove fa fa-minus-circle{0}\'></span>'.format(
+        u' hidden' if data.get('is_hidden') else u''
+    ))
+
+
+def render_collapse_button(data):
+    """Renders renderer/default/buttons/collapse.html
+
+    Args:
+        data:
+
+    Returns:
+
+    """
+    return mark_safe(u"<span class='collapse' style='cursor:pointer;' onclick='showhide(event);'></span>")
+
+
+# python emitters of the fixed fragments, by template name
+FRAGMENT_EMITTERS = {
+    join('renderer', 'list', 'ul.html'): render_list_ul,
+    join('renderer', 'list', 'li.html'): render_list_li,
+    join('renderer', 'default', 'inputs', 'input.html'): render_input,
+    join('renderer', 'default', 'buttons', 'add.html'): render_add_button,
+    join('renderer', 'default', 'buttons', 'delete.html'): render_delete_button,
+    join('renderer', 'default', 'buttons', 'collapse.html'): render_collapse_button,
+}
+
+
+def get_fragment_emitter(template):
+    """Returns the python emitter producing the same HTML as the template, None if the template has no emitter or is
+    not the one shipped with the parser (e.g. overridden by a project)
+
+    Args:
+        template:
+
+    Returns:
+
+    """
+    origin = template.origin
+    emitter = FRAGMENT_EMITTERS.get(origin.template_name)
+
+    if emitter is None or realpath(origin.name) != join(TEMPLATES_DIR, origin.template_name):
+        return None
+
+    # the emitters escape the values like the templates do with autoescape
+    if not template.backend.engine.autoescape:
+        return None
+
+    return emitter
+
+
+def get_subtree_cache():
+    """Returns the cache of the HTML rendered for the subtrees of the forms, None if disabled
+
+    Returns:
+
+    """
+    if PARSER_RENDER_CACHE is None:
+        return None
+
+    return caches[PARSER_RENDER_CACHE]
+
+
+def get_subtree_cache_key(renderer_key, element, render_key):
+    """Returns the cache key of the HTML rendered for the current version of the subtree of the element
+
+    Args:
+        renderer_key: key of the renderer class and templates
+        element:
+        render_key: key of the rendering method and of its parameters
+
+    Returns:
+
+    """
+    return 'core_parser_app:subtree:{0}:{1}:{2}:{3}'.format(renderer_key, element.pk, element.version,
+                                                           render_key)
@@ -0,0 +1,593 @@
+"""Schema utils
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from lxml import etree
+
+from core_parser_app.settings import PARSER_COMPILED_SCHEMA_CACHE_SIZE
+from core_parser_app.tools.parser.utils.dependencies import get_schema_cache, XSDFlattenerDatabaseOrCache
+from core_parser_app.tools.parser.utils.xml import xpath
+from xml_utils.commons.constants import LXML_SCHEMA_NAMESPACE
+from xml_utils.xsd_tree.operations.namespaces import get_namespaces, get_default_prefix, get_target_namespace
+from xml_utils.xsd_tree.xsd_tree import XSDTree
+from xml_utils.xsd_types.xsd_types import get_xsd_types
+
+# extensions of a base type from any namespace
+ANY_NAMESPACE = object()
+
+# built-in XSD types by namespace prefix
+_xsd_types_by_prefix = {}
+
+
+def get_xsd_types_set(namespace_prefix=''):
+    """Returns the set of the supported XSD types, computed once per prefix
+
+    Args:
+        namespace_prefix:
+
+    Returns:
+
+    """
+    xsd_types = _xsd_types_by_prefix.get(namespace_prefix)
+
+    if xsd_types is None:
+        xsd_types = frozenset(get_xsd_types(namespace_prefix))
+        _xsd_types_by_prefix[namespace_prefix] = xsd_types
+
+    return xsd_types
+
+
+class SchemaContext(object):
+    """Namespace information of a schema tree, computed once and shared by the parser
+    """
+
+    def __init__(self, xml_tree):
+        """Initializes the schema context
+
+        Args:
+            xml_tree:
+        """
+        self.xml_tree = xml_tree
+
+        # get schema namespaces
+        self.namespaces = get_namespaces(etree.tostring(xml_tree))
+        self.default_prefix = get_default_prefix(self.namespaces)
+        self.target_namespace, self.target_namespace_prefix = get_target_namespace(xml_tree, self.namespaces)
+
+        # prefix mapped to the target namespace (None if not declared)
+        self.ns_prefix = None
+        if self.target_namespace is not None:
+            for prefix, ns in self.namespaces.iteritems():
+                if ns == self.target_namespace:
+                    self.ns_prefix = prefix
+                    break
+
+        root_attributes = xml_tree.getroot().attrib
+        self.element_form_default = root_attributes.get('elementFormDefault', 'unqualified')
+        self.attribute_form_default = root_attributes.get('attributeFormDefault', 'unqualified')
+
+        # extensions and imports, indexed on first access
+        self._extensions_by_base = None
+        self._imports = None
+
+    def get_namespaces(self, xsi=False):
+        """Returns a copy of the schema namespaces, safe to be modified by the caller
+
+        Args:
+            xsi: add the XSI prefix used by extensions
+
+        Returns:
+
+        """
+        namespaces = dict(self.namespaces)
+
+        if xsi:
+            namespaces['xsi'] = "http://www.w3.org/2001/XMLSchema-instance"
+
+        return namespaces
+
+    def get_extensions(self, base_type_name, base_namespace=ANY_NAMESPACE):
+        """Returns the simple/complex types of the tree extending the type
+
+        Args:
+            base_type_name: name of the base type (without prefix)
+            base_namespace: namespace of the base type (any namespace by default)
+
+        Returns:
+
+        """
+        if self._extensions_by_base is None:
+            self._index_extensions()
+
+        return [type_extension for type_extension, namespace in self._extensions_by_base.get(base_type_name, [])
+                if base_namespace is ANY_NAMESPACE or namespace == base_namespace]
+
+    def get_imports(self):
+        """Returns the imports of the tree (namespace, schema location)
+
+        Returns:
+
+        """
+        if self._imports is None:
+            self._index_extensions()
+
+        return self._imports
+
+    def _index_extensions(self):
+        """Indexes the extensions by base type name and the imports, in one pass over the tree
+
+        Returns:
+
+        """
+        extensions_by_base = {}
+        imports = []
+
+        extension_tag = "{0}extension".format(LXML_SCHEMA_NAMESPACE)
+        for element in self.xml_tree.iter(extension_tag, "{0}import".format(LXML_SCHEMA_NAMESPACE)):
+            if element.tag == extension_tag:
+                base_prefix, _, base = element.attrib['base'].rpartition(':')
+                # namespace of the base type, from the namespaces in the scope of the extension
+                base_namespace = element.nsmap.get(base_prefix if base_prefix != '' else None)
+
+                # get parent type that contains the extension
+                type_extension = element.getparent()
+                while 'simpleType' not in type_extension.tag and 'complexType' not in type_extension.tag:
+                    type_extension = type_extension.getparent()
+
+                extensions_by_base.setdefault(base, []).append((type_extension, base_namespace))
+            elif 'schemaLocation' in element.attrib:
+                imports.append((element.attrib.get('namespace'), element.attrib['schemaLocation']))
+
+        self._extensions_by_base = extensions_by_base
+        self._imports = imports
+
+
+class SchemaContextCache(object):
+    """Schema contexts of the trees visited during a parse (main schema and imported schemas)
+    """
+
+    def __init__(self):
+        """Initializes the cache
+        """
+        self._contexts = {}
+        self._dependency_trees = {}
+        self._dependency_errors = {}
+        self._components = {}
+
+    def get(self, xml_tree):
+        """Returns the context of the tree, computes it on first access
+
+        Args:
+            xml_tree:
+
+        Returns:
+
+        """
+        # the context keeps a reference to its tree, so the id can't be reused while cached
+        context = self._contexts.get(id(xml_tree))
+
+        if context is None or context.xml_tree is not xml_tree:
+            # compiled schemas keep their context between parses
+            compiled_schema = get_compiled_schema_of_tree(xml_tree)
+            context = compiled_schema.get_context() if compiled_schema is not None else SchemaContext(xml_tree)
+            self._contexts[id(xml_tree)] = context
+
+        return context
+
+    def get_dependency_tree(self, schema_location, download_enabled=True):
+        """Returns the tree of an imported schema, looked up once per parse
+
+        Args:
+            schema_location:
+            download_enabled:
+
+        Returns:
+
+        """
+        key = (schema_location, download_enabled)
+
+        if key not in self._dependency_trees:
+            try:
+                self._dependency_trees[key] = get_compiled_dependency(schema_location, download_enabled).xml_tree
+            except Exception, e:
+                # the dependency is not fetched again during the parse
+                self._dependency_errors[key] = e
+                self._dependency_trees[key] = None
+
+        if key in self._dependency_errors:
+            raise self._dependency_errors[key]
+
+        return self._dependency_trees[key]
+
+    def get_component(self, xml_tree, qname, kind, resolve):
+        """Returns the component (type, element, attribute...) referenced from the tree, resolved once per parse
+
+        Args:
+            xml_tree: tree where the component is referenced
+            qname: qualified name of the component
+            kind: kind of component (type, element, attribute...)
+            resolve: function returning the component, the tree and the schema location where it was found
+
+        Returns:
+
+        """
+        # the key keeps a reference to the tree, so its id can't be reused during the parse
+        key = (xml_tree, qname, kind)
+
+        if key not in self._components:
+            self._components[key] = resolve()
+
+        return self._components[key]
+
+    def get_element_tree(self, element, xml_tree, schema_location=None):
+        """Returns the tree of the element and its schema location: the given tree and location, or the tree and
+        location of the imported schema containing the element
+
+        Args:
+            element:
+            xml_tree:
+            schema_location: location of the given tree
+
+        Returns:
+
+        """
+        root = element.getroottree().getroot()
+
+        if root is xml_tree.getroot():
+            return xml_tree, schema_location
+
+        for (dependency_location, _), dependency_tree in self._dependency_trees.iteritems():
+            if dependency_tree is not None and dependency_tree.getroot() is root:
+                return dependency_tree, dependency_location
+
+        compiled_schema = get_compiled_schema_of_tree(element.getroottree())
+        if compiled_schema is not None:
+            return compiled_schema.xml_tree, compiled_schema.schema_location
+
+        return element.getroottree(), None
+
+    def find_type(self, namespace, type_name):
+        """Returns the global type with the given name from the trees of the parse having the namespace as target
+        namespace (e.g. a type of the main schema extended in an imported schema which does not import it back)
+
+        Args:
+            namespace:
+            type_name:
+
+        Returns:
+            type and its tree, (None, None) if not found
+
+        """
+        for context in self._contexts.values():
+            if context.target_namespace != namespace:
+                continue
+
+            compiled_schema = get_compiled_schema_of_tree(context.xml_tree)
+            if compiled_schema is not None:
+                element_type = compiled_schema.get_type(type_name)
+            else:
+                element_type = None
+                for tag in ('complexType', 'simpleType'):
+                    element_type = context.xml_tree.getroot().find(
+                        "{0}{1}[@name='{2}']".format(LXML_SCHEMA_NAMESPACE, tag, type_name))
+                    if element_type is not None:
+                        break
+
+            if element_type is not None:
+                return element_type, context.xml_tree
+
+        return None, None
+
+    def clear(self):
+        """Removes all the contexts
+
+        Returns:
+
+        """
+        self._contexts.clear()
+        self._dependency_trees.clear()
+        self._dependency_errors.clear()
+        self._components.clear()
+
+    def __len__(self):
+        return len(self._contexts)
+
+
+class CompiledSchema(object):
+    """Flattened schema tree with its lookup tables, shared by the parses of the same schema
+
+    The tree is read only: it is shared between parses and threads.
+    """
+
+    def __init__(self, xml_string, namespaces, schema_location=None, dependencies=None):
+        """Initializes the compiled schema
+
+        Args:
+            xml_string: flattened schema
+            namespaces: namespaces of the schema
+            schema_location: location of an imported schema (None for a template)
+            dependencies: content hashes of the flattened dependencies by url
+        """
+        self.xml_tree = XSDTree.build_tree(xml_string)
+        self.namespaces = namespaces
+        self.schema_location = schema_location
+        self.dependencies = dependencies if dependencies is not None else {}
+        # lock of the lookup tables built on first access
+        self.lock = threading.RLock()
+
+        self.global_elements = []
+        self.complex_types = []
+        self.simple_types = []
+        # global components by (tag, name), first declaration wins
+        self.components = {}
+
+        for component in self.xml_tree.getroot():
+            if not isinstance(component.tag, basestring) or not component.tag.startswith(LXML_SCHEMA_NAMESPACE):
+                continue
+
+            tag = component.tag[len(LXML_SCHEMA_NAMESPACE):]
+            if tag == 'element':
+                self.global_elements.append(component)
+            elif tag == 'complexType':
+                self.complex_types.append(component)
+            elif tag == 'simpleType':
+                self.simple_types.append(component)
+
+            if 'name' in component.attrib:
+                self.components.setdefault((tag, component.attrib['name']), component)
+
+        self._elements_by_xpath = None
+        self._context = None
+
+    def get_component(self, tag, name):
+        """Returns the global component with the given tag and name (None if not found)
+
+        Args:
+            tag: element, attribute, complexType, group...
+            name:
+
+        Returns:
+
+        """
+        return self.components.get((tag, name))
+
+    def get_type(self, name):
+        """Returns the global complex type, or else simple type, with the given name (None if not found)
+
+        Args:
+            name:
+
+        Returns:
+
+        """
+        element_type = self.components.get(('complexType', name))
+        if element_type is None:
+            element_type = self.components.get(('simpleType', name))
+        return element_type
+
+    def get_extensions(self, base_type_name):
+        """Returns the simple/complex types extending the type
+
+        Args:
+            base_type_name:
+
+        Returns:
+
+        """
+        return self.get_context().get_extensions(base_type_name)
+
+    def get_element_by_xpath(self, xsd_xpath):
+        """Returns the element of the tree with the given xpath
+
+        Args:
+            xsd_xpath: xpath returned by getpath
+
+        Returns:
+
+        """
+        with self.lock:
+            if self._elements_by_xpath is None:
+                self._elements_by_xpath = {self.xml_tree.getpath(element): element
+                                           for element in self.xml_tree.iter() if isinstance(element.tag, basestring)}
+
+        element = self._elements_by_xpath.get(xsd_xpath)
+        if element is None:
+            element = xpath(self.xml_tree, xsd_xpath, self.namespaces)[0]
+
+        return element
+
+    def get_context(self):
+        """Returns the namespace information of the tree
+
+        Returns:
+
+        """
+        with self.lock:
+            if self._context is None:
+                self._context = SchemaContext(self.xml_tree)
+
+        return self._context
+
+
+class CompiledSchemaCache(object):
+    """Compiled schemas by key, the least recently used are removed when max_size is reached
+    """
+
+    def __init__(self, max_size=None):
+        """Initializes the cache
+
+        Args:
+            max_size: maximum number of compiled schemas (None for no limit)
+        """
+        self.max_size = max_size
+
+        self.nb_compilations = 0
+
+        self._schemas = OrderedDict()
+        # compiled schemas by id of the root of their tree
+        self._schemas_by_root = {}
+        self._lock = threading.RLock()
+
+    def get(self, key, compile_schema):
+        """Returns the compiled schema with the given key, compiles it on first access
+
+        Args:
+            key:
+            compile_schema: function returning the compiled schema
+
+        Returns:
+
+        """
+        with self._lock:
+            compiled_schema = self._schemas.get(key)
+
+        # dependencies modified since the compilation (revalidated by the schema cache when older than its ttl)
+        outdated_schema = None
+        if compiled_schema is not None and get_schema_cache().is_modified(compiled_schema.dependencies):
+            outdated_schema, compiled_schema = compiled_schema, None
+
+        # compiled (dependencies downloaded and flattened) without holding the lock: the other parses are not blocked
+        if compiled_schema is None:
+            new_compiled_schema = compile_schema()
+
+        with self._lock:
+            if compiled_schema is None:
+                self.nb_compilations += 1
+                # the schema may have been compiled by another parse in the meantime
+                compiled_schema = self._schemas.get(key, new_compiled_schema)
+                if compiled_schema is outdated_schema:
+                    compiled_schema = new_compiled_schema
+                if outdated_schema is not None and self._schemas.get(key) is outdated_schema:
+                    del self._schemas_by_root[id(outdated_schema.xml_tree.getroot())]
+
+            self._schemas.pop(key, None)
+            self._schemas_by_root[id(compiled_schema.xml_tree.getroot())] = compiled_schema
+
+            # most recently used schemas at the end
+            self._schemas[key] = compiled_schema
+
+            while self.max_size is not None and len(self._schemas) > self.max_size:
+                _, evicted_schema = self._schemas.popitem(last=False)
+                del self._schemas_by_root[id(evicted_schema.xml_tree.getroot())]
+
+            return compiled_schema
+
+    def get_by_tree(self, xml_tree):
+        """Returns the compiled schema of the tree (None if the tree is not from a cached schema)
+
+        Args:
+            xml_tree:
+
+        Returns:
+
+        """
+        root = xml_tree.getroot()
+        compiled_schema = self._schemas_by_root.get(id(root))
+
+        # the tree of the compiled schema or another tree of the same document (e.g. getroottree)
+        if compiled_schema is not None and compiled_schema.xml_tree.getroot() is root:
+            return compiled_schema
+
+        return None
+
+    def clear(self):
+        """Removes all the compiled schemas
+
+        Returns:
+
+        """
+        with self._lock:
+            self._schemas.clear()
+            self._schemas_by_root.clear()
+
+    def __len__(self):
+        return len(self._schemas)
+
+
+_compiled_schema_cache = CompiledSchemaCache(PARSER_COMPILED_SCHEMA_CACHE_SIZE)
+
+
+def get_compiled_schema_cache():
+    """Returns the compiled schema cache of the process
+
+    Returns:
+
+    """
+    return _compiled_schema_cache
+
+
+def _get_content_hash(content):
+    """Returns the hash of a schema content
+
+    Args:
+        content:
+
+    Returns:
+
+    """
+    if isinstance(content, unicode):
+        content = content.encode('utf-8')
+
+    return hashlib.sha256(content).hexdigest()
+
+
+def get_compiled_schema(xsd_doc_data, template_id=None, download_enabled=True):
+    """Returns the compiled schema, flattened once per template and content
+
+    Args:
+        xsd_doc_data:
+        template_id:
+        download_enabled:
+
+    Returns:
+
+    """
+    def compile_schema():
+        flattener = XSDFlattenerDatabaseOrCache(xsd_doc_data, download_enabled)
+        return CompiledSchema(flattener.get_flat(), get_namespaces(xsd_doc_data),
+                              dependencies=flattener.dependency_hashes)
+
+    key = (template_id, _get_content_hash(xsd_doc_data), download_enabled)
+    return _compiled_schema_cache.get(key, compile_schema)
+
+
+def get_compiled_dependency(schema_location, download_enabled=True):
+    """Returns the compiled schema of an imported schema, flattened once per content
+
+    Args:
+        schema_location:
+        download_enabled:
+
+    Returns:
+
+    """
+    content = get_schema_cache().get_content(schema_location)
+
+    def compile_schema():
+        xml_string, dependencies = content, None
+        # flatten the includes if any
+        if len(XSDTree.build_tree(content).findall('//{}include'.format(LXML_SCHEMA_NAMESPACE))) > 0:
+            def flatten(dependency_content):
+                flattener = XSDFlattenerDatabaseOrCache(dependency_content, download_enabled)
+                return flattener.get_flat(), flattener.dependency_hashes
+
+            xml_string, dependencies = get_schema_cache().get_flat_content(schema_location, flatten)
+
+        return CompiledSchema(xml_string, get_namespaces(content), schema_location, dependencies)
+
+    key = (schema_location, _get_content_hash(content), download_enabled)
+    return _compiled_schema_cache.get(key, compile_schema)
+
+
+def get_compiled_schema_of_tree(xml_tree):
+    """Returns the compiled schema of the tree (None if the tree is not from a cached schema)
+
+    Args:
+        xml_tree:
+
+    Returns:
+
+    """
+    return _compiled_schema_cache.get_by_tree(xml_tree)
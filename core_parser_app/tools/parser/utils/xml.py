@@ -1,11 +1,20 @@
 """XML utils
 """
+import threading
+from collections import OrderedDict
+
+from lxml import etree
+
 from xml_utils.commons.constants import LXML_SCHEMA_NAMESPACE
-from core_parser_app.settings import MODULE_TAG_NAME
+from core_parser_app.settings import MODULE_TAG_NAME, PARSER_XPATH_CACHE_SIZE
 from urlparse import urlparse
 from core_parser_app.components.module import api as module_api
 
 APP_INFO_OPTIONS = ['label', 'placeholder', 'tooltip', 'use', 'default', MODULE_TAG_NAME]
+_APP_INFO_OPTIONS_SET = frozenset(APP_INFO_OPTIONS)
+
+_ANNOTATION_TAG = "{0}annotation".format(LXML_SCHEMA_NAMESPACE)
+_APP_INFO_TAG = "{0}appinfo".format(LXML_SCHEMA_NAMESPACE)
 
 
 def get_app_info_options(element):
@@ -20,16 +29,24 @@ def get_app_info_options(element):
     # Initialize dictionary to return
     app_info = {}
 
-    # Get app info of the element
-    app_info_elements = element.findall("./{0}annotation/{0}appinfo".format(LXML_SCHEMA_NAMESPACE))
-    # Browse the app info
-    for app_info_element in app_info_elements:
-        # get the elements in the app info
-        for app_info_child in app_info_element.getchildren():
+    # Browse the app info of the element (annotation/appinfo)
+    for annotation_element in element:
+        if annotation_element.tag != _ANNOTATION_TAG:
+            continue
+
+        for app_info_element in annotation_element:
+            if app_info_element.tag != _APP_INFO_TAG:
+                continue
+
             # look for parser options in the app info elements
-            for option in APP_INFO_OPTIONS:
-                # if the option is found
-                if option in app_info_child.tag:
+            for app_info_child in app_info_element:
+                # skip comments and processing instructions
+                if not isinstance(app_info_child.tag, basestring):
+                    continue
+
+                # the option is the local name of the tag
+                option = app_info_child.tag.rsplit('}', 1)[-1]
+                if option in _APP_INFO_OPTIONS_SET:
                     # set the option with its value
                     app_info[option] = app_info_child.text
 
@@ -37,6 +54,74 @@ def get_app_info_options(element):
     return app_info
 
 
+class AppInfoCache(object):
+    """App info options and module urls of the schema elements visited during a parse
+    """
+
+    def __init__(self):
+        """Initializes the cache
+        """
+        self._app_info = {}
+        self._module_urls = {}
+
+    def get_app_info_options(self, element):
+        """Returns the app info options of the element, parsed on first access
+
+        Args:
+            element:
+
+        Returns:
+
+        """
+        # the cache keeps a reference to the element, so its proxy is reused by lxml
+        if element not in self._app_info:
+            self._app_info[element] = get_app_info_options(element)
+
+        return self._app_info[element]
+
+    def get_module_url(self, element):
+        """Returns the url of the module attached to the element, parsed on first access
+
+        Args:
+            element:
+
+        Returns:
+
+        """
+        if element not in self._module_urls:
+            self._module_urls[element] = get_module_url(element, app_info=self.get_app_info_options(element))
+
+        return self._module_urls[element]
+
+    def set_module(self, element, module_url):
+        """Attaches a module to the element for the rest of the parse (the schema is not modified)
+
+        Args:
+            element:
+            module_url:
+
+        Returns:
+
+        """
+        app_info = dict(self.get_app_info_options(element))
+        app_info[MODULE_TAG_NAME] = module_url
+
+        self._app_info[element] = app_info
+        self._module_urls.pop(element, None)
+
+    def clear(self):
+        """Removes all the elements
+
+        Returns:
+
+        """
+        self._app_info.clear()
+        self._module_urls.clear()
+
+    def __len__(self):
+        return len(self._app_info)
+
+
 def get_element_occurrences(element):
     """Gets min/max occurrences information of the element
 
@@ -89,17 +174,19 @@ def get_attribute_occurrences(element):
     return min_occurs, max_occurs
 
 
-def get_module_url(element):
+def get_module_url(element, app_info=None):
     """Gets url of the module attached to element
 
     Args:
         element:
+        app_info: app info options of the element (parsed from the element if not given)
 
     Returns:
 
     """
     # get the app info of the element
-    app_info = get_app_info_options(element)
+    if app_info is None:
+        app_info = get_app_info_options(element)
 
     # check if a module is set for this element
     if MODULE_TAG_NAME in app_info:
@@ -113,7 +200,108 @@ def get_module_url(element):
         url_path = parsed_url.path
 
         # check that the url is registered in the system
-        if url_path in module_api.get_all_urls():
+        if module_api.is_registered_url(url_path):
             return parsed_url
 
     return None
+
+
+class XPathCache(object):
+    """Compiled XPath expressions, the least recently used ones being removed when the cache is full
+    """
+
+    def __init__(self, max_size=None):
+        """Initializes the cache
+
+        Args:
+            max_size: maximum number of compiled expressions (None for no limit)
+        """
+        self.max_size = max_size
+
+        self.hits = 0
+        self.misses = 0
+
+        self._expressions = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, xpath, namespaces=None):
+        """Returns the compiled expression, compiles it on first access
+
+        Args:
+            xpath:
+            namespaces: prefixes used in the xpath
+
+        Returns:
+
+        """
+        key = (xpath, frozenset(namespaces.iteritems()) if namespaces else None)
+
+        with self._lock:
+            expression = self._expressions.pop(key, None)
+
+            if expression is None:
+                self.misses += 1
+                expression = etree.XPath(xpath, namespaces=namespaces)
+            else:
+                self.hits += 1
+
+            # most recently used expressions at the end
+            self._expressions[key] = expression
+
+            if self.max_size is not None and len(self._expressions) > self.max_size:
+                self._expressions.popitem(last=False)
+
+            return expression
+
+    def xpath(self, xml_tree, xpath, namespaces=None):
+        """Evaluates the xpath on the tree (or element)
+
+        Args:
+            xml_tree:
+            xpath:
+            namespaces: prefixes used in the xpath
+
+        Returns:
+
+        """
+        return self.get(xpath, namespaces)(xml_tree)
+
+    def clear(self):
+        """Removes all the compiled expressions and resets the counters
+
+        Returns:
+
+        """
+        with self._lock:
+            self._expressions.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._expressions)
+
+
+_xpath_cache = XPathCache(PARSER_XPATH_CACHE_SIZE)
+
+
+def get_xpath_cache():
+    """Returns the XPath cache of the process
+
+    Returns:
+
+    """
+    return _xpath_cache
+
+
+def xpath(xml_tree, xpath, namespaces=None):
+    """Evaluates the xpath on the tree (or element), with the expressions compiled once per process
+
+    Args:
+        xml_tree:
+        xpath:
+        namespaces: prefixes used in the xpath
+
+    Returns:
+
+    """
+    return _xpath_cache.xpath(xml_tree, xpath, namespaces)
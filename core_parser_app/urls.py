@@ -5,6 +5,8 @@ from core_parser_app.views.user import ajax as user_ajax
 from core_parser_app.views.common import views as common_views, ajax as common_ajax
 
 urlpatterns = [
+    url(r'^data-structure-element/values', user_ajax.save_data_structure_element_values,
+        name='core_parser_app_data_structure_element_values'),
     url(r'^data-structure-element/value', user_ajax.data_structure_element_value,
         name='core_parser_app_data_structure_element_value'),
     url(r'^template/modules/(?P<pk>\w+)',
@@ -1,6 +1,8 @@
 """AJAX views
 """
+from bson.objectid import ObjectId
 from core_parser_app.components.data_structure_element import api as data_structure_element_api
+from core_parser_app.settings import PARSER_MAX_SAVED_VALUES
 from django.http.response import HttpResponseBadRequest, HttpResponse
 import json
 
@@ -63,3 +65,61 @@ def save_data_structure_element_value(request):
     data_structure_element_api.upsert(input_element)
 
     return HttpResponse(json.dumps({'replaced': input_previous_value}), content_type='application/json')
+
+
+def save_data_structure_element_values(request):
+    """Saves the values of several data structure elements in one write
+
+    POST parameter "values": JSON list of {"id": ..., "value": ...}. Each item of the response contains the id and
+    either the replaced value or an error.
+
+    Args:
+        request:
+
+    Returns:
+
+    """
+    if request.method != 'POST' or 'values' not in request.POST:
+        return HttpResponseBadRequest("Error when trying to save data structure elements: values are missing.")
+
+    try:
+        items = json.loads(request.POST['values'])
+    except ValueError:
+        return HttpResponseBadRequest("Error when trying to save data structure elements: values are not valid JSON.")
+
+    if type(items) != list:
+        return HttpResponseBadRequest("Error when trying to save data structure elements: values should be a list.")
+
+    if len(items) > PARSER_MAX_SAVED_VALUES:
+        return HttpResponseBadRequest("Error when trying to save data structure elements: "
+                                      "no more than {0} values can be saved at once.".format(PARSER_MAX_SAVED_VALUES))
+
+    results = []
+    element_values = []
+    saved_ids = set()
+    for item in items:
+        item_id = item.get('id') if type(item) == dict else None
+        result = {'id': item_id}
+        results.append(result)
+
+        if not isinstance(item_id, basestring) or not ObjectId.is_valid(item_id):
+            result['error'] = 'id is missing or invalid.'
+        elif not isinstance(item.get('value'), basestring):
+            result['error'] = 'value is missing or is not a string.'
+        elif item_id in saved_ids:
+            result['error'] = 'element is saved more than once.'
+        else:
+            saved_ids.add(item_id)
+            element_values.append((item_id, item['value']))
+
+    previous_values = data_structure_element_api.update_values(element_values)
+
+    for result in results:
+        if 'error' not in result:
+            element_id = ObjectId(result['id'])
+            if element_id in previous_values:
+                result['replaced'] = previous_values[element_id]
+            else:
+                result['error'] = 'element not found.'
+
+    return HttpResponse(json.dumps({'values': results}), content_type='application/json')
@@ -1,6 +1,7 @@
 """ Integration test of Data structure element
 """
 from bson.objectid import ObjectId
+from mock import patch
 
 from core_main_app.commons import exceptions
 from core_main_app.utils.integration_tests.integration_base_test_case import MongoIntegrationBaseTestCase
@@ -49,6 +50,37 @@ class TestDataStructureElementGetById(MongoIntegrationBaseTestCase):
             api_data_structure_element.get_by_id("")
 
 
+class TestDataStructureElementInsertMany(MongoIntegrationBaseTestCase):
+    fixture = fixture_data
+
+    def test_insert_many_saves_all_elements(self):
+        # Arrange
+        child = DataStructureElement('child', 'child', id=ObjectId())
+        parent = DataStructureElement('parent', 'parent', children=[child], id=ObjectId())
+        # Act
+        api_data_structure_element.insert_many([child, parent])
+        # Assert
+        self.assertEqual(len(api_data_structure_element.get_all()),
+                         len(self.fixture.data_structure_element_collection) + 2)
+        self.assertEqual(api_data_structure_element.get_by_id(parent.id).children, [child])
+
+    def test_insert_many_elements_can_be_updated_after_insertion(self):
+        # Arrange
+        element = DataStructureElement('tag', 'value', id=ObjectId())
+        api_data_structure_element.insert_many([element])
+        # Act
+        element.value = 'new value'
+        api_data_structure_element.upsert(element)
+        # Assert
+        self.assertEqual(api_data_structure_element.get_by_id(element.id).value, 'new value')
+
+    def test_insert_many_with_empty_list_returns_empty_list(self):
+        # Act
+        result = api_data_structure_element.insert_many([])
+        # Assert
+        self.assertEqual(result, [])
+
+
 class TestDataStructureElementGetByChildId(MongoIntegrationBaseTestCase):
     fixture = fixture_data
 
@@ -104,3 +136,412 @@ class TestDataStructureElementGetRootElement(MongoIntegrationBaseTestCase):
             result = api_data_structure_element.get_root_element(element)
             # Assert
             self.assertEqual(result, self.fixture.data_structure_element_root_2)
+
+
+class TestDataStructureElementGetSubtree(MongoIntegrationBaseTestCase):
+    fixture = fixture_multiple_levels_data
+
+    def test_get_subtree_returns_all_descendants(self):
+        # Arrange
+        element = api_data_structure_element.get_by_id(self.fixture.data_structure_element_root.id)
+        # Act
+        result = api_data_structure_element.get_subtree(element)
+        # Assert
+        self.assertEqual(result, self.fixture.data_structure_element_root)
+        self.assertEqual(result.children, [self.fixture.data_structure_element_1,
+                                           self.fixture.data_structure_element_2])
+        self.assertEqual(result.children[0].children[0].children, [self.fixture.data_structure_element_1_1_1,
+                                                                   self.fixture.data_structure_element_1_1_2,
+                                                                   self.fixture.data_structure_element_1_1_3])
+        self.assertEqual(result.children[0].children[0].children[1].children[0].value, 'value_1_1_2_1')
+
+    def test_get_subtree_returns_loaded_subtree(self):
+        # Arrange
+        element = api_data_structure_element.get_by_id(self.fixture.data_structure_element_1_1.id)
+        # Act
+        result = api_data_structure_element.get_subtree(element)
+        # Assert
+        self.assertTrue(DataStructureElement.is_subtree_loaded(result))
+
+    def test_get_subtree_returns_element_already_in_memory(self):
+        # Arrange
+        element = DataStructureElement('tag', 'value', children=[DataStructureElement('child', 'child')])
+        # Act
+        result = api_data_structure_element.get_subtree(element)
+        # Assert
+        self.assertIs(result, element)
+
+    def test_get_subtree_by_id_raises_does_not_exist_error_if_not_found(self):
+        # Act # Assert
+        with self.assertRaises(exceptions.DoesNotExist):
+            DataStructureElement.get_subtree_by_id(ObjectId())
+
+    def test_get_subtree_by_id_raises_model_error_if_id_is_invalid(self):
+        # Act # Assert
+        with self.assertRaises(exceptions.ModelError):
+            DataStructureElement.get_subtree_by_id("")
+
+
+class TestDataStructureElementDeleteBranch(MongoIntegrationBaseTestCase):
+    fixture = fixture_multiple_levels_data
+
+    def test_delete_branch_deletes_element_and_all_descendants(self):
+        # Act
+        api_data_structure_element.delete_branch(self.fixture.data_structure_element_1.id)
+        # Assert
+        remaining_elements = api_data_structure_element.get_all()
+        self.assertEqual(set(element.id for element in remaining_elements),
+                         set([self.fixture.data_structure_element_root.id,
+                              self.fixture.data_structure_element_2.id,
+                              self.fixture.data_structure_element_root_2.id,
+                              self.fixture.data_structure_element_test.id]))
+
+    def test_delete_branch_returns_number_of_deleted_elements(self):
+        # Act
+        result = api_data_structure_element.delete_branch(self.fixture.data_structure_element_root.id)
+        # Assert
+        self.assertEqual(result, 8)
+
+    def test_delete_branch_ignores_missing_children(self):
+        # Arrange
+        self.fixture.data_structure_element_1_1_2.delete()
+        # Act
+        result = api_data_structure_element.delete_branch(self.fixture.data_structure_element_1_1.id)
+        # Assert
+        self.assertEqual(result, 3)
+
+    def test_delete_branch_returns_zero_if_not_found(self):
+        # Act
+        result = api_data_structure_element.delete_branch(ObjectId())
+        # Assert
+        self.assertEqual(result, 0)
+
+    def test_delete_branch_sends_one_query_per_level_and_one_delete_per_batch(self):
+        # Arrange
+        collection_class = type(DataStructureElement._get_collection())
+        # Act
+        with patch.object(collection_class, 'find', autospec=True, side_effect=collection_class.find) as mock_find, \
+                patch.object(collection_class, 'delete_many', autospec=True,
+                             side_effect=collection_class.delete_many) as mock_delete_many:
+            api_data_structure_element.delete_branch(self.fixture.data_structure_element_root.id)
+        # Assert: one find per level of the tree, mongomock runs one more find to delete the documents
+        self.assertEqual(mock_find.call_count, 5 + 1)
+        self.assertEqual(mock_delete_many.call_count, 1)
+
+    def test_delete_branch_raises_model_error_if_id_is_invalid(self):
+        # Act # Assert
+        with self.assertRaises(exceptions.ModelError):
+            api_data_structure_element.delete_branch("")
+
+
+class TestDataStructureElementParents(MongoIntegrationBaseTestCase):
+    fixture = fixture_multiple_levels_data
+
+    def test_update_all_parents_returns_number_of_updated_elements(self):
+        # Act
+        result = api_data_structure_element.update_all_parents()
+        # Assert
+        self.assertEqual(result, len(self.fixture.data_structure_element_collection))
+
+    def test_update_all_parents_sets_parent_and_root(self):
+        # Act
+        api_data_structure_element.update_all_parents()
+        # Assert
+        element = api_data_structure_element.get_by_id(self.fixture.data_structure_element_1_1_2_1.id)
+        self.assertEqual(element.parent, self.fixture.data_structure_element_1_1_2.id)
+        self.assertEqual(element.root, self.fixture.data_structure_element_root.id)
+        root = api_data_structure_element.get_by_id(self.fixture.data_structure_element_root_2.id)
+        self.assertIsNone(root.parent)
+        self.assertEqual(root.root, root.id)
+
+    def test_get_parent_element_and_root_element_use_stored_ids(self):
+        # Arrange
+        api_data_structure_element.update_all_parents()
+        element = api_data_structure_element.get_by_id(self.fixture.data_structure_element_1_1_2_1.id)
+        # Act
+        with patch.object(DataStructureElement, 'get_all_by_child_id') as mock_get_all_by_child_id:
+            parent = api_data_structure_element.get_parent_element(element)
+            root = api_data_structure_element.get_root_element(element)
+        # Assert
+        self.assertEqual(parent, self.fixture.data_structure_element_1_1_2)
+        self.assertEqual(root, self.fixture.data_structure_element_root)
+        self.assertFalse(mock_get_all_by_child_id.called)
+
+    def test_get_parent_element_returns_none_for_root(self):
+        # Arrange
+        api_data_structure_element.update_all_parents()
+        root = api_data_structure_element.get_by_id(self.fixture.data_structure_element_root.id)
+        # Act
+        result = api_data_structure_element.get_parent_element(root)
+        # Assert
+        self.assertIsNone(result)
+
+    def test_get_parent_element_without_stored_parent_returns_parent(self):
+        # Act
+        result = api_data_structure_element.get_parent_element(self.fixture.data_structure_element_1_1)
+        # Assert
+        self.assertEqual(result, self.fixture.data_structure_element_1)
+
+    def test_add_to_set_sets_parent_and_root_of_children(self):
+        # Arrange
+        api_data_structure_element.update_all_parents()
+        parent = api_data_structure_element.get_by_id(self.fixture.data_structure_element_1_1_3.id)
+        child = DataStructureElement('child', 'child').save()
+        # Act
+        api_data_structure_element.add_to_set(parent, [child])
+        # Assert
+        child = api_data_structure_element.get_by_id(child.id)
+        self.assertEqual(child.parent, parent.id)
+        self.assertEqual(child.root, self.fixture.data_structure_element_root.id)
+
+    def test_pull_children_detaches_child(self):
+        # Arrange
+        api_data_structure_element.update_all_parents()
+        parent = api_data_structure_element.get_by_id(self.fixture.data_structure_element_1_1.id)
+        child = api_data_structure_element.get_by_id(self.fixture.data_structure_element_1_1_2.id)
+        # Act
+        api_data_structure_element.pull_children(parent, child)
+        # Assert
+        child = api_data_structure_element.get_by_id(child.id)
+        self.assertIsNone(child.parent)
+        self.assertIsNone(api_data_structure_element.get_parent_element(child))
+
+
+class TestDataStructureElementVersions(MongoIntegrationBaseTestCase):
+    fixture = fixture_multiple_levels_data
+
+    def setUp(self):
+        super(TestDataStructureElementVersions, self).setUp()
+        render_cache = patch('core_parser_app.components.data_structure_element.api.PARSER_RENDER_CACHE', 'default')
+        render_cache.start()
+        self.addCleanup(render_cache.stop)
+
+    def _get_versions(self, elements):
+        return [api_data_structure_element.get_by_id(element.id).version for element in elements]
+
+    def test_get_ancestor_ids_returns_ids_from_parent_to_root(self):
+        # Arrange
+        api_data_structure_element.update_all_parents()
+        element = api_data_structure_element.get_by_id(self.fixture.data_structure_element_1_1_2_1.id)
+        # Act
+        result = DataStructureElement.get_ancestor_ids(element)
+        # Assert
+        self.assertEqual(result, [self.fixture.data_structure_element_1_1_2.id,
+                                  self.fixture.data_structure_element_1_1.id,
+                                  self.fixture.data_structure_element_1.id,
+                                  self.fixture.data_structure_element_root.id])
+
+    def test_get_ancestor_ids_without_stored_parents_returns_ids_from_parent_to_root(self):
+        # Act
+        result = DataStructureElement.get_ancestor_ids(self.fixture.data_structure_element_1_1)
+        # Assert
+        self.assertEqual(result, [self.fixture.data_structure_element_1.id, self.fixture.data_structure_element_root.id])
+
+    def test_upsert_increments_version_of_element_and_ancestors(self):
+        # Arrange
+        api_data_structure_element.update_all_parents()
+        element = api_data_structure_element.get_by_id(self.fixture.data_structure_element_1_1_2.id)
+        element.value = 'new value'
+        # Act
+        api_data_structure_element.upsert(element)
+        # Assert
+        self.assertEqual(element.version, 1)
+        self.assertEqual(self._get_versions([self.fixture.data_structure_element_1_1_2,
+                                             self.fixture.data_structure_element_1_1,
+                                             self.fixture.data_structure_element_1,
+                                             self.fixture.data_structure_element_root]), [1, 1, 1, 1])
+        self.assertEqual(self._get_versions([self.fixture.data_structure_element_1_1_2_1,
+                                             self.fixture.data_structure_element_1_1_1,
+                                             self.fixture.data_structure_element_2]), [0, 0, 0])
+
+    def test_pull_children_increments_version_of_element_and_ancestors(self):
+        # Arrange
+        api_data_structure_element.update_all_parents()
+        parent = api_data_structure_element.get_by_id(self.fixture.data_structure_element_1_1.id)
+        child = api_data_structure_element.get_by_id(self.fixture.data_structure_element_1_1_3.id)
+        # Act
+        api_data_structure_element.pull_children(parent, child)
+        # Assert
+        self.assertEqual(parent.version, 1)
+        self.assertEqual(self._get_versions([self.fixture.data_structure_element_1,
+                                             self.fixture.data_structure_element_root,
+                                             self.fixture.data_structure_element_2]), [1, 1, 0])
+
+    def test_upsert_reads_back_version_incremented_by_other_writes(self):
+        # Arrange
+        api_data_structure_element.update_all_parents()
+        element = api_data_structure_element.get_by_id(self.fixture.data_structure_element_1_1.id)
+        child = api_data_structure_element.get_by_id(self.fixture.data_structure_element_1_1_2.id)
+        api_data_structure_element.upsert(element)
+        # the version of the element is incremented in database by the write of its child
+        api_data_structure_element.upsert(child)
+        element.value = 'new value'
+        # Act
+        api_data_structure_element.upsert(element)
+        # Assert
+        self.assertEqual(element.version, 3)
+        self.assertEqual(self._get_versions([element]), [3])
+
+    def test_save_does_not_overwrite_version(self):
+        # Arrange
+        api_data_structure_element.update_all_parents()
+        element = api_data_structure_element.get_by_id(self.fixture.data_structure_element_1_1.id)
+        child = api_data_structure_element.get_by_id(self.fixture.data_structure_element_1_1_2.id)
+        api_data_structure_element.upsert(element)
+        api_data_structure_element.upsert(child)
+        element.value = 'new value'
+        # Act
+        element.save()
+        # Assert
+        self.assertEqual(self._get_versions([element]), [2])
+
+    def test_upsert_does_not_write_versions_when_render_cache_is_disabled(self):
+        # Arrange
+        api_data_structure_element.update_all_parents()
+        element = api_data_structure_element.get_by_id(self.fixture.data_structure_element_1_1_2.id)
+        element.value = 'new value'
+        # Act
+        with patch('core_parser_app.components.data_structure_element.api.PARSER_RENDER_CACHE', None), \
+                patch.object(DataStructureElement, 'get_ancestor_ids') as mock_get_ancestor_ids:
+            api_data_structure_element.upsert(element)
+        # Assert
+        self.assertFalse(mock_get_ancestor_ids.called)
+        self.assertEqual(self._get_versions([self.fixture.data_structure_element_1_1_2,
+                                             self.fixture.data_structure_element_root]), [0, 0])
+        self.assertEqual(api_data_structure_element.get_by_id(element.id).value, 'new value')
+
+
+class TestDataStructureElementUpdateValues(MongoIntegrationBaseTestCase):
+    fixture = fixture_multiple_levels_data
+
+    def test_update_values_returns_previous_values(self):
+        # Act
+        result = api_data_structure_element.update_values([
+            (str(self.fixture.data_structure_element_1_1_1.id), 'new_1_1_1'),
+            (str(self.fixture.data_structure_element_2.id), 'new_2'),
+        ])
+        # Assert
+        self.assertEqual(result, {self.fixture.data_structure_element_1_1_1.id: 'value_1_1_1',
+                                  self.fixture.data_structure_element_2.id: 'value_2'})
+
+    def test_update_values_sets_values(self):
+        # Act
+        api_data_structure_element.update_values([
+            (str(self.fixture.data_structure_element_1_1_1.id), 'new_1_1_1'),
+            (str(self.fixture.data_structure_element_2.id), 'new_2'),
+        ])
+        # Assert
+        self.assertEqual(api_data_structure_element.get_by_id(self.fixture.data_structure_element_1_1_1.id).value,
+                         'new_1_1_1')
+        self.assertEqual(api_data_structure_element.get_by_id(self.fixture.data_structure_element_2.id).value,
+                         'new_2')
+        self.assertEqual(api_data_structure_element.get_by_id(self.fixture.data_structure_element_1_1_2.id).value,
+                         'value_1_1_2')
+
+    @patch('core_parser_app.components.data_structure_element.api.PARSER_RENDER_CACHE', 'default')
+    def test_update_values_increments_version_of_elements_and_ancestors(self):
+        # Arrange
+        api_data_structure_element.update_all_parents()
+        # Act
+        api_data_structure_element.update_values([(str(self.fixture.data_structure_element_1_1_1.id), 'new')])
+        # Assert
+        versions = [api_data_structure_element.get_by_id(element.id).version
+                    for element in [self.fixture.data_structure_element_1_1_1, self.fixture.data_structure_element_1_1,
+                                    self.fixture.data_structure_element_1, self.fixture.data_structure_element_root,
+                                    self.fixture.data_structure_element_1_1_2, self.fixture.data_structure_element_2]]
+        self.assertEqual(versions, [1, 1, 1, 1, 0, 0])
+
+    @patch('core_parser_app.components.data_structure_element.api.PARSER_RENDER_CACHE', None)
+    def test_update_values_does_not_look_up_ancestors_when_render_cache_is_disabled(self):
+        # Arrange
+        api_data_structure_element.update_all_parents()
+        # Act
+        with patch.object(DataStructureElement, 'get_all_ancestor_ids') as mock_get_all_ancestor_ids:
+            api_data_structure_element.update_values([(str(self.fixture.data_structure_element_1_1_1.id), 'new')])
+        # Assert
+        self.assertFalse(mock_get_all_ancestor_ids.called)
+        element = api_data_structure_element.get_by_id(self.fixture.data_structure_element_1_1_1.id)
+        self.assertEqual((element.value, element.version), ('new', 0))
+
+    def test_update_values_ignores_elements_not_found(self):
+        # Arrange
+        unknown_id = ObjectId()
+        # Act
+        result = api_data_structure_element.update_values([(str(unknown_id), 'new')])
+        # Assert
+        self.assertEqual(result, {})
+        with self.assertRaises(exceptions.DoesNotExist):
+            api_data_structure_element.get_by_id(unknown_id)
+
+
+class TestDataStructureElementUpdateModuleOptions(MongoIntegrationBaseTestCase):
+    fixture = fixture_multiple_levels_data
+
+    def setUp(self):
+        super(TestDataStructureElementUpdateModuleOptions, self).setUp()
+        self.module_element = self.fixture.data_structure_element_1_1_3
+        self.module_element.options = {'url': '/module', 'data': 'data', 'attributes': {'unit': 'm'}}
+        self.module_element.save()
+
+    def test_update_module_options_sets_modified_options(self):
+        # Act
+        result = api_data_structure_element.update_module_options(self.module_element,
+                                                                   {'data': 'new data', 'attributes': {'unit': 's'}})
+        # Assert
+        self.assertTrue(result)
+        module_element = api_data_structure_element.get_by_id(self.module_element.id)
+        self.assertEqual(module_element.options, {'url': '/module', 'data': 'new data', 'attributes': {'unit': 's'}})
+        self.assertEqual(module_element.version, 1)
+        self.assertEqual(self.module_element.options['data'], 'new data')
+
+    def test_update_module_options_does_not_write_unmodified_options(self):
+        # Act
+        with patch.object(DataStructureElement, 'set_options') as mock_set_options:
+            result = api_data_structure_element.update_module_options(self.module_element,
+                                                                       {'data': 'data', 'attributes': {'unit': 'm'}})
+        # Assert
+        self.assertFalse(result)
+        self.assertFalse(mock_set_options.called)
+
+    def test_update_module_options_writes_only_modified_options(self):
+        # Act
+        with patch.object(DataStructureElement, 'set_options') as mock_set_options:
+            api_data_structure_element.update_module_options(self.module_element,
+                                                             {'data': 'new data', 'attributes': {'unit': 'm'}})
+        # Assert
+        mock_set_options.assert_called_once_with(self.module_element.id, {'data': 'new data'})
+
+
+class TestDataStructureElementIndexes(MongoIntegrationBaseTestCase):
+    fixture = fixture_multiple_levels_data
+
+    def test_ensure_indexes_creates_children_and_xpath_indexes(self):
+        # Act
+        DataStructureElement.ensure_indexes()
+        # Assert
+        index_keys = [index['key'] for index in DataStructureElement._get_collection().index_information().values()]
+        self.assertIn([('children', 1)], index_keys)
+        self.assertIn([('root', 1), ('options.xpath.xml', 1)], index_keys)
+
+
+class TestDataStructureElementGetAllByXpath(MongoIntegrationBaseTestCase):
+    fixture = fixture_multiple_levels_data
+
+    def test_get_all_by_xpath_returns_elements_of_the_tree_with_the_xpath(self):
+        # Arrange
+        root_id = self.fixture.data_structure_element_root.id
+        api_data_structure_element.update_all_parents()
+        for element_id in [self.fixture.data_structure_element_1_1.id, self.fixture.data_structure_element_test.id]:
+            element = api_data_structure_element.get_by_id(element_id)
+            element.options = {'xpath': {'xml': '/root[1]/a[1]'}}
+            element.save()
+        # Act
+        result = api_data_structure_element.get_all_by_xpath(root_id, '/root[1]/a[1]')
+        # Assert
+        self.assertEqual(list(result), [self.fixture.data_structure_element_1_1])
+
+    def test_get_all_by_xpath_returns_empty_list_if_not_found(self):
+        # Act
+        result = api_data_structure_element.get_all_by_xpath(self.fixture.data_structure_element_root.id, '/a[1]')
+        # Assert
+        self.assertEqual(len(result), 0)
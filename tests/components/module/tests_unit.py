@@ -3,6 +3,8 @@ from bson.objectid import ObjectId
 from mock.mock import Mock, patch
 from mongoengine import errors as mongoengine_errors
 from django.core import exceptions as django_exceptions
+from django.core.cache import caches
+from core_main_app.commons import exceptions
 from core_parser_app.components.module.models import Module
 from core_parser_app.components.module import api as module_api
 
@@ -106,6 +108,116 @@ class TestModuleGetAllUrls(TestCase):
         self.assertTrue(all(isinstance(item, str) for item in result))
 
 
+class TestModuleRegistry(TestCase):
+    def setUp(self):
+        module_api._clear_module_registry()
+
+    def tearDown(self):
+        module_api._clear_module_registry()
+
+    @patch('core_parser_app.components.module.models.Module.get_all')
+    def test_get_registered_module_returns_module(self, mock_get_all):
+        # Arrange
+        module = _create_module()
+        mock_get_all.return_value = [module]
+
+        # Act
+        result = module_api.get_registered_module(module.url)
+
+        # Assert
+        self.assertEqual(result, module)
+
+    @patch('core_parser_app.components.module.models.Module.get_all')
+    def test_get_registered_module_raises_does_not_exist_if_url_not_registered(self, mock_get_all):
+        # Arrange
+        mock_get_all.return_value = [_create_module()]
+
+        # Act + Assert
+        with self.assertRaises(exceptions.DoesNotExist):
+            module_api.get_registered_module("/absent")
+
+    @patch('core_parser_app.components.module.models.Module.get_all')
+    def test_registry_is_loaded_once(self, mock_get_all):
+        # Arrange
+        mock_get_all.return_value = [_create_module()]
+
+        # Act
+        for _ in range(10):
+            module_api.get_registered_module("/module")
+            module_api.is_registered_url("/absent")
+
+        # Assert
+        self.assertEqual(mock_get_all.call_count, 1)
+
+    @patch('core_parser_app.components.module.models.Module.save')
+    @patch('core_parser_app.components.module.models.Module.get_all')
+    def test_upsert_reloads_registry(self, mock_get_all, mock_save):
+        # Arrange
+        mock_get_all.return_value = []
+        self.assertFalse(module_api.is_registered_url("/module"))
+        module = _create_module()
+        mock_get_all.return_value = [module]
+
+        # Act
+        module_api.upsert(module)
+
+        # Assert
+        self.assertTrue(module_api.is_registered_url("/module"))
+
+    @patch('core_parser_app.components.module.models.Module.delete_all')
+    @patch('core_parser_app.components.module.models.Module.get_all')
+    def test_delete_all_reloads_registry(self, mock_get_all, mock_delete_all):
+        # Arrange
+        mock_get_all.return_value = [_create_module()]
+        self.assertTrue(module_api.is_registered_url("/module"))
+        mock_get_all.return_value = []
+
+        # Act
+        module_api.delete_all()
+
+        # Assert
+        self.assertFalse(module_api.is_registered_url("/module"))
+
+    @patch('core_parser_app.components.module.models.Module.save')
+    @patch('core_parser_app.components.module.models.Module.get_all')
+    def test_upsert_does_not_keep_registry_loaded_during_write(self, mock_get_all, mock_save):
+        # Arrange
+        mock_get_all.return_value = []
+        module = _create_module()
+
+        def save():
+            # lookup by another request while the module is written
+            self.assertFalse(module_api.is_registered_url("/module"))
+            mock_get_all.return_value = [module]
+            return module
+
+        mock_save.side_effect = save
+
+        # Act
+        module_api.upsert(module)
+
+        # Assert
+        self.assertTrue(module_api.is_registered_url("/module"))
+
+    @patch('core_parser_app.components.module.api.PARSER_MODULE_REGISTRY_CACHE', 'default')
+    @patch('core_parser_app.components.module.models.Module.get_all')
+    def test_registry_is_reloaded_on_refresh_when_modules_are_modified_by_another_process(self, mock_get_all):
+        # Arrange
+        mock_get_all.return_value = [_create_module()]
+        module_api.refresh_module_registry()
+        self.assertTrue(module_api.is_registered_url("/module"))
+        mock_get_all.return_value = []
+
+        # Act: generation changed in the shared cache by another process
+        caches['default'].set(module_api.GENERATION_CACHE_KEY, 'other process', None)
+
+        # Assert: lookups do not read the shared cache, the next parse does
+        self.assertTrue(module_api.is_registered_url("/module"))
+        module_api.refresh_module_registry()
+        self.assertFalse(module_api.is_registered_url("/module"))
+        self.assertEqual(mock_get_all.call_count, 2)
+
+
 def _create_module():
     """Returns a module
 
@@ -10,6 +10,7 @@ from mock.mock import Mock, patch
 
 from core_parser_app.components.data_structure_element.models import DataStructureElement
 from core_parser_app.tools.modules.exceptions import ModuleError
+from core_parser_app.tools.modules.views import module as module_views
 from core_parser_app.tools.modules.views.module import AbstractModule
 
 
@@ -84,6 +85,27 @@ class TestGet(TestCase):
 
         self.assertTrue(data_structure_element.options['data'] == "module result")
 
+    @patch('core_parser_app.components.data_structure_element.models.DataStructureElement.set_options')
+    @patch('core_parser_app.tools.modules.views.module.AbstractModule.render_template')
+    @patch('core_parser_app.components.data_structure_element.models.DataStructureElement.get_by_id')
+    def test_get_fetches_module_element_once_and_skips_unmodified_data(self, data_structure_element_get_by_id,
+                                                                       render_template, set_options):
+        request = HttpRequest()
+        request.GET = {
+            'module_id': str(ObjectId()),
+        }
+        module_object = ModuleImplementation()
+
+        data_structure_element = _create_mock_data_structure_element()
+        data_structure_element.options = {'url': '/url', 'data': "module result"}
+        data_structure_element_get_by_id.return_value = data_structure_element
+        render_template.return_value = ""
+
+        module_object.get(request)
+
+        self.assertEquals(data_structure_element_get_by_id.call_count, 1)
+        self.assertFalse(set_options.called)
+
     @patch('core_parser_app.components.data_structure_element.models.DataStructureElement.get_by_id')
     def test_get_http_response_raises_error_when_module_returns_None(self, data_structure_element_get_by_id):
         request = HttpRequest()
@@ -148,6 +170,39 @@ class TestPost(TestCase):
         self.assertTrue(data_structure_element.options['data'] == "module result")
 
 
+class TestGetViewFunctionFromViewPath(TestCase):
+
+    def setUp(self):
+        self.view_path = 'tests.tools.modules.tests.tests_unit_module.ModuleImplementation'
+        module_views._module_view_functions.clear()
+
+    def tearDown(self):
+        module_views._module_view_functions.clear()
+
+    def test_get_view_function_from_view_path_returns_view_function(self):
+        view_function = AbstractModule.get_view_function_from_view_path(self.view_path)
+
+        self.assertEqual(view_function.view_class, ModuleImplementation)
+
+    @patch('importlib.import_module')
+    def test_get_view_function_from_view_path_resolves_view_once(self, mock_import_module):
+        mock_import_module.return_value = Mock(ModuleImplementation=ModuleImplementation)
+
+        view_function = AbstractModule.get_view_function_from_view_path(self.view_path)
+        for _ in range(10):
+            self.assertIs(AbstractModule.get_view_function_from_view_path(self.view_path), view_function)
+
+        self.assertEqual(mock_import_module.call_count, 1)
+
+    @patch('core_parser_app.components.module.api.get_all')
+    def test_init_module_views_resolves_modules_views(self, mock_get_all):
+        mock_get_all.return_value = [Mock(view=self.view_path), Mock(view='tests.absent.View')]
+
+        AbstractModule.init_module_views()
+
+        self.assertEqual(module_views._module_view_functions.keys(), [self.view_path])
+
+
 def _create_mock_data_structure_element():
     """
     Returns a mock data structure element
@@ -158,6 +213,7 @@ def _create_mock_data_structure_element():
     mock_element.value = "value"
     mock_element.options = {}
     mock_element.children = []
+    mock_element.version = 0
     return mock_element
 
 
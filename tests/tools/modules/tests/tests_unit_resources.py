@@ -0,0 +1,108 @@
+"""Resources bundles unit testing
+"""
+import json
+import os
+import tempfile
+from unittest.case import TestCase
+
+from django.http import HttpResponse
+from django.test import RequestFactory
+from mock import patch
+
+from core_parser_app.tools.modules import resources
+from core_parser_app.tools.modules.resources import ResourcesBundleCache
+from core_parser_app.tools.modules.views import views as modules_views
+
+
+class TestResourcesBundleCache(TestCase):
+
+    def setUp(self):
+        script_file, self.script_path = tempfile.mkstemp(suffix='.js')
+        os.write(script_file, 'var module = 1;')
+        os.close(script_file)
+        self.addCleanup(os.remove, self.script_path)
+
+        find = patch.object(resources.finders, 'find', return_value=self.script_path)
+        find.start()
+        self.addCleanup(find.stop)
+
+        get_module_view = patch.object(resources.AbstractModule, 'get_module_view', return_value=_module_view)
+        self.mock_get_module_view = get_module_view.start()
+        self.addCleanup(get_module_view.stop)
+
+    def _get(self, cache, urls_to_load=None, urls_loaded=None):
+        return cache.get(urls_to_load or ['/module'], urls_loaded or [], RequestFactory().get('/'))
+
+    def test_get_returns_scripts_and_styles_of_modules(self):
+        # Act
+        bundle = self._get(ResourcesBundleCache())
+        # Assert
+        self.assertEquals(json.loads(bundle.content), {
+            'scripts': '<script class="module">var module = 1;</script>',
+            'styles': '<link class="module" rel="stylesheet" type="text/css" href="https://cdn/style.css"></link>'
+        })
+
+    def test_get_builds_bundle_once(self):
+        # Arrange
+        cache = ResourcesBundleCache()
+        # Act
+        first_bundle = self._get(cache, ['/module', '/other'], ['/loaded', '/module'])
+        second_bundle = self._get(cache, ['/module', '/other'], ['/module', '/loaded'])
+        # Assert
+        self.assertIs(first_bundle, second_bundle)
+        self.assertEquals(self.mock_get_module_view.call_count, 4)
+
+    def test_get_rebuilds_bundle_when_static_file_is_modified(self):
+        # Arrange
+        cache = ResourcesBundleCache()
+        bundle = self._get(cache)
+        with open(self.script_path, 'w') as script_file:
+            script_file.write('var module = 2;')
+        os.utime(self.script_path, (0, 0))
+        # Act
+        new_bundle = self._get(cache)
+        # Assert
+        self.assertIn('var module = 2;', new_bundle.content)
+        self.assertNotEquals(new_bundle.etag, bundle.etag)
+
+    def test_clear_removes_bundles(self):
+        # Arrange
+        cache = ResourcesBundleCache()
+        bundle = self._get(cache)
+        # Act
+        cache.clear()
+        # Assert
+        self.assertEquals(len(cache), 0)
+        self.assertIsNot(self._get(cache), bundle)
+
+    def test_least_recently_used_bundle_is_removed_when_cache_is_full(self):
+        # Arrange
+        cache = ResourcesBundleCache(max_size=2)
+        first_bundle = self._get(cache, ['/first'])
+        self._get(cache, ['/second'])
+        self._get(cache, ['/first'])
+        # Act
+        self._get(cache, ['/third'])
+        # Assert
+        self.assertEquals(len(cache), 2)
+        self.assertIs(self._get(cache, ['/first']), first_bundle)
+
+    def test_load_resources_view_returns_not_modified_for_same_etag(self):
+        # Arrange
+        with patch.object(modules_views, 'get_resources_bundle_cache', return_value=ResourcesBundleCache()):
+            response = modules_views.load_resources_view(self._get_resources_request())
+            # Act
+            not_modified_response = modules_views.load_resources_view(
+                self._get_resources_request(HTTP_IF_NONE_MATCH=response['ETag']))
+        # Assert
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(not_modified_response.status_code, 304)
+
+    def _get_resources_request(self, **extra):
+        return RequestFactory().get('/resources', {'urlsToLoad': '["/module"]', 'urlsLoaded': '[]'}, **extra)
+
+
+def _module_view(request):
+    """ View of a module, returning its resources
+    """
+    return HttpResponse(json.dumps({'scripts': ['module.js'], 'styles': ['https://cdn/style.css']}))
@@ -1,7 +1,14 @@
 """Sanitize unit testing
 """
-
+import json
+import random
+import sys
 from unittest.case import TestCase
+
+from django.utils.html import escape
+from lxml import etree
+from lxml.etree import XMLSyntaxError
+
 from core_parser_app.tools.modules.sanitize import sanitize
 
 
@@ -42,3 +49,152 @@ class TestSanitize(TestCase):
         xml_dict = {xml: xml}
         expected_dict = {expected: expected}
         self.assertEquals(expected_dict, sanitize(xml_dict))
+
+
+class TestSanitizeProperties(TestCase):
+    """ Same output as the reference implementation (previous version of sanitize) for random inputs
+    """
+
+    def setUp(self):
+        self.random = random.Random(42)
+
+    def _assert_same_as_reference(self, input_value):
+        try:
+            expected = _reference_sanitize(input_value)
+        except Exception, e:
+            with self.assertRaises(type(e)):
+                sanitize(input_value)
+            return
+
+        result = sanitize(input_value)
+        self.assertEquals(result, expected, 'different output for {0}'.format(repr(input_value)))
+        self.assertEquals(type(result), type(expected))
+
+    def _random_string(self):
+        length = self.random.randint(0, 12)
+        string = ''.join(self.random.choice(CHARACTERS) for _ in range(length))
+        return unicode(string, 'utf-8', 'replace') if self.random.random() < 0.3 else string
+
+    def _random_text(self):
+        string = self._random_string()
+        return string if type(string) == unicode else unicode(string, 'utf-8', 'replace')
+
+    def _random_value(self, depth=0):
+        choice = self.random.randint(0, 9 if depth < 4 else 5)
+        if choice <= 1:
+            return self._random_string()
+        elif choice == 2:
+            return self.random.choice(SNIPPETS)
+        elif choice == 3:
+            return self.random.choice([0, -3, 12, 1.5, True, None, 10 ** 20])
+        elif choice == 4:
+            return json.dumps(self._random_json(depth + 1))
+        elif choice == 5:
+            return self.random.choice(SNIPPETS) + self.random.choice(CHARACTERS)
+        elif choice <= 7:
+            return [self._random_value(depth + 1) for _ in range(self.random.randint(0, 4))]
+        else:
+            return {self._random_key(): self._random_value(depth + 1) for _ in range(self.random.randint(0, 4))}
+
+    def _random_key(self):
+        return self.random.choice([self._random_string(), self.random.choice(SNIPPETS), 1, 2.5, None])
+
+    def _random_json(self, depth):
+        choice = self.random.randint(0, 4 if depth < 4 else 2)
+        if choice == 0:
+            return self._random_text()
+        elif choice == 1:
+            return self.random.choice([0, 1.5, True, None, self.random.choice(JSON_SNIPPETS)])
+        elif choice == 2:
+            return self.random.choice(JSON_SNIPPETS)
+        elif choice == 3:
+            return [self._random_json(depth + 1) for _ in range(self.random.randint(0, 3))]
+        else:
+            return {self._random_text(): self._random_json(depth + 1) for _ in range(self.random.randint(0, 3))}
+
+    def test_sanitize_random_strings_returns_same_output_as_reference(self):
+        for _ in range(3000):
+            self._assert_same_as_reference(self._random_string())
+
+    def test_sanitize_snippets_returns_same_output_as_reference(self):
+        for snippet in SNIPPETS:
+            self._assert_same_as_reference(snippet)
+            self._assert_same_as_reference(unicode(snippet, 'utf-8', 'replace'))
+
+    def test_sanitize_random_structures_returns_same_output_as_reference(self):
+        for _ in range(1000):
+            self._assert_same_as_reference(self._random_value())
+
+    def test_sanitize_deep_structure_does_not_reach_recursion_limit(self):
+        # Arrange
+        deep_value = ['<a>']
+        for _ in range(sys.getrecursionlimit() * 2):
+            deep_value = [deep_value, {'key': 'value'}]
+        # Act
+        result = sanitize(deep_value)
+        # Assert
+        for _ in range(sys.getrecursionlimit() * 2):
+            self.assertEquals(result[1], {'key': 'value'})
+            result = result[0]
+        self.assertEquals(result, ['&lt;a&gt;'])
+
+
+CHARACTERS = ['<', '>', '/', 'a', 'b', '=', '"', "'", '{', '}', '[', ']', ':', ',', '1', '-', '.', 'e', ' ', '\n',
+              '\t', '\x0c', '&', ';', 'true', 'null', 'NaN', '<a>', '</a>', '<?xml version="1.0"?>', '<!-- c -->',
+              '\xef\xbb\xbf', 'L', '\xc3\xa9']
+
+SNIPPETS = ['', ' ', '<', '<a/>', '  <a>  <b> x </b>  </a>', '<a><b/></a>\n', '<a>', '<a></b>', '<?xml version="1.0"?><a/>',
+            '<?xml version="1.0" encoding="UTF-8"?><a>t</a>', '<!-- comment --><a/>', '\xef\xbb\xbf<a/>',
+            '<a xmlns="urn:x" b="&amp;"/>', '{"a": "<b/>"}', '[1, 2, "<c/>"]', ' {"a": [1, {"b": null}]}', '"<a/>"',
+            'true', 'null', 'NaN', '-Infinity', '1e5', '12', '-', '{', '[1,', '"a', '&amp;', 'R&D', "it's",
+            '<a>&lt;b&gt;</a>', '\t\n{"k": "v"}\n', '\x0c{"k": 1}', '{"<a/>": "x"}', '"\\"nested\\""',
+            '"{\\"a\\": 1}"', '\xc3\xa9<a/>', '<\xc3\xa9/>', '\xff\xfe<\x00a\x00/\x00>\x00', '\x00<\x00a\x00/\x00>']
+
+# snippets which can be serialized in JSON
+JSON_SNIPPETS = [unicode(snippet, 'utf-8', 'replace') for snippet in SNIPPETS]
+
+
+def _reference_sanitize(input_value):
+    """ Previous implementation of sanitize
+    """
+    # get the type of the input
+    input_type = type(input_value)
+
+    # input is a list
+    if input_type == list:
+        clean_value = []
+        for item in input_value:
+            clean_value.append(_reference_sanitize(item))
+
+        return clean_value
+    # input is a dict
+    elif input_type == dict:
+        return {_reference_sanitize(key): _reference_sanitize(val) for key, val in input_value.items()}
+    # input is a string of characters
+    elif input_type == str or input_type == unicode:
+        try:
+            # XML cleaning
+            xml_cleaner_parser = etree.XMLParser(remove_blank_text=True)
+            xml_data = etree.fromstring(input_value, parser=xml_cleaner_parser)
+
+            input_value = etree.tostring(xml_data)
+        except XMLSyntaxError:
+            # input is not XML, pass
+            pass
+        finally:
+            try:
+                json_value = json.loads(input_value)
+                sanitized_value = _reference_sanitize(json_value)
+
+                clean_value = json.dumps(sanitized_value)
+            except ValueError:
+                clean_value = escape(input_value)
+
+        return clean_value
+    # input is a number
+    elif input_type == int or input_type == float:
+        return input_value
+    # default, escape characters
+    else:
+        # Default sanitizing
+        return escape(str(input_value))
@@ -0,0 +1,67 @@
+"""XPath accessor unit testing
+"""
+from unittest.case import TestCase
+
+from bson.objectid import ObjectId
+from mock.mock import Mock, patch
+
+from core_parser_app.components.data_structure_element.models import DataStructureElement
+from core_parser_app.tools.modules.xpathaccessor import XPathAccessor
+
+
+class TestGetElement(TestCase):
+
+    def setUp(self):
+        # root -> element (/root[1]/a[1]) -> sequence (/root[1]/a[1])
+        root_id = ObjectId()
+        self.sequence = DataStructureElement('sequence', options={'xpath': {'xml': '/root[1]/a[1]'}},
+                                             id=ObjectId(), root=root_id)
+        self.element = DataStructureElement('element', options={'xpath': {'xml': '/root[1]/a[1]'}},
+                                            children=[self.sequence], id=ObjectId(), root=root_id)
+        self.root = DataStructureElement('element', options={'xpath': {'xml': '/root[1]'}},
+                                         children=[self.element], id=root_id, root=root_id)
+
+        self.xpath_accessor = XPathAccessorImplementation(Mock())
+
+    @patch('core_parser_app.components.data_structure_element.api.get_subtree')
+    @patch('core_parser_app.components.data_structure_element.api.get_all_by_xpath')
+    @patch('core_parser_app.components.data_structure_element.api.get_by_id')
+    def test_get_element_returns_single_element_with_xpath(self, mock_get_by_id, mock_get_all_by_xpath,
+                                                          mock_get_subtree):
+        mock_get_by_id.return_value = self.root
+        mock_get_all_by_xpath.return_value = [self.sequence]
+
+        result = self.xpath_accessor._get_element(self.root.id, '/root[1]/a[1]')
+
+        self.assertEqual(result, self.sequence)
+        self.assertFalse(mock_get_subtree.called)
+
+    @patch('core_parser_app.components.data_structure_element.api.get_all_by_xpath')
+    @patch('core_parser_app.components.data_structure_element.api.get_by_id')
+    def test_get_element_returns_first_element_in_document_order(self, mock_get_by_id, mock_get_all_by_xpath):
+        mock_get_by_id.return_value = self.root
+        mock_get_all_by_xpath.return_value = [self.sequence, self.element]
+
+        result = self.xpath_accessor._get_element(self.root.id, '/root[1]/a[1]')
+
+        self.assertEqual(result, self.element)
+
+    @patch('core_parser_app.components.data_structure_element.api.get_all_by_xpath')
+    @patch('core_parser_app.components.data_structure_element.api.get_by_id')
+    def test_get_element_returns_none_if_xpath_not_found(self, mock_get_by_id, mock_get_all_by_xpath):
+        mock_get_by_id.return_value = self.root
+        mock_get_all_by_xpath.return_value = []
+
+        result = self.xpath_accessor._get_element(self.root.id, '/root[1]/b[1]')
+
+        self.assertIsNone(result)
+
+
+class XPathAccessorImplementation(XPathAccessor):
+
+    def __init__(self, request):
+        self.xpath = None
+        self.values = {}
+
+    def set_XpathAccessor(self, request):
+        pass
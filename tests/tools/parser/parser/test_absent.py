@@ -0,0 +1,228 @@
+""" Tests for the parser - generation of the elements absent from the tree
+"""
+from os.path import join, dirname
+
+import mongomock
+from django.test import override_settings
+from mock import patch
+
+from core_main_app.commons import exceptions
+from core_main_app.utils.integration_tests.fixture_interface import FixtureInterface
+from core_main_app.utils.integration_tests.integration_base_test_case import MongoIntegrationBaseTestCase
+from core_parser_app.components.data_structure_element import api as data_structure_element_api
+from core_parser_app.components.data_structure_element.models import DataStructureElement
+from core_parser_app.tools import parser
+from core_parser_app.tools.parser.parser import XSDParser
+
+RENDERER_TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [join(dirname(parser.__file__), 'templates')],
+    },
+]
+
+XSD_STRING = """<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">
+    <xs:element name="root">
+        <xs:complexType>
+            <xs:sequence>
+                <xs:element name="item" maxOccurs="3">
+                    <xs:complexType>
+                        <xs:sequence>
+                            <xs:element name="value" type="xs:integer"/>
+                            <xs:element name="comment" type="xs:string"/>
+                        </xs:sequence>
+                    </xs:complexType>
+                </xs:element>
+                <xs:element name="note" type="xs:string" minOccurs="0"/>
+                <xs:choice>
+                    <xs:element name="first" type="xs:string"/>
+                    <xs:element name="second" type="xs:string"/>
+                </xs:choice>
+            </xs:sequence>
+        </xs:complexType>
+    </xs:element>
+</xs:schema>"""
+
+
+class FormFixture(FixtureInterface):
+    """ Represents a form generated by the parser
+    """
+    root_id = None
+
+    def insert_data(self):
+        """ Insert the form in database
+
+        Returns:
+
+        """
+        self.root_id = XSDParser().generate_form(XSD_STRING)
+
+
+def _get_tree_ids(element):
+    """ Return the ids of the element and of its descendants
+
+    Args:
+        element:
+
+    Returns:
+
+    """
+    ids = []
+    elements = [data_structure_element_api.get_subtree(element)]
+    while len(elements) > 0:
+        current_element = elements.pop()
+        ids.append(current_element.id)
+        elements.extend(current_element.children)
+
+    return ids
+
+
+class TestGenerateAbsent(MongoIntegrationBaseTestCase):
+    fixture = FormFixture()
+
+    def setUp(self):
+        super(TestGenerateAbsent, self).setUp()
+        templates_settings = override_settings(TEMPLATES=RENDERER_TEMPLATES)
+        templates_settings.enable()
+        self.addCleanup(templates_settings.disable)
+
+        self.root = DataStructureElement.objects.get(pk=self.fixture.root_id)
+
+    def _get_element(self, tag, name):
+        return DataStructureElement.objects.get(root=self.root.id, tag=tag, options__name=name)
+
+    def test_generate_element_absent_saves_only_new_elements_of_tree(self):
+        # Arrange
+        item = self._get_element('element', 'item')
+        nb_elements = DataStructureElement.objects.count()
+
+        # Act
+        html = XSDParser().generate_element_absent(None, str(item.children[0].id), XSD_STRING)
+
+        # Assert
+        item.reload()
+        self.assertEqual(len(item.children), 2)
+        # no element is saved outside of the tree (no temporary root)
+        tree_ids = _get_tree_ids(self.root)
+        self.assertEqual(DataStructureElement.objects.count(), len(tree_ids))
+        self.assertEqual(len(tree_ids) - nb_elements, len(_get_tree_ids(item.children[1])))
+        self.assertIn(str(item.pk), html)
+
+    def test_generate_element_absent_saves_xpaths_of_new_occurrence(self):
+        # Arrange
+        item = self._get_element('element', 'item')
+        iteration_id = item.children[0].id
+
+        # Act
+        XSDParser().generate_element_absent(None, str(iteration_id), XSD_STRING)
+
+        # Assert
+        item.reload()
+        new_iteration = [child for child in item.children if child.id != iteration_id][0]
+        xpaths = [DataStructureElement.objects.get(pk=element_id).options.get('xpath', {}).get('xml')
+                  for element_id in _get_tree_ids(new_iteration)]
+        self.assertIn('/root[1]/item[2]', xpaths)
+        self.assertIn('/root[1]/item[2]/value', xpaths)
+        self.assertNotIn('/root[1]/item[1]/value', xpaths)
+        self.assertEqual(new_iteration.parent, item.id)
+        self.assertEqual(new_iteration.root, self.root.id)
+
+    def test_generate_element_absent_inserts_occurrence_with_positional_push(self):
+        # Arrange
+        item = self._get_element('element', 'item')
+
+        # Act
+        with patch.object(mongomock.Collection, 'update_one', autospec=True,
+                          side_effect=mongomock.Collection.update_one) as mock_update_one:
+            XSDParser().generate_element_absent(None, str(item.children[0].id), XSD_STRING)
+
+        # Assert
+        pushes = [call[0][2]['$push'] for call in mock_update_one.call_args_list if '$push' in call[0][2]]
+        self.assertEqual(len(pushes), 1)
+        self.assertEqual(pushes[0]['children']['$position'], 1)
+
+    def test_generate_element_absent_renumbers_only_next_siblings(self):
+        # Arrange
+        item = self._get_element('element', 'item')
+        first_id = item.children[0].id
+        XSDParser().generate_element_absent(None, str(first_id), XSD_STRING)
+        item.reload()
+        next_sibling_ids = _get_tree_ids(item.children[1])
+
+        # Act
+        with patch.object(DataStructureElement, 'set_xml_xpaths',
+                          side_effect=DataStructureElement.set_xml_xpaths) as mock_set_xml_xpaths:
+            XSDParser().generate_element_absent(None, str(first_id), XSD_STRING)
+
+        # Assert
+        item.reload()
+        self.assertEqual(len(item.children), 3)
+        written_ids = [element_id for call in mock_set_xml_xpaths.call_args_list for element_id, _ in call[0][0]]
+        self.assertItemsEqual(written_ids, [element_id for element_id in next_sibling_ids
+                                            if 'xpath' in DataStructureElement.objects.get(pk=element_id).options])
+        xpaths = [DataStructureElement.objects.get(pk=element_id).options.get('xpath', {}).get('xml')
+                  for element_id in next_sibling_ids]
+        self.assertIn('/root[1]/item[3]', xpaths)
+        self.assertIn('/root[1]/item[3]/value', xpaths)
+        new_iteration = [child for child in item.children if child.id not in (first_id, next_sibling_ids[0])][0]
+        new_xpaths = [DataStructureElement.objects.get(pk=element_id).options.get('xpath', {}).get('xml')
+                      for element_id in _get_tree_ids(new_iteration)]
+        self.assertIn('/root[1]/item[2]/value', new_xpaths)
+
+    def test_generate_element_absent_after_last_sibling_does_not_load_or_renumber_siblings(self):
+        # Arrange
+        item = self._get_element('element', 'item')
+
+        # Act
+        with patch.object(DataStructureElement, 'set_xml_xpaths') as mock_set_xml_xpaths, \
+                patch.object(DataStructureElement, 'get_subtree_by_id') as mock_get_subtree_by_id:
+            XSDParser().generate_element_absent(None, str(item.children[0].id), XSD_STRING)
+
+        # Assert
+        self.assertEqual([call[0][0] for call in mock_set_xml_xpaths.call_args_list if len(call[0][0]) > 0], [])
+        self.assertFalse(mock_get_subtree_by_id.called)
+
+    def test_generate_element_absent_replaces_empty_element_without_detaching_it(self):
+        # Arrange
+        note = self._get_element('element', 'note')
+        empty_iteration_id = note.children[0].id
+
+        # Act
+        with patch.object(DataStructureElement, 'update_parent') as mock_update_parent:
+            XSDParser().generate_element_absent(None, str(empty_iteration_id), XSD_STRING)
+
+        # Assert
+        note.reload()
+        self.assertEqual(len(note.children), 1)
+        self.assertNotEqual(note.children[0].id, empty_iteration_id)
+        self.assertEqual(len(note.children[0].children), 1)
+        self.assertFalse(DataStructureElement.objects(pk=empty_iteration_id).count())
+        self.assertFalse(mock_update_parent.called)
+
+    def test_generate_choice_absent_replaces_choice_in_tree(self):
+        # Arrange
+        second = self._get_element('element', 'second')
+        choice_iter = DataStructureElement.objects.get(pk=second.parent)
+        nb_elements = DataStructureElement.objects.count()
+
+        # Act
+        html = XSDParser().generate_choice_absent(None, str(second.id), XSD_STRING)
+
+        # Assert
+        choice_iter.reload()
+        new_second = choice_iter.children[1]
+        self.assertNotEqual(new_second.id, second.id)
+        self.assertEqual(choice_iter.value, str(new_second.id))
+        self.assertIsNone(DataStructureElement.objects.get(pk=second.id).parent)
+        self.assertEqual(DataStructureElement.objects.count() - nb_elements, len(_get_tree_ids(new_second)))
+        self.assertIn(str(new_second.id), html)
+
+    def test_generate_choice_absent_fails_if_children_have_been_modified(self):
+        # Arrange
+        second = self._get_element('element', 'second')
+        choice_iter = DataStructureElement.objects.get(pk=second.parent)
+        choice_iter.children[1] = choice_iter.children[0]
+
+        # Act # Assert
+        with self.assertRaises(exceptions.ModelError):
+            data_structure_element_api.replace_child(choice_iter, 1, second, str(second.id))
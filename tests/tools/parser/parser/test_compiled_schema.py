@@ -0,0 +1,97 @@
+""" Tests for XSDParser - compiled schemas
+"""
+from unittest.case import TestCase
+
+from lxml import etree
+from mock import patch
+
+from core_parser_app.tools.parser import parser
+from core_parser_app.tools.parser.parser import XSDParser
+from core_parser_app.tools.parser.utils.schema import CompiledSchemaCache, get_compiled_schema
+from xml_utils.commons.constants import SCHEMA_NAMESPACE
+
+SCHEMA = '<xs:schema xmlns:xs="{0}"><xs:element name="root" type="rootType"/>' \
+         '<xs:complexType name="rootType"><xs:sequence>' \
+         '<xs:element name="code" type="codeType" minOccurs="0"/><xs:element name="label" type="xs:string"/>' \
+         '</xs:sequence></xs:complexType>' \
+         '<xs:simpleType name="codeType"><xs:restriction base="xs:string">' \
+         '<xs:enumeration value="a"/><xs:enumeration value="b"/></xs:restriction></xs:simpleType>' \
+         '</xs:schema>'.format(SCHEMA_NAMESPACE)
+SCHEMA_WITH_KEY = '<xs:schema xmlns:xs="{0}"><xs:element name="root"><xs:complexType><xs:sequence>' \
+                  '<xs:element name="item" maxOccurs="unbounded"><xs:complexType>' \
+                  '<xs:attribute name="id" type="xs:string"/><xs:attribute name="ref" type="xs:string"/>' \
+                  '</xs:complexType></xs:element></xs:sequence></xs:complexType>' \
+                  '<xs:key name="itemKey"><xs:selector xpath="item"/><xs:field xpath="@id"/></xs:key>' \
+                  '<xs:keyref name="itemRef" refer="itemKey"><xs:selector xpath="item"/><xs:field xpath="@ref"/>' \
+                  '</xs:keyref>' \
+                  '</xs:element></xs:schema>'.format(SCHEMA_NAMESPACE)
+
+
+def _get_generated_tree(mock_load_schema_data_in_db):
+    """ Return the data structure generated by the last parse
+
+    Args:
+        mock_load_schema_data_in_db:
+
+    Returns:
+
+    """
+    return mock_load_schema_data_in_db.call_args[0][0]
+
+
+class ParserCompiledSchemaTestSuite(TestCase):
+
+    def setUp(self):
+        self.compiled_schema_cache = CompiledSchemaCache()
+        patcher = patch('core_parser_app.tools.parser.utils.schema._compiled_schema_cache',
+                        self.compiled_schema_cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch.object(parser, 'load_schema_data_in_db')
+    def test_generate_form_compiles_schema_once(self, mock_load_schema_data_in_db):
+        # Act
+        XSDParser(auto_key_keyref=False).generate_form(SCHEMA, template_id='template')
+        first_tree = _get_generated_tree(mock_load_schema_data_in_db)
+        XSDParser(auto_key_keyref=False).generate_form(SCHEMA, template_id='template')
+        second_tree = _get_generated_tree(mock_load_schema_data_in_db)
+
+        # Assert
+        self.assertEquals(self.compiled_schema_cache.nb_compilations, 1)
+        self.assertEquals(first_tree, second_tree)
+
+    @patch.object(parser, 'load_schema_data_in_db')
+    def test_generate_form_compiles_schema_again_when_content_changes(self, mock_load_schema_data_in_db):
+        # Act
+        XSDParser(auto_key_keyref=False).generate_form(SCHEMA, template_id='template')
+        XSDParser(auto_key_keyref=False).generate_form(SCHEMA.replace('label', 'name'), template_id='template')
+
+        # Assert
+        self.assertEquals(self.compiled_schema_cache.nb_compilations, 2)
+
+    @patch.object(parser, 'load_schema_data_in_db')
+    def test_generate_form_does_not_modify_compiled_schema(self, mock_load_schema_data_in_db):
+        # Arrange
+        compiled_schema = get_compiled_schema(SCHEMA_WITH_KEY, 'template')
+        schema_content = etree.tostring(compiled_schema.xml_tree)
+
+        # Act
+        XSDParser().generate_form(SCHEMA_WITH_KEY, template_id='template')
+
+        # Assert
+        self.assertEquals(etree.tostring(compiled_schema.xml_tree), schema_content)
+
+    def test_generate_element_uses_forced_occurrences(self):
+        # Arrange
+        compiled_schema = get_compiled_schema(SCHEMA, 'template')
+        element = compiled_schema.get_component('complexType', 'rootType')[0][0]
+        xml_parser = XSDParser(auto_key_keyref=False)
+        xml_parser.forced_occurrences = {element: {'max': -1}}
+
+        # Act
+        db_element = xml_parser.generate_element(element, compiled_schema.xml_tree, full_path='/root')
+
+        # Assert
+        self.assertEquals(db_element['options']['min'], 0)
+        self.assertEquals(db_element['options']['max'], -1)
+        self.assertNotIn('maxOccurs', element.attrib)
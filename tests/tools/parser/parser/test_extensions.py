@@ -0,0 +1,202 @@
+""" Tests for XSDParser - extensions
+"""
+import urllib2
+from unittest.case import TestCase
+
+from mock import Mock, patch
+
+from core_main_app.utils.integration_tests.fixture_interface import FixtureInterface
+from core_main_app.utils.integration_tests.integration_base_test_case import MongoIntegrationBaseTestCase
+from core_parser_app.components.data_structure_element import api as data_structure_element_api
+from core_parser_app.components.data_structure_element.models import DataStructureElement
+from core_parser_app.tools.parser import parser
+from core_parser_app.tools.parser.parser import XSDParser, get_extensions
+from core_parser_app.tools.parser.utils.dependencies import SchemaCache, SchemaResponse
+from core_parser_app.tools.parser.utils.schema import CompiledSchema, CompiledSchemaCache, SchemaContextCache, \
+    get_compiled_dependency
+from xml_utils.commons.constants import SCHEMA_NAMESPACE
+from xml_utils.xsd_tree.xsd_tree import XSDTree
+
+SCHEMA = '<xs:schema xmlns:xs="{0}" xmlns:ex="http://example.org" targetNamespace="http://example.org">' \
+         '<xs:import namespace="http://other.org" schemaLocation="http://other.org/other.xsd"/>' \
+         '<xs:element name="root" type="ex:base"/>' \
+         '<xs:complexType name="base"><xs:sequence><xs:element name="a" type="xs:string"/></xs:sequence>' \
+         '</xs:complexType>' \
+         '<xs:complexType name="derived"><xs:complexContent><xs:extension base="ex:base"/></xs:complexContent>' \
+         '</xs:complexType>' \
+         '</xs:schema>'.format(SCHEMA_NAMESPACE)
+IMPORTED_SCHEMA = '<xs:schema xmlns:xs="{0}" xmlns:ex="http://example.org" xmlns:other="http://other.org" ' \
+                  'targetNamespace="http://other.org">' \
+                  '<xs:complexType name="base"/>' \
+                  '<xs:complexType name="importedDerived"><xs:complexContent><xs:extension base="ex:base">' \
+                  '<xs:sequence><xs:element name="b" type="xs:string" maxOccurs="unbounded"/></xs:sequence>' \
+                  '</xs:extension></xs:complexContent></xs:complexType>' \
+                  '<xs:complexType name="otherDerived"><xs:complexContent><xs:extension base="other:base"/>' \
+                  '</xs:complexContent></xs:complexType>' \
+                  '</xs:schema>'.format(SCHEMA_NAMESPACE)
+IMPORTED_SCHEMA_LOCATION = 'http://other.org/other.xsd'
+
+
+def _find_element(data_structure, name):
+    """ Return the first element with the given name in the data structure
+
+    Args:
+        data_structure:
+        name:
+
+    Returns:
+
+    """
+    nodes = [data_structure]
+    while len(nodes) > 0:
+        node = nodes.pop(0)
+        if node['tag'] == 'element' and node['options']['name'] == name:
+            return node
+        nodes.extend(node['children'])
+
+    return None
+
+
+class ParserExtensionsTestSuite(TestCase):
+
+    def setUp(self):
+        self.imported_schema = CompiledSchema(IMPORTED_SCHEMA, {}, IMPORTED_SCHEMA_LOCATION)
+        patcher = patch('core_parser_app.tools.parser.utils.schema.get_compiled_dependency',
+                        return_value=self.imported_schema)
+        self.mock_get_compiled_dependency = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_extensions_returns_extensions_of_document_and_imported_documents(self):
+        # Act
+        extensions = get_extensions(XSDTree.build_tree(SCHEMA), 'base')
+        # Assert
+        self.assertEquals([extension.attrib['name'] for extension in extensions], ['derived', 'importedDerived'])
+
+    def test_get_extensions_does_not_look_in_imported_documents_if_download_disabled(self):
+        # Act
+        extensions = get_extensions(XSDTree.build_tree(SCHEMA), 'base', download_enabled=False)
+        # Assert
+        self.assertEquals([extension.attrib['name'] for extension in extensions], ['derived'])
+        self.assertFalse(self.mock_get_compiled_dependency.called)
+
+    def test_get_extensions_downloads_imported_document_once_per_parse(self):
+        # Arrange
+        xml_tree = XSDTree.build_tree(SCHEMA)
+        schema_contexts = SchemaContextCache()
+        # Act
+        get_extensions(xml_tree, 'base', schema_contexts=schema_contexts)
+        get_extensions(xml_tree, 'derived', schema_contexts=schema_contexts)
+        # Assert
+        self.assertEquals(self.mock_get_compiled_dependency.call_count, 1)
+
+    def test_get_extensions_ignores_imported_document_not_downloaded(self):
+        # Arrange
+        self.mock_get_compiled_dependency.side_effect = urllib2.URLError('not found')
+        xml_tree = XSDTree.build_tree(SCHEMA)
+        schema_contexts = SchemaContextCache()
+        # Act
+        extensions = get_extensions(xml_tree, 'base', schema_contexts=schema_contexts)
+        get_extensions(xml_tree, 'derived', schema_contexts=schema_contexts)
+        # Assert
+        self.assertEquals([extension.attrib['name'] for extension in extensions], ['derived'])
+        self.assertEquals(self.mock_get_compiled_dependency.call_count, 1)
+
+    @patch('core_parser_app.tools.parser.utils.schema._compiled_schema_cache', CompiledSchemaCache())
+    def test_get_extensions_downloads_imported_document_once_per_process(self):
+        # Arrange
+        self.mock_get_compiled_dependency.side_effect = get_compiled_dependency
+        backend = Mock()
+        backend.fetch.return_value = SchemaResponse(IMPORTED_SCHEMA)
+        schema_cache = SchemaCache(backend)
+        xml_tree = XSDTree.build_tree(SCHEMA)
+        # Act
+        with patch('core_parser_app.tools.parser.utils.schema.get_schema_cache', return_value=schema_cache):
+            for _ in range(3):
+                extensions = get_extensions(xml_tree, 'base', schema_contexts=SchemaContextCache())
+        # Assert
+        self.assertEquals([extension.attrib['name'] for extension in extensions], ['derived', 'importedDerived'])
+        backend.fetch.assert_called_once_with(IMPORTED_SCHEMA_LOCATION)
+
+    @patch.object(parser, 'load_schema_data_in_db')
+    def test_generate_form_renders_extensions_of_imported_documents(self, mock_load_schema_data_in_db):
+        # Act
+        XSDParser(auto_key_keyref=False, implicit_extension_base=True).generate_form(SCHEMA)
+        data_structure = mock_load_schema_data_in_db.call_args[0][0]
+
+        # Assert
+        choice = data_structure['children'][0]['children'][0]['children'][0]
+        self.assertEquals(choice['tag'], 'choice')
+        self.assertEquals([extension['options']['name'] for extension in choice['children'][0]['children']],
+                          ['base', 'derived', 'importedDerived'])
+
+    @patch.object(parser, 'load_schema_data_in_db')
+    def test_generate_form_stores_location_of_imported_extensions(self, mock_load_schema_data_in_db):
+        # Act
+        XSDParser(auto_key_keyref=False, implicit_extension_base=True).generate_form(SCHEMA)
+        data_structure = mock_load_schema_data_in_db.call_args[0][0]
+
+        # Assert
+        imported_extension = data_structure['children'][0]['children'][0]['children'][0]['children'][0]['children'][2]
+        element = _find_element(imported_extension, 'b')
+        self.assertEquals(element['options']['schema_location'], IMPORTED_SCHEMA_LOCATION)
+        self.assertEquals(self.imported_schema.get_element_by_xpath(element['options']['xpath']['xsd']).attrib['name'],
+                          'b')
+
+    @patch.object(parser, 'load_schema_data_in_db')
+    def test_generate_form_renders_base_of_imported_extensions_from_main_schema(self, mock_load_schema_data_in_db):
+        # Act
+        XSDParser(auto_key_keyref=False, implicit_extension_base=True).generate_form(SCHEMA)
+        data_structure = mock_load_schema_data_in_db.call_args[0][0]
+
+        # Assert
+        imported_extension = data_structure['children'][0]['children'][0]['children'][0]['children'][0]['children'][2]
+        element = _find_element(imported_extension, 'a')
+        self.assertIsNotNone(element)
+        self.assertIsNone(element['options']['schema_location'])
+        self.assertEquals(element['options']['xpath']['xsd'], '/xs:schema/xs:complexType[1]/xs:sequence/xs:element')
+
+
+class ImportedExtensionFormFixture(FixtureInterface):
+    """ Represents a form with an extension from an imported schema
+    """
+    root_id = None
+
+    def insert_data(self):
+        """ Insert the form in database
+
+        Returns:
+
+        """
+        with patch('core_parser_app.tools.parser.utils.schema.get_compiled_dependency',
+                   return_value=CompiledSchema(IMPORTED_SCHEMA, {}, IMPORTED_SCHEMA_LOCATION)):
+            self.root_id = XSDParser(auto_key_keyref=False, implicit_extension_base=True).generate_form(SCHEMA)
+
+
+class TestGenerateElementAbsentInImportedExtension(MongoIntegrationBaseTestCase):
+    fixture = ImportedExtensionFormFixture()
+
+    def setUp(self):
+        super(TestGenerateElementAbsentInImportedExtension, self).setUp()
+        imported_schema = CompiledSchema(IMPORTED_SCHEMA, {}, IMPORTED_SCHEMA_LOCATION)
+        for target in ['core_parser_app.tools.parser.utils.schema.get_compiled_dependency',
+                       'core_parser_app.tools.parser.parser.get_compiled_dependency']:
+            patcher = patch(target, return_value=imported_schema)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @patch('core_parser_app.tools.parser.parser.ListRenderer')
+    def test_generate_element_absent_adds_element_of_imported_extension(self, mock_renderer):
+        # Arrange
+        element = DataStructureElement.objects.get(root=self.fixture.root_id, tag='element', options__name='b')
+        nb_iterations = len(element.children)
+
+        # Act
+        XSDParser(auto_key_keyref=False).generate_element_absent(None, str(element.children[0].id), SCHEMA,
+                                                                 renderer_class=mock_renderer)
+
+        # Assert
+        element.reload()
+        self.assertEquals(len(element.children), nb_iterations + 1)
+        new_iteration = data_structure_element_api.get_subtree(element.children[-1])
+        self.assertEquals(new_iteration.tag, 'elem-iter')
+        self.assertEquals(new_iteration.children[0].tag, 'input')
@@ -0,0 +1,106 @@
+""" Tests for XSDParser - loading of the generated form in database
+"""
+from unittest.case import TestCase
+
+from bson.objectid import ObjectId
+from mock import patch
+
+from core_parser_app.components.data_structure_element.models import DataStructureElement
+
+from core_parser_app.tools.parser.parser import load_schema_data_in_db
+
+
+def _get_form_data():
+    """ Return a form data structure with a choice
+
+    Returns:
+
+    """
+    return {
+        'tag': 'element',
+        'value': None,
+        'options': {'name': 'root'},
+        'children': [
+            {
+                'tag': 'elem-iter',
+                'value': None,
+                'children': [
+                    {
+                        'tag': 'choice',
+                        'value': None,
+                        'options': {},
+                        'children': [
+                            {
+                                'tag': 'choice-iter',
+                                'value': 1,
+                                'children': [
+                                    {'tag': 'input', 'value': ' first ', 'options': {}},
+                                    {'tag': 'input', 'value': 2, 'options': {}},
+                                ]
+                            }
+                        ]
+                    }
+                ]
+            }
+        ]
+    }
+
+
+class ParserLoadSchemaDataTestSuite(TestCase):
+
+    @patch('core_parser_app.components.data_structure_element.api.insert_many')
+    def test_load_schema_data_in_db_inserts_all_elements_in_one_call(self, mock_insert_many):
+        # Act
+        load_schema_data_in_db(_get_form_data())
+        # Assert
+        self.assertEqual(mock_insert_many.call_count, 1)
+        self.assertEqual(len(mock_insert_many.call_args[0][0]), 6)
+
+    @patch('core_parser_app.components.data_structure_element.api.insert_many')
+    def test_load_schema_data_in_db_returns_root_element(self, mock_insert_many):
+        # Act
+        root_element = load_schema_data_in_db(_get_form_data())
+        # Assert
+        self.assertEqual(root_element.tag, 'element')
+        self.assertIsNotNone(root_element.pk)
+        self.assertEqual(root_element.children[0].tag, 'elem-iter')
+
+    @patch('core_parser_app.components.data_structure_element.api.insert_many')
+    def test_load_schema_data_in_db_sets_choice_iter_value_to_selected_child_id(self, mock_insert_many):
+        # Act
+        root_element = load_schema_data_in_db(_get_form_data())
+        # Assert
+        choice_iter = root_element.children[0].children[0].children[0]
+        self.assertEqual(choice_iter.value, str(choice_iter.children[1].pk))
+
+    @patch('core_parser_app.components.data_structure_element.api.insert_many')
+    def test_load_schema_data_in_db_strips_values(self, mock_insert_many):
+        # Act
+        root_element = load_schema_data_in_db(_get_form_data())
+        # Assert
+        inputs = root_element.children[0].children[0].children[0].children
+        self.assertEqual(inputs[0].value, 'first')
+        self.assertEqual(inputs[1].value, '2')
+
+    @patch('core_parser_app.components.data_structure_element.api.insert_many')
+    def test_load_schema_data_in_db_sets_parent_and_root(self, mock_insert_many):
+        # Act
+        root_element = load_schema_data_in_db(_get_form_data())
+        # Assert
+        self.assertIsNone(root_element.parent)
+        self.assertEqual(root_element.root, root_element.pk)
+        elem_iter = root_element.children[0]
+        self.assertEqual(elem_iter.parent, root_element.pk)
+        self.assertEqual(elem_iter.children[0].children[0].children[0].root, root_element.pk)
+
+    @patch('core_parser_app.components.data_structure_element.api.insert_many')
+    def test_load_schema_data_in_db_attaches_tree_to_parent(self, mock_insert_many):
+        # Arrange
+        root_id = ObjectId()
+        parent = DataStructureElement('element', id=ObjectId(), parent=root_id, root=root_id)
+        # Act
+        root_element = load_schema_data_in_db(_get_form_data(), parent)
+        # Assert
+        self.assertEqual(root_element.parent, parent.pk)
+        self.assertEqual(root_element.root, root_id)
+        self.assertEqual(root_element.children[0].root, root_id)
@@ -0,0 +1,87 @@
+""" Tests for XSDParser - modules
+"""
+from unittest.case import TestCase
+
+from bson.objectid import ObjectId
+from django.core.cache import caches
+from mock import patch
+
+from core_parser_app.components.module import api as module_api
+from core_parser_app.components.module.models import Module
+from core_parser_app.tools.parser.parser import XSDParser
+from xml_utils.commons.constants import SCHEMA_NAMESPACE
+
+
+def _get_schema_with_modules(nb_elements):
+    """ Return a schema with nb_elements elements using the same module
+
+    Args:
+        nb_elements:
+
+    Returns:
+
+    """
+    elements = ''.join(['<xs:element name="field{0}" type="xs:string"><xs:annotation><xs:appinfo>'
+                        '<module>/module/text</module></xs:appinfo></xs:annotation></xs:element>'.format(index)
+                        for index in range(nb_elements)])
+
+    return '<xs:schema xmlns:xs="{0}"><xs:element name="root"><xs:complexType><xs:sequence>{1}</xs:sequence>' \
+           '</xs:complexType></xs:element></xs:schema>'.format(SCHEMA_NAMESPACE, elements)
+
+
+class ParserGenerateModuleTestSuite(TestCase):
+
+    def setUp(self):
+        module_api._clear_module_registry()
+
+    def tearDown(self):
+        module_api._clear_module_registry()
+
+    @patch('core_parser_app.components.module.models.Module.get_by_url')
+    @patch('core_parser_app.components.module.models.Module.get_all_urls')
+    @patch('core_parser_app.components.module.models.Module.get_all')
+    @patch('core_parser_app.components.data_structure_element.api.insert_many')
+    def test_generate_form_loads_modules_once(self, mock_insert_many, mock_get_all, mock_get_all_urls,
+                                              mock_get_by_url):
+        # Arrange
+        mock_get_all.return_value = [Module(id=ObjectId(), name='text', url='/module/text', view='Module.view')]
+
+        # Act
+        XSDParser(auto_key_keyref=False).generate_form(_get_schema_with_modules(500))
+
+        # Assert
+        self.assertEqual(mock_get_all.call_count, 1)
+        self.assertFalse(mock_get_all_urls.called)
+        self.assertFalse(mock_get_by_url.called)
+        module_elements = [element for element in mock_insert_many.call_args[0][0] if element.tag == 'module']
+        self.assertEqual(len(module_elements), 500)
+
+    @patch('core_parser_app.components.module.api.PARSER_MODULE_REGISTRY_CACHE', 'default')
+    @patch('core_parser_app.components.module.models.Module.get_all')
+    @patch('core_parser_app.components.data_structure_element.api.insert_many')
+    def test_generate_form_reads_shared_generation_once(self, mock_insert_many, mock_get_all):
+        # Arrange
+        mock_get_all.return_value = [Module(id=ObjectId(), name='text', url='/module/text', view='Module.view')]
+        shared_cache = caches['default']
+
+        # Act
+        with patch.object(shared_cache, 'get', wraps=shared_cache.get) as mock_cache_get:
+            XSDParser(auto_key_keyref=False).generate_form(_get_schema_with_modules(100))
+
+        # Assert
+        self.assertLessEqual(mock_cache_get.call_count, 2)
+        self.assertEqual(mock_get_all.call_count, 1)
+
+    @patch('core_parser_app.components.module.models.Module.get_all')
+    @patch('core_parser_app.components.data_structure_element.api.insert_many')
+    def test_generate_form_does_not_read_shared_cache_by_default(self, mock_insert_many, mock_get_all):
+        # Arrange
+        mock_get_all.return_value = [Module(id=ObjectId(), name='text', url='/module/text', view='Module.view')]
+        shared_cache = caches['default']
+
+        # Act
+        with patch.object(shared_cache, 'get', wraps=shared_cache.get) as mock_cache_get:
+            XSDParser(auto_key_keyref=False).generate_form(_get_schema_with_modules(100))
+
+        # Assert
+        self.assertFalse(mock_cache_get.called)
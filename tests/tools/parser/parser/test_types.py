@@ -0,0 +1,106 @@
+""" Tests for XSDParser - resolution of the types and refs
+"""
+from unittest.case import TestCase
+
+from mock import patch
+
+from core_parser_app.tools.parser import parser
+from core_parser_app.tools.parser.parser import XSDParser, get_element_type
+from xml_utils.commons.constants import LXML_SCHEMA_NAMESPACE, SCHEMA_NAMESPACE
+from xml_utils.xsd_tree.xsd_tree import XSDTree
+
+SCHEMA = '<xs:schema xmlns:xs="{0}" xmlns:ex="http://example.org" targetNamespace="http://example.org">' \
+         '<xs:element name="root"><xs:complexType><xs:sequence>' \
+         '<xs:element name="first" type="ex:shared"/><xs:element name="second" type="ex:shared"/>' \
+         '<xs:element name="third" type="ex:shared"/>' \
+         '<xs:element ref="ex:item"/><xs:element ref="ex:item"/>' \
+         '<xs:element name="label" type="xs:string"/>' \
+         '</xs:sequence></xs:complexType></xs:element>' \
+         '<xs:element name="item" type="xs:string"/>' \
+         '<xs:complexType name="shared"><xs:sequence><xs:element name="value" type="xs:string"/></xs:sequence>' \
+         '</xs:complexType>' \
+         '</xs:schema>'.format(SCHEMA_NAMESPACE)
+
+SCHEMA_WITH_PREFIXES = '<xs:schema xmlns:xs="{0}" xmlns:ex="http://example.org" xmlns:same="http://example.org" ' \
+                       'xmlns:unknown="http://unknown.org" targetNamespace="http://example.org">' \
+                       '<xs:element name="local" type="same:shared"/>' \
+                       '<xs:element name="foreign" type="unknown:shared"/>' \
+                       '<xs:complexType name="shared"/>' \
+                       '</xs:schema>'.format(SCHEMA_NAMESPACE)
+
+
+def _get_elements(data_structure):
+    """ Return the elements of the data structure, in document order
+
+    Args:
+        data_structure:
+
+    Returns:
+
+    """
+    elements = [data_structure] if data_structure['tag'] == 'element' else []
+    for child in data_structure.get('children', []):
+        elements.extend(_get_elements(child))
+    return elements
+
+
+class ParserTypesTestSuite(TestCase):
+
+    @patch.object(parser, 'load_schema_data_in_db')
+    def test_generate_form_resolves_each_type_once(self, mock_load_schema_data_in_db):
+        # Act
+        with patch.object(parser, 'find_type', wraps=parser.find_type) as mock_find_type:
+            XSDParser(auto_key_keyref=False).generate_form(SCHEMA)
+
+        # Assert
+        self.assertEquals([call[0][1] for call in mock_find_type.call_args_list], ['shared'])
+
+    @patch.object(parser, 'load_schema_data_in_db')
+    def test_generate_form_resolves_each_ref_once(self, mock_load_schema_data_in_db):
+        # Act
+        with patch.object(parser, 'find_component', wraps=parser.find_component) as mock_find_component:
+            XSDParser(auto_key_keyref=False).generate_form(SCHEMA)
+
+        # Assert
+        self.assertEquals([call[0][1:] for call in mock_find_component.call_args_list], [('element', 'item')])
+
+    @patch.object(parser, 'load_schema_data_in_db')
+    def test_generate_form_renders_shared_type_for_each_element(self, mock_load_schema_data_in_db):
+        # Act
+        XSDParser(auto_key_keyref=False).generate_form(SCHEMA)
+        data_structure = mock_load_schema_data_in_db.call_args[0][0]
+
+        # Assert
+        # root element or global item element
+        root_elements = _get_elements(data_structure['children'][0]['children'][0])
+        self.assertEquals([element['options']['name'] for element in root_elements],
+                          ['root', 'first', 'value', 'second', 'value', 'third', 'value', 'item', 'item', 'label'])
+
+
+class ParserResolveTypeTestSuite(TestCase):
+
+    def setUp(self):
+        self.xml_tree = XSDTree.build_tree(SCHEMA_WITH_PREFIXES)
+        self.namespaces = {'xs': SCHEMA_NAMESPACE, 'ex': 'http://example.org', 'same': 'http://example.org',
+                           'unknown': 'http://unknown.org'}
+
+    def _get_element_type(self, element_name):
+        element = self.xml_tree.find("{0}element[@name='{1}']".format(LXML_SCHEMA_NAMESPACE, element_name))
+        return get_element_type(element, self.xml_tree, self.namespaces, 'xs', 'ex')
+
+    def test_get_element_type_finds_type_with_other_prefix_of_target_namespace(self):
+        # Act
+        element_type, type_tree, _ = self._get_element_type('local')
+        # Assert
+        self.assertEquals(element_type.attrib['name'], 'shared')
+        self.assertIs(type_tree, self.xml_tree)
+
+    @patch.object(parser, 'import_xml_tree')
+    def test_get_element_type_returns_none_for_namespace_not_imported(self, mock_import_xml_tree):
+        # Act
+        element_type, type_tree, schema_location = self._get_element_type('foreign')
+        # Assert: the type of the same name in the target namespace is not used
+        self.assertIsNone(element_type)
+        self.assertIs(type_tree, self.xml_tree)
+        self.assertIsNone(schema_location)
+        self.assertFalse(mock_import_xml_tree.called)
@@ -0,0 +1,80 @@
+""" Tests for the parser - renumbering of the xpaths of a branch
+"""
+import mongomock
+from bson.objectid import ObjectId
+from mock import patch
+
+from core_main_app.utils.integration_tests.fixture_interface import FixtureInterface
+from core_main_app.utils.integration_tests.integration_base_test_case import MongoIntegrationBaseTestCase
+from core_parser_app.components.data_structure_element import api as data_structure_element_api
+from core_parser_app.components.data_structure_element.models import DataStructureElement
+from core_parser_app.tools.parser.parser import update_branch_xpath
+
+
+class RepeatedElementFixture(FixtureInterface):
+    """ Element with 3 occurrences, all with the xpath of the first one (e.g. after a removal)
+    """
+    element = None
+
+    def insert_data(self):
+        """ Insert the element in database
+
+        Returns:
+
+        """
+        elements = []
+        iterations = []
+        for _ in range(3):
+            value = DataStructureElement('input', options={'xpath': {'xml': '/root[1]/item[1]/value[1]'}},
+                                         id=ObjectId())
+            item = DataStructureElement('element', options={'xpath': {'xml': '/root[1]/item[1]/value'}},
+                                        children=[value], id=ObjectId())
+            iteration = DataStructureElement('elem-iter', children=[item], id=ObjectId())
+            iterations.append(iteration)
+            elements.extend([value, item, iteration])
+
+        self.element = DataStructureElement('element', options={'xpath': {'xml': '/root[1]/item'}},
+                                            children=iterations, id=ObjectId())
+        elements.append(self.element)
+        data_structure_element_api.insert_many(elements)
+
+
+class TestUpdateBranchXpath(MongoIntegrationBaseTestCase):
+    fixture = RepeatedElementFixture()
+
+    def _get_xpaths(self):
+        element = data_structure_element_api.get_subtree(
+            data_structure_element_api.get_by_id(self.fixture.element.id))
+        return [[(child.options['xpath']['xml'], child.version) for child in iteration.children[0].children]
+                for iteration in element.children]
+
+    def test_update_branch_xpath_renumbers_occurrences(self):
+        # Act
+        update_branch_xpath(data_structure_element_api.get_by_id(self.fixture.element.id))
+        # Assert
+        self.assertEqual(self._get_xpaths(), [[('/root[1]/item[1]/value[1]', 0)],
+                                              [('/root[1]/item[2]/value[1]', 1)],
+                                              [('/root[1]/item[3]/value[1]', 1)]])
+
+    def test_update_branch_xpath_writes_xpaths_in_one_bulk_write(self):
+        # Arrange
+        element = data_structure_element_api.get_by_id(self.fixture.element.id)
+        # Act
+        with patch.object(mongomock.collection.Collection, 'bulk_write', autospec=True,
+                          side_effect=mongomock.collection.Collection.bulk_write) as mock_bulk_write:
+            with patch.object(mongomock.collection.Collection, 'update_one', autospec=True) as mock_update_one:
+                update_branch_xpath(element)
+        # Assert
+        self.assertEqual(mock_bulk_write.call_count, 1)
+        self.assertEqual(len(mock_bulk_write.call_args[0][1]), 4)
+        self.assertFalse(mock_update_one.called)
+
+    def test_update_branch_xpath_updates_branch_in_memory(self):
+        # Arrange
+        element = data_structure_element_api.get_subtree(
+            data_structure_element_api.get_by_id(self.fixture.element.id))
+        # Act
+        update_branch_xpath(element)
+        # Assert
+        self.assertEqual(element.children[2].children[0].children[0].options['xpath']['xml'],
+                         '/root[1]/item[3]/value[1]')
@@ -0,0 +1,154 @@
+""" Integration tests for the renderers - number of database queries
+"""
+from os.path import join, dirname
+
+import mongomock
+from django.test import override_settings
+from mock import patch
+
+from core_main_app.utils.integration_tests.fixture_interface import FixtureInterface
+from core_main_app.utils.integration_tests.integration_base_test_case import MongoIntegrationBaseTestCase
+from core_parser_app.components.data_structure_element import api as data_structure_element_api
+from core_parser_app.components.data_structure_element.models import DataStructureElement
+from core_parser_app.tools.parser.parser import XSDParser
+from core_parser_app.tools.parser.renderer.checkbox import CheckboxRenderer
+from core_parser_app.tools.parser.renderer.list import ListRenderer
+from core_parser_app.tools.parser.renderer.table import TableRenderer
+from core_parser_app.tools.parser.renderer.xml import XmlRenderer
+from core_parser_app.tools import parser
+
+RENDERER_TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [join(dirname(parser.__file__), 'templates')],
+    },
+]
+
+XSD_STRING = """<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">
+    <xs:element name="root">
+        <xs:complexType>
+            <xs:sequence>
+                <xs:element name="name" type="xs:string"/>
+                <xs:element name="title" type="xs:string"/>
+                <xs:element name="date" type="xs:date"/>
+                <xs:element name="item" maxOccurs="3">
+                    <xs:complexType>
+                        <xs:sequence>
+                            <xs:element name="value" type="xs:integer"/>
+                            <xs:element name="min" type="xs:integer"/>
+                            <xs:element name="max" type="xs:integer"/>
+                            <xs:element name="comment" type="xs:string"/>
+                            <xs:element name="unit">
+                                <xs:simpleType>
+                                    <xs:restriction base="xs:string">
+                                        <xs:enumeration value="m"/>
+                                        <xs:enumeration value="s"/>
+                                    </xs:restriction>
+                                </xs:simpleType>
+                            </xs:element>
+                        </xs:sequence>
+                        <xs:attribute name="id" type="xs:string"/>
+                    </xs:complexType>
+                </xs:element>
+            </xs:sequence>
+        </xs:complexType>
+    </xs:element>
+</xs:schema>"""
+
+
+class FormFixture(FixtureInterface):
+    """ Represents a form generated by the parser
+    """
+    root_id = None
+    nb_levels = None
+
+    def insert_data(self):
+        """ Insert the form in database
+
+        Returns:
+
+        """
+        self.root_id = XSDParser().generate_form(XSD_STRING)
+        self.nb_levels = _get_nb_levels(DataStructureElement.objects.get(pk=self.root_id))
+
+
+def _get_nb_levels(element):
+    """ Return the number of levels of the tree
+
+    Args:
+        element:
+
+    Returns:
+
+    """
+    return 1 + max([_get_nb_levels(child) for child in element.children] or [0])
+
+
+class QueryCounter(object):
+    """ Counts the queries sent to the data structure element collection
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._find = mongomock.collection.Collection.find
+
+    def find(self, collection, *args, **kwargs):
+        if collection.name == DataStructureElement._get_collection_name():
+            self.count += 1
+        return self._find(collection, *args, **kwargs)
+
+
+class TestRendererQueries(MongoIntegrationBaseTestCase):
+    fixture = FormFixture()
+
+    def setUp(self):
+        super(TestRendererQueries, self).setUp()
+        # the base test case does not apply class level settings
+        templates_settings = override_settings(TEMPLATES=RENDERER_TEMPLATES)
+        templates_settings.enable()
+        self.addCleanup(templates_settings.disable)
+
+    def _render(self, render_function):
+        root_element = data_structure_element_api.get_by_id(self.fixture.root_id)
+        counter = QueryCounter()
+
+        with patch.object(mongomock.collection.Collection, 'find', autospec=True, side_effect=counter.find):
+            html = render_function(root_element)
+
+        self.assertNotEqual(html, '')
+        return counter.count
+
+    def test_list_renderer_sends_one_query_per_level(self):
+        # Act
+        count = self._render(lambda element: ListRenderer(element, None).render())
+        # Assert
+        self.assertEqual(count, self.fixture.nb_levels)
+
+    def test_checkbox_renderer_sends_one_query_per_level(self):
+        # Act
+        count = self._render(lambda element: CheckboxRenderer(element, None).render())
+        # Assert
+        self.assertEqual(count, self.fixture.nb_levels)
+
+    def test_xml_renderer_sends_one_query_per_level(self):
+        # Act
+        count = self._render(lambda element: XmlRenderer(element).render())
+        # Assert
+        self.assertEqual(count, self.fixture.nb_levels)
+
+    def test_table_renderer_sends_one_query_per_level(self):
+        # Act
+        count = self._render(lambda element: TableRenderer(element).render())
+        # Assert
+        self.assertEqual(count, self.fixture.nb_levels)
+
+    def test_renderer_does_not_query_tree_already_in_memory(self):
+        # Arrange
+        root_element = data_structure_element_api.get_subtree(
+            data_structure_element_api.get_by_id(self.fixture.root_id))
+        counter = QueryCounter()
+        # Act
+        with patch.object(mongomock.collection.Collection, 'find', autospec=True, side_effect=counter.find):
+            ListRenderer(root_element, None).render()
+        # Assert
+        self.assertEqual(counter.count, 0)
@@ -0,0 +1,97 @@
+""" Integration tests for the renderers - cache of the rendered subtrees
+"""
+from django.core.cache import caches
+from django.test import override_settings
+from mock import patch
+
+from core_main_app.utils.integration_tests.integration_base_test_case import MongoIntegrationBaseTestCase
+from core_parser_app.components.data_structure_element import api as data_structure_element_api
+from core_parser_app.components.data_structure_element.models import DataStructureElement
+from core_parser_app.tools.parser.renderer.list import ListRenderer
+from tests.tools.parser.renderer.tests_int_queries import RENDERER_TEMPLATES, FormFixture
+
+SUBTREE_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'subtrees': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'subtrees',
+    },
+}
+
+
+class TestListRendererSubtreeCache(MongoIntegrationBaseTestCase):
+    fixture = FormFixture()
+
+    def setUp(self):
+        super(TestListRendererSubtreeCache, self).setUp()
+        # the base test case does not apply class level settings
+        test_settings = override_settings(TEMPLATES=RENDERER_TEMPLATES, CACHES=SUBTREE_CACHES)
+        test_settings.enable()
+        self.addCleanup(test_settings.disable)
+
+        for target in ['core_parser_app.tools.parser.utils.rendering.PARSER_RENDER_CACHE',
+                       'core_parser_app.components.data_structure_element.api.PARSER_RENDER_CACHE']:
+            subtree_cache = patch(target, 'subtrees')
+            subtree_cache.start()
+            self.addCleanup(subtree_cache.stop)
+
+        caches['subtrees'].clear()
+
+    def _render(self):
+        """ Render the form, return the HTML and the number of li rendered
+
+        Returns:
+
+        """
+        root_element = data_structure_element_api.get_by_id(self.fixture.root_id)
+
+        with patch.object(ListRenderer, '_render_li', autospec=True,
+                          side_effect=ListRenderer._render_li) as mock_render_li:
+            html = ListRenderer(root_element, None).render()
+
+        return html, mock_render_li.call_count
+
+    def _set_input_value(self, value):
+        input_element = DataStructureElement.objects(tag='input').first()
+        input_element.value = value
+        data_structure_element_api.upsert(input_element)
+
+    def test_render_returns_cached_html_of_unchanged_form(self):
+        # Arrange
+        html, _ = self._render()
+        # Act
+        cached_html, nb_rendered_li = self._render()
+        # Assert
+        self.assertEqual(cached_html, html)
+        self.assertEqual(nb_rendered_li, 0)
+
+    def test_render_returns_html_of_modified_form(self):
+        # Arrange
+        self._render()
+        self._set_input_value('modified value')
+        # Act
+        html, _ = self._render()
+        # Assert
+        self.assertIn('modified value', html)
+        with patch('core_parser_app.tools.parser.utils.rendering.PARSER_RENDER_CACHE', None):
+            self.assertEqual(html, self._render()[0])
+
+    def test_render_reuses_unchanged_subtrees(self):
+        # Arrange
+        _, nb_rendered_li = self._render()
+        self._set_input_value('modified value')
+        # Act
+        _, nb_rerendered_li = self._render()
+        # Assert
+        self.assertGreater(nb_rerendered_li, 0)
+        self.assertLess(nb_rerendered_li, nb_rendered_li)
+
+    def test_render_is_not_cached_when_disabled(self):
+        # Act
+        with patch('core_parser_app.tools.parser.utils.rendering.PARSER_RENDER_CACHE', None):
+            self._render()
+            _, nb_rendered_li = self._render()
+        # Assert
+        self.assertGreater(nb_rendered_li, 0)
@@ -0,0 +1,110 @@
+""" Unit tests for the rendering of the buttons
+"""
+from os.path import join
+from unittest.case import TestCase
+
+from django.template import loader
+from django.test import override_settings
+from mock import patch
+
+from core_parser_app.components.data_structure_element.models import DataStructureElement
+from core_parser_app.tools.parser.renderer import DefaultRenderer
+from core_parser_app.tools.parser.renderer.list import ListRenderer
+from tests.tools.parser.renderer.tests_int_queries import RENDERER_TEMPLATES
+
+
+class OtherRenderer(DefaultRenderer):
+    """ Renderer of another class, with the default templates
+    """
+
+
+class TestRenderButtons(TestCase):
+
+    def setUp(self):
+        templates_settings = override_settings(TEMPLATES=RENDERER_TEMPLATES)
+        templates_settings.enable()
+        self.addCleanup(templates_settings.disable)
+
+        fragments = patch.dict(DefaultRenderer._static_fragments, clear=True)
+        fragments.start()
+        self.addCleanup(fragments.stop)
+
+        self.element = DataStructureElement(tag='element', options={})
+
+    def test_render_buttons_renders_each_variant_once(self):
+        # Arrange
+        renderer = ListRenderer(self.element, None)
+        other_renderer = ListRenderer(self.element, None)
+        variants = [(True, True), (True, False), (False, True)]
+
+        # Act
+        with patch.object(DefaultRenderer, '_load_template', autospec=True,
+                          side_effect=DefaultRenderer._load_template) as mock_load_template:
+            html = [renderer._render_buttons(*variant) for variant in variants]
+            other_html = [other_renderer._render_buttons(*variant) for variant in variants]
+            renderer._render_collapse_button()
+            other_renderer._render_collapse_button()
+
+        # Assert
+        self.assertEquals(html, other_html)
+        self.assertEquals(mock_load_template.call_count, 2 * len(variants) + 1)
+
+    def test_render_buttons_renders_same_html_as_templates(self):
+        # Arrange
+        renderer = ListRenderer(self.element, None)
+        add_template = loader.get_template(join('renderer', 'default', 'buttons', 'add.html'))
+        delete_template = loader.get_template(join('renderer', 'default', 'buttons', 'delete.html'))
+
+        # Act # Assert
+        for add_button, delete_button in [(True, True), (True, False), (False, True)]:
+            expected_html = add_template.render({'is_hidden': not add_button}) + \
+                delete_template.render({'is_hidden': not delete_button})
+            # rendered, then returned from the cache
+            renderer._render_buttons(add_button, delete_button)
+            self.assertEquals(renderer._render_buttons(add_button, delete_button), expected_html)
+
+        self.assertEquals(renderer._render_buttons(False, False), '')
+
+    def test_render_buttons_uses_templates_of_renderer(self):
+        # Arrange
+        renderer = DefaultRenderer(self.element)
+        custom_renderer = DefaultRenderer(self.element, {
+            'btn_add': loader.get_template(join('renderer', 'default', 'buttons', 'delete.html'))
+        })
+
+        # Act
+        html = renderer._render_buttons(True, False)
+        custom_html = custom_renderer._render_buttons(True, False)
+
+        # Assert
+        self.assertNotEquals(html, custom_html)
+        self.assertEquals(custom_html.count('fa-minus-circle'), 2)
+
+    def test_render_buttons_is_rendered_per_renderer_class(self):
+        # Arrange
+        renderer = DefaultRenderer(self.element)
+        other_renderer = OtherRenderer(self.element)
+
+        # Act
+        with patch.object(DefaultRenderer, '_load_template', autospec=True,
+                          side_effect=DefaultRenderer._load_template) as mock_load_template:
+            renderer._render_collapse_button()
+            other_renderer._render_collapse_button()
+
+        # Assert
+        self.assertEquals(mock_load_template.call_count, 2)
+
+    def test_render_buttons_renders_templates_each_time_in_debug(self):
+        # Arrange
+        templates = [dict(RENDERER_TEMPLATES[0], OPTIONS={'debug': True})]
+        with override_settings(TEMPLATES=templates):
+            renderer = DefaultRenderer(self.element)
+
+            # Act
+            with patch.object(DefaultRenderer, '_load_template', autospec=True,
+                              side_effect=DefaultRenderer._load_template) as mock_load_template:
+                renderer._render_collapse_button()
+                renderer._render_collapse_button()
+
+        # Assert
+        self.assertEquals(mock_load_template.call_count, 2)
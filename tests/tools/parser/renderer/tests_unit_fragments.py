@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+""" Unit tests for the python emitters of the renderer fragments - parity with the templates
+"""
+import itertools
+from os.path import join
+from unittest.case import TestCase
+
+from bson.objectid import ObjectId
+from django.template import loader
+from django.test import override_settings
+from django.utils.safestring import mark_safe
+from mock import patch
+
+from core_parser_app.tools.parser import parser
+from core_parser_app.tools.parser.parser import XSDParser, build_data_structure_element
+from core_parser_app.tools.parser.renderer.list import ListRenderer
+from core_parser_app.tools.parser.utils.rendering import get_fragment_emitter, FRAGMENT_EMITTERS
+from tests.tools.parser.renderer.tests_int_queries import RENDERER_TEMPLATES, XSD_STRING
+
+VALUES = ['', 'text', u'unicodé', '<b class="x">R&D\'s</b>', mark_safe('<i>safe</i>'), None, 0, 12, ObjectId()]
+
+
+def _render_template(template_name, data):
+    """ Return the template rendered with the data
+
+    Args:
+        template_name:
+        data:
+
+    Returns:
+
+    """
+    return loader.get_template(template_name).render(dict(data))
+
+
+class TestFragmentEmitters(TestCase):
+
+    def setUp(self):
+        templates_settings = override_settings(TEMPLATES=RENDERER_TEMPLATES)
+        templates_settings.enable()
+        self.addCleanup(templates_settings.disable)
+
+    def _assert_same_html(self, template_name, data_list):
+        """ Assert that the emitter of the template produces the same HTML as the template
+
+        Args:
+            template_name:
+            data_list:
+
+        Returns:
+
+        """
+        emitter = get_fragment_emitter(loader.get_template(template_name))
+        self.assertIsNotNone(emitter)
+
+        for data in data_list:
+            expected_html = _render_template(template_name, data)
+            html = emitter(dict(data))
+            self.assertEquals(html, expected_html, 'different HTML for {0}'.format(repr(data)))
+            self.assertEquals(type(html), type(expected_html))
+
+    def test_list_ul_emitter_renders_same_html_as_template(self):
+        self._assert_same_html(join('renderer', 'list', 'ul.html'), [
+            {'content': content, 'element_id': element_id, 'is_hidden': is_hidden}
+            for content, element_id, is_hidden in itertools.product(VALUES, VALUES, [True, False])
+        ])
+
+    def test_list_li_emitter_renders_same_html_as_template(self):
+        self._assert_same_html(join('renderer', 'list', 'li.html'), [
+            {'content': content, 'li_class': li_class, 'li_id': str(li_id)}
+            for content, li_class, li_id in itertools.product(VALUES, VALUES, ['', '123', ObjectId()])
+        ])
+
+    def test_input_emitter_renders_same_html_as_template(self):
+        self._assert_same_html(join('renderer', 'default', 'inputs', 'input.html'), [
+            {'id': element_id, 'value': value, 'placeholder': placeholder, 'tooltip': tooltip, 'use': use,
+             'fixed': fixed}
+            for element_id, value, placeholder, tooltip, use, fixed in itertools.product(
+                [ObjectId(), None], VALUES, VALUES, ['', 'tooltip <text>\non two lines'], VALUES, [True, False]
+            )
+        ])
+
+    def test_button_emitters_render_same_html_as_templates(self):
+        for button in ['add', 'delete']:
+            self._assert_same_html(join('renderer', 'default', 'buttons', '{0}.html'.format(button)),
+                                   [{'is_hidden': True}, {'is_hidden': False}])
+
+        self._assert_same_html(join('renderer', 'default', 'buttons', 'collapse.html'), [{}])
+
+    def test_all_emitters_have_a_template(self):
+        for template_name in FRAGMENT_EMITTERS:
+            self.assertIsNotNone(get_fragment_emitter(loader.get_template(template_name)))
+
+    def test_no_emitter_for_other_templates(self):
+        # Act # Assert
+        self.assertIsNone(get_fragment_emitter(loader.get_template(join('renderer', 'list', 'attributes.html'))))
+
+    def test_no_emitter_without_autoescape(self):
+        # Arrange
+        templates = [dict(RENDERER_TEMPLATES[0], OPTIONS={'autoescape': False})]
+        # Act
+        with override_settings(TEMPLATES=templates):
+            emitter = get_fragment_emitter(loader.get_template(join('renderer', 'list', 'ul.html')))
+        # Assert
+        self.assertIsNone(emitter)
+
+
+class TestListRendererFastRendering(TestCase):
+
+    def setUp(self):
+        templates_settings = override_settings(TEMPLATES=RENDERER_TEMPLATES)
+        templates_settings.enable()
+        self.addCleanup(templates_settings.disable)
+
+        # form built in memory, not saved
+        with patch.object(parser, 'load_schema_data_in_db') as mock_load_schema_data_in_db:
+            XSDParser(ignore_modules=True).generate_form(XSD_STRING)
+        self.root = build_data_structure_element(mock_load_schema_data_in_db.call_args[0][0], [])
+
+    def test_fast_rendering_renders_same_html_as_templates(self):
+        # Arrange
+        renderer = ListRenderer(self.root, None)
+        fast_renderer = ListRenderer(self.root, None)
+        fast_renderer.fast_rendering = True
+
+        # Act
+        html = renderer.render()
+        fast_html = fast_renderer.render()
+
+        # Assert
+        self.assertEquals(fast_html, html)
+        self.assertTrue(any(emitter is not None for emitter in fast_renderer._fragment_emitters.values()))
+
+    def test_fast_rendering_uses_templates_given_to_renderer(self):
+        # Arrange
+        fast_renderer = ListRenderer(self.root, None)
+        fast_renderer.templates['li'] = loader.get_template(join('renderer', 'list', 'attributes.html'))
+        fast_renderer.fast_rendering = True
+
+        # Act
+        fast_renderer.render()
+
+        # Assert
+        self.assertIsNone(fast_renderer._fragment_emitters['li'])
+        self.assertIsNotNone(fast_renderer._fragment_emitters['ul'])
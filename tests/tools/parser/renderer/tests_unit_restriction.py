@@ -0,0 +1,96 @@
+""" Unit tests for the rendering of restrictions
+"""
+from unittest.case import TestCase
+
+from django.test import override_settings
+
+from core_parser_app.components.data_structure_element.models import DataStructureElement
+from core_parser_app.tools.parser.renderer.list import ListRenderer
+from core_parser_app.tools.parser.renderer.table import TableRenderer
+from core_parser_app.tools.parser.renderer.xml import XmlRenderer
+from tests.tools.parser.renderer.tests_int_queries import RENDERER_TEMPLATES
+
+VALUES = ['H', 'He', 'Li']
+
+
+def _get_restriction(value):
+    """ Return a restriction with the enumeration stored in its options
+
+    Args:
+        value:
+
+    Returns:
+
+    """
+    return DataStructureElement(tag='restriction', value=value,
+                                options={'base': 'xs:string', 'fixed': False, 'enumeration': VALUES})
+
+
+def _get_legacy_restriction(value):
+    """ Return a restriction with the enumeration stored as children (previous versions)
+
+    Args:
+        value:
+
+    Returns:
+
+    """
+    children = [DataStructureElement(tag='enumeration', value=enumeration_value) for enumeration_value in VALUES]
+    return DataStructureElement(tag='restriction', value=value, options={'base': 'xs:string', 'fixed': False},
+                                children=children)
+
+
+class TestRenderRestriction(TestCase):
+
+    def setUp(self):
+        templates_settings = override_settings(TEMPLATES=RENDERER_TEMPLATES)
+        templates_settings.enable()
+        self.addCleanup(templates_settings.disable)
+
+    def test_list_renderer_renders_enumeration_as_select(self):
+        # Arrange
+        restriction = _get_restriction('He')
+        # Act
+        html = ListRenderer(restriction, None).render_restriction(restriction)
+        # Assert
+        for value in VALUES:
+            self.assertIn('>{0}<'.format(value), html)
+        self.assertIn('selected', html)
+
+    def test_list_renderer_renders_legacy_enumeration_children_the_same(self):
+        # Arrange
+        restriction = _get_restriction('He')
+        legacy_restriction = _get_legacy_restriction('He')
+        # Act
+        html = ListRenderer(restriction, None).render_restriction(restriction)
+        legacy_html = ListRenderer(legacy_restriction, None).render_restriction(legacy_restriction)
+        # Assert
+        self.assertEquals(html, legacy_html)
+
+    def test_table_renderer_renders_legacy_enumeration_children_the_same(self):
+        # Arrange
+        restriction = _get_restriction('He')
+        legacy_restriction = _get_legacy_restriction('He')
+        # Act
+        html = TableRenderer(restriction).render_restriction(restriction)
+        legacy_html = TableRenderer(legacy_restriction).render_restriction(legacy_restriction)
+        # Assert
+        self.assertEquals(html, legacy_html)
+
+    def test_xml_renderer_renders_enumeration_value(self):
+        # Arrange
+        restriction = _get_restriction('He')
+        # Act
+        content = XmlRenderer(restriction).render_restriction(restriction)
+        # Assert
+        self.assertEquals(content, ['', 'He', ''])
+
+    def test_xml_renderer_renders_legacy_enumeration_children_the_same(self):
+        # Arrange
+        restriction = _get_restriction('He')
+        legacy_restriction = _get_legacy_restriction('He')
+        # Act
+        content = XmlRenderer(restriction).render_restriction(restriction)
+        legacy_content = XmlRenderer(legacy_restriction).render_restriction(legacy_restriction)
+        # Assert
+        self.assertEquals(content, legacy_content)
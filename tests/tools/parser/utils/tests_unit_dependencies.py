@@ -0,0 +1,389 @@
+""" Unit tests for the schema dependencies utils
+"""
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import urllib2
+from unittest.case import TestCase
+
+from mock import patch
+
+from core_parser_app.tools.parser import parser
+from core_parser_app.tools.parser.utils.dependencies import DirectorySchemaBackend, SchemaCache, \
+    XSDFlattenerDatabaseOrCache
+from core_parser_app.tools.parser.utils.schema import CompiledSchemaCache, get_compiled_schema
+from xml_utils.commons.constants import LXML_SCHEMA_NAMESPACE
+from xml_utils.xsd_tree.xsd_tree import XSDTree
+
+SCHEMA_URL = 'http://example.org/schemas/types.xsd'
+INCLUDED_SCHEMA_URL = 'http://example.org/schemas/included.xsd'
+SCHEMA = '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">' \
+         '<xs:include schemaLocation="{0}"/>' \
+         '<xs:simpleType name="code"><xs:restriction base="xs:string"/></xs:simpleType>' \
+         '</xs:schema>'.format(INCLUDED_SCHEMA_URL)
+INCLUDED_SCHEMA = '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">' \
+                  '<xs:simpleType name="label"><xs:restriction base="xs:string"/></xs:simpleType>' \
+                  '</xs:schema>'
+MODIFIED_INCLUDED_SCHEMA = '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">' \
+                           '<xs:simpleType name="other"><xs:restriction base="xs:string"/></xs:simpleType>' \
+                           '</xs:schema>'
+
+
+class SchemaDirectoryTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        os.mkdir(os.path.join(self.directory, 'schemas'))
+        self.write_schema('types.xsd', SCHEMA)
+        self.write_schema('included.xsd', INCLUDED_SCHEMA)
+        self.backend = DirectorySchemaBackend(self.directory)
+
+        # no url configuration in the test settings
+        patcher = patch('core_parser_app.tools.parser.utils.dependencies.get_template_download_pattern',
+                        return_value=re.compile(r'/rest/template-download/(?P<pk>\w+)'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write_schema(self, file_name, content):
+        with open(os.path.join(self.directory, 'schemas', file_name), 'w') as schema_file:
+            schema_file.write(content)
+
+
+class TestDirectorySchemaBackend(SchemaDirectoryTestCase):
+
+    def test_fetch_returns_content_and_validators(self):
+        # Act
+        response = self.backend.fetch(SCHEMA_URL)
+        # Assert
+        self.assertEquals(response.content, SCHEMA)
+        self.assertIsNotNone(response.etag)
+        self.assertIsNotNone(response.last_modified)
+
+    def test_fetch_not_modified_returns_none(self):
+        # Arrange
+        response = self.backend.fetch(SCHEMA_URL)
+        # Act
+        result = self.backend.fetch(SCHEMA_URL, response.etag, response.last_modified)
+        # Assert
+        self.assertIsNone(result)
+
+    def test_fetch_missing_schema_raises_url_error(self):
+        # Act # Assert
+        with self.assertRaises(urllib2.URLError):
+            self.backend.fetch('http://example.org/schemas/missing.xsd')
+
+
+class TestSchemaCache(SchemaDirectoryTestCase):
+
+    def test_get_content_fetches_schema_once(self):
+        # Arrange
+        schema_cache = SchemaCache(self.backend)
+        # Act
+        for _ in range(5):
+            content = schema_cache.get_content(SCHEMA_URL)
+        # Assert
+        self.assertEquals(content, SCHEMA)
+        self.assertEquals(schema_cache.nb_downloads, 1)
+        self.assertEquals(schema_cache.nb_revalidations, 0)
+
+    def test_expired_schema_not_modified_is_revalidated_without_download(self):
+        # Arrange
+        schema_cache = SchemaCache(self.backend, ttl=0)
+        schema_cache.get_content(SCHEMA_URL)
+        # Act
+        content = schema_cache.get_content(SCHEMA_URL)
+        # Assert
+        self.assertEquals(content, SCHEMA)
+        self.assertEquals(schema_cache.nb_downloads, 1)
+        self.assertEquals(schema_cache.nb_revalidations, 1)
+
+    def test_expired_schema_modified_is_downloaded_again(self):
+        # Arrange
+        schema_cache = SchemaCache(self.backend, ttl=0)
+        schema_cache.get_content(SCHEMA_URL)
+        self.write_schema('types.xsd', INCLUDED_SCHEMA)
+        # Act
+        content = schema_cache.get_content(SCHEMA_URL)
+        # Assert
+        self.assertEquals(content, INCLUDED_SCHEMA)
+        self.assertEquals(schema_cache.nb_downloads, 2)
+
+    def test_schema_not_expired_is_not_revalidated(self):
+        # Arrange
+        schema_cache = SchemaCache(self.backend, ttl=3600)
+        schema_cache.get_content(SCHEMA_URL)
+        self.write_schema('types.xsd', INCLUDED_SCHEMA)
+        # Act
+        content = schema_cache.get_content(SCHEMA_URL)
+        # Assert
+        self.assertEquals(content, SCHEMA)
+        self.assertEquals(schema_cache.nb_revalidations, 0)
+
+    def test_revalidation_error_returns_cached_schema(self):
+        # Arrange
+        schema_cache = SchemaCache(self.backend, ttl=0)
+        schema_cache.get_content(SCHEMA_URL)
+        os.remove(os.path.join(self.directory, 'schemas', 'types.xsd'))
+        # Act
+        content = schema_cache.get_content(SCHEMA_URL)
+        # Assert
+        self.assertEquals(content, SCHEMA)
+
+    def test_least_recently_used_schema_is_evicted_when_cache_is_full(self):
+        # Arrange
+        schema_cache = SchemaCache(self.backend, max_size=len(SCHEMA) + len(INCLUDED_SCHEMA) - 1)
+        schema_cache.get_content(SCHEMA_URL)
+        # Act
+        schema_cache.get_content(INCLUDED_SCHEMA_URL)
+        schema_cache.get_content(SCHEMA_URL)
+        # Assert
+        self.assertEquals(len(schema_cache), 1)
+        self.assertEquals(schema_cache.nb_downloads, 3)
+
+    def test_get_flat_content_flattens_once(self):
+        # Arrange
+        schema_cache = SchemaCache(self.backend)
+        flattened = []
+
+        def flatten(content):
+            flattened.append(content)
+            return content.upper(), {}
+
+        # Act
+        for _ in range(3):
+            flat_content, _ = schema_cache.get_flat_content(SCHEMA_URL, flatten)
+        # Assert
+        self.assertEquals(flat_content, SCHEMA.upper())
+        self.assertEquals(flattened, [SCHEMA])
+
+    def test_flat_content_is_kept_when_revalidated_content_is_unchanged(self):
+        # Arrange
+        schema_cache = SchemaCache(self.backend, ttl=0)
+        flattened = []
+
+        def flatten(content):
+            flattened.append(content)
+            return content, {}
+
+        schema_cache.get_flat_content(SCHEMA_URL, flatten)
+        # rewrite the same content: new modification date, same hash
+        time.sleep(0.01)
+        self.write_schema('types.xsd', SCHEMA)
+        # Act
+        schema_cache.get_flat_content(SCHEMA_URL, flatten)
+        # Assert
+        self.assertEquals(len(flattened), 1)
+
+    def test_flat_content_is_rebuilt_when_dependency_is_modified(self):
+        # Arrange
+        schema_cache = SchemaCache(self.backend, ttl=0)
+
+        def flatten(content):
+            flattener = XSDFlattenerDatabaseOrCache(content, schema_cache=schema_cache)
+            return flattener.get_flat(), flattener.dependency_hashes
+
+        schema_cache.get_flat_content(SCHEMA_URL, flatten)
+        self.write_schema('included.xsd', MODIFIED_INCLUDED_SCHEMA)
+        # Act
+        flat_content, dependencies = schema_cache.get_flat_content(SCHEMA_URL, flatten)
+        # Assert
+        self.assertIn('name="other"', flat_content)
+        self.assertEquals(dependencies.keys(), [INCLUDED_SCHEMA_URL])
+
+    def test_slow_fetch_does_not_block_other_schemas(self):
+        # Arrange
+        schema_cache = SchemaCache(self.backend)
+        fetch_started = threading.Event()
+        release_fetch = threading.Event()
+        fetch = self.backend.fetch
+
+        def slow_fetch(url, etag=None, last_modified=None):
+            if url == SCHEMA_URL:
+                fetch_started.set()
+                release_fetch.wait(5)
+            return fetch(url, etag, last_modified)
+
+        self.backend.fetch = slow_fetch
+        slow_thread = threading.Thread(target=schema_cache.get_content, args=(SCHEMA_URL,))
+        slow_thread.start()
+        self.addCleanup(slow_thread.join)
+        self.addCleanup(release_fetch.set)
+        fetch_started.wait(5)
+        # Act
+        content = schema_cache.get_content(INCLUDED_SCHEMA_URL)
+        # Assert
+        self.assertEquals(content, INCLUDED_SCHEMA)
+        self.assertTrue(slow_thread.is_alive())
+
+    def test_concurrent_misses_fetch_schema_once(self):
+        # Arrange
+        schema_cache = SchemaCache(self.backend)
+        fetch_started = threading.Event()
+        release_fetch = threading.Event()
+        fetch = self.backend.fetch
+
+        def slow_fetch(url, etag=None, last_modified=None):
+            fetch_started.set()
+            release_fetch.wait(5)
+            return fetch(url, etag, last_modified)
+
+        self.backend.fetch = slow_fetch
+        contents = []
+        threads = [threading.Thread(target=lambda: contents.append(schema_cache.get_content(SCHEMA_URL)))
+                   for _ in range(3)]
+        # Act
+        for thread in threads:
+            thread.start()
+        fetch_started.wait(5)
+        release_fetch.set()
+        for thread in threads:
+            thread.join(5)
+        # Assert
+        self.assertEquals(contents, [SCHEMA] * 3)
+        self.assertEquals(schema_cache.nb_downloads, 1)
+
+    def test_concurrent_misses_flatten_schema_once(self):
+        # Arrange
+        schema_cache = SchemaCache(self.backend)
+        flatten_started = threading.Event()
+        release_flatten = threading.Event()
+        flattened = []
+
+        def slow_flatten(content):
+            flattened.append(content)
+            flatten_started.set()
+            release_flatten.wait(5)
+            return content, {}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(schema_cache.get_flat_content(SCHEMA_URL,
+                                                                                                 slow_flatten)))
+                   for _ in range(3)]
+        # Act
+        for thread in threads:
+            thread.start()
+        flatten_started.wait(5)
+        release_flatten.set()
+        for thread in threads:
+            thread.join(5)
+        # Assert
+        self.assertEquals(results, [(SCHEMA, {})] * 3)
+        self.assertEquals(len(flattened), 1)
+
+    def test_failed_fetch_is_retried_by_next_caller(self):
+        # Arrange
+        schema_cache = SchemaCache(self.backend)
+        fetch = self.backend.fetch
+        self.backend.fetch = lambda url, etag=None, last_modified=None: fetch('http://example.org/missing.xsd')
+        with self.assertRaises(urllib2.URLError):
+            schema_cache.get_content(SCHEMA_URL)
+        self.backend.fetch = fetch
+        # Act
+        content = schema_cache.get_content(SCHEMA_URL)
+        # Assert
+        self.assertEquals(content, SCHEMA)
+
+    def test_size_is_consistent_when_schema_is_evicted_while_flattened(self):
+        # Arrange
+        schema_cache = SchemaCache(self.backend, max_size=len(SCHEMA) + len(INCLUDED_SCHEMA) - 1)
+
+        def flatten(content):
+            # another schema is used while the schema is flattened: the schema is evicted
+            schema_cache.get_content(INCLUDED_SCHEMA_URL)
+            return content, {}
+
+        # Act
+        flat_content, _ = schema_cache.get_flat_content(SCHEMA_URL, flatten)
+        # Assert
+        self.assertEquals(flat_content, SCHEMA)
+        self.assertEquals(len(schema_cache), 1)
+        self.assertEquals(schema_cache.get_size(), len(INCLUDED_SCHEMA))
+
+
+class TestXSDFlattenerDatabaseOrCache(SchemaDirectoryTestCase):
+
+    def test_get_flat_replaces_includes_with_cached_content(self):
+        # Arrange
+        schema_cache = SchemaCache(self.backend)
+        flattener = XSDFlattenerDatabaseOrCache(SCHEMA, schema_cache=schema_cache)
+        # Act
+        flat_tree = XSDTree.build_tree(flattener.get_flat())
+        # Assert
+        self.assertEquals(len(flat_tree.findall('{}include'.format(LXML_SCHEMA_NAMESPACE))), 0)
+        self.assertEquals(len(flat_tree.findall('{}simpleType'.format(LXML_SCHEMA_NAMESPACE))), 2)
+        self.assertEquals(schema_cache.nb_downloads, 1)
+
+    def test_get_flat_does_not_download_when_download_disabled(self):
+        # Arrange
+        schema_cache = SchemaCache(self.backend)
+        flattener = XSDFlattenerDatabaseOrCache(SCHEMA, download_enabled=False, schema_cache=schema_cache)
+        # Act
+        flat_tree = XSDTree.build_tree(flattener.get_flat())
+        # Assert
+        self.assertEquals(len(flat_tree.findall('{}simpleType'.format(LXML_SCHEMA_NAMESPACE))), 1)
+        self.assertEquals(schema_cache.nb_downloads, 0)
+
+
+class TestImportXmlTree(SchemaDirectoryTestCase):
+
+    def test_import_xml_tree_downloads_and_flattens_schema_once(self):
+        # Arrange
+        schema_cache = SchemaCache(self.backend)
+        el_import = XSDTree.build_tree('<xs:import xmlns:xs="http://www.w3.org/2001/XMLSchema" '
+                                       'schemaLocation="{0}"/>'.format(SCHEMA_URL)).getroot()
+
+        # Act
+        with patch('core_parser_app.tools.parser.utils.schema.get_schema_cache', return_value=schema_cache), \
+                patch('core_parser_app.tools.parser.utils.dependencies.get_schema_cache',
+                      return_value=schema_cache), \
+                patch('core_parser_app.tools.parser.utils.schema._compiled_schema_cache', CompiledSchemaCache()):
+            for _ in range(3):
+                xml_tree, schema_location = parser.import_xml_tree(el_import)
+
+        # Assert
+        self.assertEquals(schema_location, SCHEMA_URL)
+        self.assertEquals(len(xml_tree.findall('{}simpleType'.format(LXML_SCHEMA_NAMESPACE))), 2)
+        # main schema and included schema, downloaded once
+        self.assertEquals(schema_cache.nb_downloads, 2)
+        self.assertEquals(len(schema_cache), 2)
+
+
+class TestCompiledSchemaDependencies(SchemaDirectoryTestCase):
+
+    def setUp(self):
+        super(TestCompiledSchemaDependencies, self).setUp()
+        self.schema_cache = SchemaCache(self.backend, ttl=0)
+        self.compiled_schema_cache = CompiledSchemaCache()
+        for patcher in (patch('core_parser_app.tools.parser.utils.schema.get_schema_cache',
+                              return_value=self.schema_cache),
+                        patch('core_parser_app.tools.parser.utils.dependencies.get_schema_cache',
+                              return_value=self.schema_cache),
+                        patch('core_parser_app.tools.parser.utils.schema._compiled_schema_cache',
+                              self.compiled_schema_cache)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_schema_is_compiled_once_when_include_is_unchanged(self):
+        # Act
+        first_schema = get_compiled_schema(SCHEMA, 'template')
+        second_schema = get_compiled_schema(SCHEMA, 'template')
+        # Assert
+        self.assertIs(first_schema, second_schema)
+        self.assertEquals(self.compiled_schema_cache.nb_compilations, 1)
+
+    def test_schema_is_compiled_again_when_include_is_modified(self):
+        # Arrange
+        get_compiled_schema(SCHEMA, 'template')
+        self.write_schema('included.xsd', MODIFIED_INCLUDED_SCHEMA)
+        # Act
+        compiled_schema = get_compiled_schema(SCHEMA, 'template')
+        # Assert
+        self.assertIn(('simpleType', 'other'), compiled_schema.components)
+        self.assertNotIn(('simpleType', 'label'), compiled_schema.components)
+        self.assertEquals(self.compiled_schema_cache.nb_compilations, 2)
+        self.assertEquals(len(self.compiled_schema_cache), 1)
+        self.assertIs(self.compiled_schema_cache.get_by_tree(compiled_schema.xml_tree), compiled_schema)
@@ -0,0 +1,101 @@
+""" Unit tests for the edit data utils
+"""
+from unittest.case import TestCase
+
+from lxml import etree
+from mock import Mock
+
+from core_parser_app.tools.parser.utils.edit_data import EditDataIndex
+
+NAMESPACES = {'ex': 'http://example.org', 'xsi': 'http://www.w3.org/2001/XMLSchema-instance'}
+XML_DATA = '<ex:root xmlns:ex="http://example.org" xmlns:other="http://other.org" ' \
+           'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">' \
+           '<ex:item id="1" other:id="o1"><ex:value>a</ex:value><ex:value>b</ex:value><name>n1</name></ex:item>' \
+           '<!-- comment -->' \
+           '<other:item><ex:value>c</ex:value></other:item>' \
+           '<ex:item id="2"><ex:value>d</ex:value></ex:item>' \
+           '<ex:shape xsi:type="ex:circle"><ex:radius>1</ex:radius></ex:shape>' \
+           '<ex:shape xsi:type="square"><ex:side>2</ex:side></ex:shape>' \
+           '</ex:root>'
+XPATHS = [
+    '/ex:root',
+    '/ex:root[1]',
+    '/ex:root/ex:item',
+    '/ex:root[1]/ex:item[2]',
+    '/ex:root[1]/ex:item[3]',
+    '/ex:root/ex:item/ex:value',
+    '/ex:root[1]/ex:item[1]/ex:value[2]',
+    '/ex:root[1]/ex:item[1]/name',
+    '/ex:root[1]/ex:item[1]/ex:name',
+    '/ex:root/*[local-name()="item"]',
+    '/ex:root/*[local-name()="item"][2]/ex:value',
+    '/*[local-name()="root"]/*[local-name()="item"]/*[local-name()="value"]',
+    '/ex:root/ex:item/@id',
+    '/ex:root[1]/ex:item[1]/@*[local-name()="id"]',
+    '/ex:root/ex:item/@missing',
+    '/ex:root/ex:shape',
+    '/ex:root[1]/ex:shape[@xsi:type="ex:circle"]',
+    '/ex:root[1]/ex:shape[@xsi:type="square"]',
+    '/ex:root[1]/ex:shape[2][@xsi:type="square"]',
+    '/ex:root[1]/ex:shape[1][@xsi:type="square"]',
+    '/ex:root[1]/ex:shape[@xsi:type="circle"]',
+    '/root',
+    '/ex:missing/ex:item',
+]
+
+
+class TestEditDataIndex(TestCase):
+
+    def setUp(self):
+        self.xml_tree = etree.XML(XML_DATA)
+        self.index = EditDataIndex(self.xml_tree)
+
+    def test_xpath_returns_same_nodes_as_lxml(self):
+        for xpath in XPATHS:
+            # Act
+            result = self.index.xpath(xpath, namespaces=NAMESPACES)
+            # Assert
+            self.assertEquals(result, self.xml_tree.xpath(xpath, namespaces=NAMESPACES), xpath)
+
+    def test_xpath_returns_same_nodes_as_lxml_on_second_lookup(self):
+        # Arrange
+        for xpath in XPATHS:
+            self.index.xpath(xpath, namespaces=NAMESPACES)
+
+        for xpath in XPATHS:
+            # Act
+            result = self.index.xpath(xpath, namespaces=NAMESPACES)
+            # Assert
+            self.assertEquals(result, self.xml_tree.xpath(xpath, namespaces=NAMESPACES), xpath)
+
+    def test_xpath_resolves_prefixes_with_given_namespaces(self):
+        # Act
+        result = self.index.xpath('/a:root/a:item', namespaces={'a': 'http://example.org'})
+        # Assert
+        self.assertEquals(result, self.xml_tree.xpath('/ex:root/ex:item', namespaces=NAMESPACES))
+
+    def test_xpath_does_not_evaluate_paths_built_by_the_parser_with_lxml(self):
+        # Arrange
+        self.index.xml_tree = Mock()
+        # Act
+        for xpath in XPATHS:
+            self.index.xpath(xpath, namespaces=NAMESPACES)
+        # Assert
+        self.assertFalse(self.index.xml_tree.xpath.called)
+
+    def test_xpath_evaluates_other_xpaths_with_lxml(self):
+        for xpath in ['//ex:value', '/ex:root/ex:item[@id="2"]', '/ex:root/ex:item/text()', 'ex:item', '/ex:root/..']:
+            # Act
+            result = self.index.xpath(xpath, namespaces=NAMESPACES)
+            # Assert
+            self.assertEquals(result, self.xml_tree.xpath(xpath, namespaces=NAMESPACES), xpath)
+
+    def test_xpath_with_unknown_prefix_raises_like_lxml(self):
+        # Act # Assert
+        with self.assertRaises(etree.XPathEvalError):
+            self.index.xpath('/unknown:root', namespaces=NAMESPACES)
+
+    def test_xpath_with_xsi_type_without_xsi_prefix_raises_like_lxml(self):
+        # Act # Assert
+        with self.assertRaises(etree.XPathEvalError):
+            self.index.xpath('/ex:root/ex:shape[@xsi:type="square"]', namespaces={'ex': 'http://example.org'})
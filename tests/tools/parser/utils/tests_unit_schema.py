@@ -0,0 +1,326 @@
+""" Unit tests for the schema utils
+"""
+import threading
+from unittest.case import TestCase
+
+from mock import patch
+
+from core_parser_app.tools.parser.utils.schema import SchemaContext, SchemaContextCache, CompiledSchema, \
+    CompiledSchemaCache, get_xsd_types_set
+from xml_utils.xsd_tree.xsd_tree import XSDTree
+
+SCHEMA_WITH_NAMESPACE = '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" xmlns:ex="http://example.org" ' \
+                        'targetNamespace="http://example.org" elementFormDefault="qualified">' \
+                        '<xs:element name="root" type="xs:string"/></xs:schema>'
+SCHEMA_WITHOUT_NAMESPACE = '<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema">' \
+                           '<xsd:element name="root" type="xsd:string"/></xsd:schema>'
+SCHEMA_WITH_TYPES = '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">' \
+                    '<xs:element name="root" type="base"/><xs:element name="other" type="xs:string"/>' \
+                    '<xs:complexType name="base"><xs:sequence><xs:element name="a" type="xs:string"/>' \
+                    '</xs:sequence></xs:complexType>' \
+                    '<xs:complexType name="derived"><xs:complexContent><xs:extension base="base"/>' \
+                    '</xs:complexContent></xs:complexType>' \
+                    '<xs:simpleType name="code"><xs:restriction base="xs:string"/></xs:simpleType>' \
+                    '<xs:simpleType name="base"><xs:restriction base="xs:string"/></xs:simpleType>' \
+                    '</xs:schema>'
+SCHEMA_WITH_EXTENSIONS = '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" xmlns:ex="http://example.org" ' \
+                         'xmlns:other="http://other.org" targetNamespace="http://example.org">' \
+                         '<xs:import namespace="http://other.org" schemaLocation="http://other.org/other.xsd"/>' \
+                         '<xs:complexType name="base"/>' \
+                         '<xs:complexType name="derived"><xs:complexContent><xs:extension base="ex:base">' \
+                         '<xs:sequence><xs:element name="a" type="xs:string"/></xs:sequence></xs:extension>' \
+                         '</xs:complexContent></xs:complexType>' \
+                         '<xs:complexType name="otherDerived"><xs:complexContent><xs:extension base="other:base"/>' \
+                         '</xs:complexContent></xs:complexType>' \
+                         '<xs:simpleType name="code"><xs:restriction base="xs:string"/></xs:simpleType>' \
+                         '<xs:complexType name="codeDerived"><xs:simpleContent><xs:extension base="ex:code"/>' \
+                         '</xs:simpleContent></xs:complexType>' \
+                         '</xs:schema>'
+NAMESPACES = {'xs': 'http://www.w3.org/2001/XMLSchema'}
+
+
+class TestSchemaContext(TestCase):
+
+    def test_schema_context_with_target_namespace(self):
+        # Act
+        context = SchemaContext(XSDTree.build_tree(SCHEMA_WITH_NAMESPACE))
+        # Assert
+        self.assertEquals(context.namespaces['ex'], 'http://example.org')
+        self.assertEquals(context.default_prefix, 'xs')
+        self.assertEquals(context.target_namespace, 'http://example.org')
+        self.assertEquals(context.target_namespace_prefix, 'ex')
+        self.assertEquals(context.ns_prefix, 'ex')
+        self.assertEquals(context.element_form_default, 'qualified')
+        self.assertEquals(context.attribute_form_default, 'unqualified')
+
+    def test_schema_context_without_target_namespace(self):
+        # Act
+        context = SchemaContext(XSDTree.build_tree(SCHEMA_WITHOUT_NAMESPACE))
+        # Assert
+        self.assertEquals(context.default_prefix, 'xsd')
+        self.assertIsNone(context.target_namespace)
+        self.assertEquals(context.target_namespace_prefix, '')
+        self.assertIsNone(context.ns_prefix)
+        self.assertEquals(context.element_form_default, 'unqualified')
+
+    def test_schema_context_get_namespaces_returns_copy(self):
+        # Arrange
+        context = SchemaContext(XSDTree.build_tree(SCHEMA_WITH_NAMESPACE))
+        # Act
+        namespaces = context.get_namespaces(xsi=True)
+        # Assert
+        self.assertEquals(namespaces['xsi'], 'http://www.w3.org/2001/XMLSchema-instance')
+        self.assertNotIn('xsi', context.namespaces)
+
+    def test_get_extensions_returns_extending_types_from_any_namespace(self):
+        # Arrange
+        context = SchemaContext(XSDTree.build_tree(SCHEMA_WITH_EXTENSIONS))
+        # Act
+        extensions = context.get_extensions('base')
+        # Assert
+        self.assertEquals([extension.attrib['name'] for extension in extensions], ['derived', 'otherDerived'])
+
+    def test_get_extensions_filters_on_base_namespace(self):
+        # Arrange
+        context = SchemaContext(XSDTree.build_tree(SCHEMA_WITH_EXTENSIONS))
+        # Act
+        extensions = context.get_extensions('base', base_namespace='http://other.org')
+        # Assert
+        self.assertEquals([extension.attrib['name'] for extension in extensions], ['otherDerived'])
+
+    def test_get_extensions_returns_empty_list_if_type_not_extended(self):
+        # Arrange
+        context = SchemaContext(XSDTree.build_tree(SCHEMA_WITH_EXTENSIONS))
+        # Act # Assert
+        self.assertEquals(context.get_extensions('derived'), [])
+
+    def test_get_extensions_indexes_tree_once(self):
+        # Arrange
+        context = SchemaContext(XSDTree.build_tree(SCHEMA_WITH_EXTENSIONS))
+        # Act
+        with patch.object(context, '_index_extensions', wraps=context._index_extensions) as mock_index_extensions:
+            for type_name in ['base', 'derived', 'otherDerived', 'code', 'codeDerived']:
+                context.get_extensions(type_name)
+            context.get_imports()
+        # Assert
+        self.assertEquals(mock_index_extensions.call_count, 1)
+
+    def test_get_imports_returns_namespace_and_schema_location(self):
+        # Arrange
+        context = SchemaContext(XSDTree.build_tree(SCHEMA_WITH_EXTENSIONS))
+        # Act # Assert
+        self.assertEquals(context.get_imports(), [('http://other.org', 'http://other.org/other.xsd')])
+
+
+class TestSchemaContextCache(TestCase):
+
+    @patch('core_parser_app.tools.parser.utils.schema.get_namespaces')
+    def test_schema_context_cache_computes_namespaces_once_per_tree(self, mock_get_namespaces):
+        # Arrange
+        mock_get_namespaces.return_value = {}
+        cache = SchemaContextCache()
+        xml_tree = XSDTree.build_tree(SCHEMA_WITH_NAMESPACE)
+        # Act
+        first_context = cache.get(xml_tree)
+        second_context = cache.get(xml_tree)
+        # Assert
+        self.assertIs(first_context, second_context)
+        self.assertEquals(mock_get_namespaces.call_count, 1)
+
+    def test_schema_context_cache_returns_one_context_per_tree(self):
+        # Arrange
+        cache = SchemaContextCache()
+        # Act
+        first_context = cache.get(XSDTree.build_tree(SCHEMA_WITH_NAMESPACE))
+        second_context = cache.get(XSDTree.build_tree(SCHEMA_WITHOUT_NAMESPACE))
+        # Assert
+        self.assertIsNot(first_context, second_context)
+        self.assertEquals(len(cache), 2)
+
+    def test_schema_context_cache_clear_removes_contexts(self):
+        # Arrange
+        cache = SchemaContextCache()
+        cache.get(XSDTree.build_tree(SCHEMA_WITH_NAMESPACE))
+        # Act
+        cache.clear()
+        # Assert
+        self.assertEquals(len(cache), 0)
+
+    def test_schema_context_cache_reuses_context_of_compiled_schema(self):
+        # Arrange
+        compiled_schema = CompiledSchema(SCHEMA_WITH_NAMESPACE, {})
+        cache = CompiledSchemaCache()
+        cache.get('key', lambda: compiled_schema)
+        context_cache = SchemaContextCache()
+
+        # Act
+        with patch('core_parser_app.tools.parser.utils.schema._compiled_schema_cache', cache):
+            context = context_cache.get(compiled_schema.xml_tree)
+            context_cache.clear()
+            other_context = context_cache.get(compiled_schema.xml_tree)
+
+        # Assert
+        self.assertIs(context, compiled_schema.get_context())
+        self.assertIs(context, other_context)
+
+    def test_get_component_resolves_component_once_per_tree_name_and_kind(self):
+        # Arrange
+        cache = SchemaContextCache()
+        xml_tree = XSDTree.build_tree(SCHEMA_WITH_TYPES)
+        resolutions = []
+
+        def resolve():
+            resolutions.append(1)
+            return len(resolutions)
+
+        # Act
+        first_component = cache.get_component(xml_tree, (None, 'base'), 'type', resolve)
+        second_component = cache.get_component(xml_tree, (None, 'base'), 'type', resolve)
+        cache.get_component(xml_tree, (None, 'base'), 'element', resolve)
+        cache.get_component(XSDTree.build_tree(SCHEMA_WITH_TYPES), (None, 'base'), 'type', resolve)
+
+        # Assert
+        self.assertEquals(first_component, second_component)
+        self.assertEquals(len(resolutions), 3)
+
+    @patch('core_parser_app.tools.parser.utils.schema.get_compiled_dependency')
+    def test_get_dependency_tree_compiles_dependency_once_per_parse(self, mock_get_compiled_dependency):
+        # Arrange
+        mock_get_compiled_dependency.return_value = CompiledSchema(SCHEMA_WITH_TYPES, NAMESPACES)
+        cache = SchemaContextCache()
+        # Act
+        first_tree = cache.get_dependency_tree('http://other.org/other.xsd')
+        second_tree = cache.get_dependency_tree('http://other.org/other.xsd')
+        cache.clear()
+        cache.get_dependency_tree('http://other.org/other.xsd')
+        # Assert
+        self.assertIs(first_tree, second_tree)
+        self.assertEquals(mock_get_compiled_dependency.call_count, 2)
+
+
+class TestGetXsdTypesSet(TestCase):
+
+    def test_get_xsd_types_set_returns_prefixed_types(self):
+        # Act
+        xsd_types = get_xsd_types_set('xs')
+        # Assert
+        self.assertIn('xs:string', xsd_types)
+        self.assertNotIn('string', xsd_types)
+
+    def test_get_xsd_types_set_returns_same_set_for_prefix(self):
+        # Act # Assert
+        self.assertIs(get_xsd_types_set('xs'), get_xsd_types_set('xs'))
+        self.assertIsInstance(get_xsd_types_set(''), frozenset)
+
+
+class TestCompiledSchema(TestCase):
+
+    def setUp(self):
+        self.compiled_schema = CompiledSchema(SCHEMA_WITH_TYPES, NAMESPACES)
+
+    def test_compiled_schema_lists_global_components(self):
+        # Assert
+        self.assertEquals([element.attrib['name'] for element in self.compiled_schema.global_elements],
+                          ['root', 'other'])
+        self.assertEquals([element.attrib['name'] for element in self.compiled_schema.complex_types],
+                          ['base', 'derived'])
+        self.assertEquals([element.attrib['name'] for element in self.compiled_schema.simple_types],
+                          ['code', 'base'])
+
+    def test_get_type_returns_complex_type_before_simple_type(self):
+        # Act
+        element_type = self.compiled_schema.get_type('base')
+        # Assert
+        self.assertEquals(element_type.tag, '{http://www.w3.org/2001/XMLSchema}complexType')
+
+    def test_get_type_returns_simple_type(self):
+        # Act
+        element_type = self.compiled_schema.get_type('code')
+        # Assert
+        self.assertEquals(element_type.tag, '{http://www.w3.org/2001/XMLSchema}simpleType')
+
+    def test_get_type_returns_none_if_not_found(self):
+        # Act # Assert
+        self.assertIsNone(self.compiled_schema.get_type('missing'))
+
+    def test_get_component_returns_global_element(self):
+        # Act
+        element = self.compiled_schema.get_component('element', 'other')
+        # Assert
+        self.assertEquals(element.attrib['type'], 'xs:string')
+
+    def test_get_extensions_returns_extending_types(self):
+        # Act
+        extensions = self.compiled_schema.get_extensions('base')
+        # Assert
+        self.assertEquals([extension.attrib['name'] for extension in extensions], ['derived'])
+
+    def test_get_element_by_xpath_returns_element_of_getpath(self):
+        # Arrange
+        element = self.compiled_schema.xml_tree.xpath('/xs:schema/xs:complexType[1]/xs:sequence/xs:element',
+                                                      namespaces=NAMESPACES)[0]
+        # Act
+        result = self.compiled_schema.get_element_by_xpath(self.compiled_schema.xml_tree.getpath(element))
+        # Assert
+        self.assertIs(result, element)
+
+    def test_get_element_by_xpath_evaluates_other_xpaths(self):
+        # Act
+        result = self.compiled_schema.get_element_by_xpath("/xs:schema/xs:element[@name='other']")
+        # Assert
+        self.assertEquals(result.attrib['name'], 'other')
+
+
+class TestCompiledSchemaCache(TestCase):
+
+    def test_get_compiles_schema_once_per_key(self):
+        # Arrange
+        cache = CompiledSchemaCache()
+        # Act
+        first_schema = cache.get('key', lambda: CompiledSchema(SCHEMA_WITH_TYPES, NAMESPACES))
+        second_schema = cache.get('key', lambda: CompiledSchema(SCHEMA_WITH_TYPES, NAMESPACES))
+        # Assert
+        self.assertIs(first_schema, second_schema)
+        self.assertEquals(cache.nb_compilations, 1)
+
+    def test_get_by_tree_returns_compiled_schema_of_tree(self):
+        # Arrange
+        cache = CompiledSchemaCache()
+        compiled_schema = cache.get('key', lambda: CompiledSchema(SCHEMA_WITH_TYPES, NAMESPACES))
+        # Act # Assert
+        self.assertIs(cache.get_by_tree(compiled_schema.xml_tree), compiled_schema)
+        self.assertIs(cache.get_by_tree(compiled_schema.xml_tree.getroot().getroottree()), compiled_schema)
+        self.assertIsNone(cache.get_by_tree(XSDTree.build_tree(SCHEMA_WITH_TYPES)))
+
+    def test_least_recently_used_schema_is_evicted_when_cache_is_full(self):
+        # Arrange
+        cache = CompiledSchemaCache(max_size=2)
+        first_schema = cache.get('first', lambda: CompiledSchema(SCHEMA_WITH_TYPES, NAMESPACES))
+        cache.get('second', lambda: CompiledSchema(SCHEMA_WITH_TYPES, NAMESPACES))
+        cache.get('first', lambda: CompiledSchema(SCHEMA_WITH_TYPES, NAMESPACES))
+        # Act
+        cache.get('third', lambda: CompiledSchema(SCHEMA_WITH_TYPES, NAMESPACES))
+        # Assert
+        self.assertEquals(len(cache), 2)
+        self.assertIs(cache.get_by_tree(first_schema.xml_tree), first_schema)
+        self.assertEquals(cache.nb_compilations, 3)
+
+    def test_get_compiles_schema_without_blocking_other_keys(self):
+        # Arrange
+        cache = CompiledSchemaCache()
+        other_schemas = []
+
+        def compile_schema():
+            # another parse gets another schema while this one is compiled
+            thread = threading.Thread(target=lambda: other_schemas.append(
+                cache.get('other', lambda: CompiledSchema(SCHEMA_WITH_TYPES, NAMESPACES))))
+            thread.start()
+            thread.join(5)
+            return CompiledSchema(SCHEMA_WITH_TYPES, NAMESPACES)
+
+        # Act
+        cache.get('key', compile_schema)
+
+        # Assert
+        self.assertEquals(len(other_schemas), 1)
+        self.assertEquals(len(cache), 2)
@@ -0,0 +1,138 @@
+""" Unit tests for the xml utils
+"""
+from unittest.case import TestCase
+
+from mock import patch
+
+from core_parser_app.tools.parser.utils.xml import get_app_info_options, AppInfoCache, XPathCache
+from xml_utils.xsd_tree.xsd_tree import XSDTree
+
+SCHEMA = '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" xmlns:mdcs="http://mdcs.ns">' \
+         '<xs:element name="root" type="xs:string"><xs:annotation>' \
+         '<xs:documentation>label</xs:documentation>' \
+         '<xs:appinfo><mdcs:label>Label</mdcs:label><!-- comment --><placeholder>Placeholder</placeholder>' \
+         '<mdcs:defaultValue>value</mdcs:defaultValue><mdcs:module>/module?param=1</mdcs:module></xs:appinfo>' \
+         '<xs:appinfo><mdcs:tooltip>Tooltip</mdcs:tooltip></xs:appinfo>' \
+         '</xs:annotation></xs:element>' \
+         '<xs:element name="other" type="xs:string"/>' \
+         '</xs:schema>'
+NAMESPACES = {'xs': 'http://www.w3.org/2001/XMLSchema', 'mdcs': 'http://mdcs.ns'}
+
+
+class TestGetAppInfoOptions(TestCase):
+
+    def setUp(self):
+        self.root, self.other = XSDTree.build_tree(SCHEMA).getroot()
+
+    def test_get_app_info_options_returns_options_of_all_app_info(self):
+        # Act
+        app_info = get_app_info_options(self.root)
+        # Assert
+        self.assertEquals(app_info, {'label': 'Label', 'placeholder': 'Placeholder', 'module': '/module?param=1',
+                                     'tooltip': 'Tooltip'})
+
+    def test_get_app_info_options_returns_empty_dict_without_annotation(self):
+        # Act # Assert
+        self.assertEquals(get_app_info_options(self.other), {})
+
+
+class TestAppInfoCache(TestCase):
+
+    def setUp(self):
+        self.root, self.other = XSDTree.build_tree(SCHEMA).getroot()
+
+    @patch('core_parser_app.tools.parser.utils.xml.get_app_info_options')
+    def test_get_app_info_options_parses_element_once(self, mock_get_app_info_options):
+        # Arrange
+        mock_get_app_info_options.return_value = {'label': 'Label'}
+        cache = AppInfoCache()
+        # Act
+        first_app_info = cache.get_app_info_options(self.root)
+        second_app_info = cache.get_app_info_options(self.root)
+        # Assert
+        self.assertIs(first_app_info, second_app_info)
+        self.assertEquals(mock_get_app_info_options.call_count, 1)
+
+    @patch('core_parser_app.components.module.api.is_registered_url')
+    def test_get_module_url_checks_module_once(self, mock_is_registered_url):
+        # Arrange
+        mock_is_registered_url.return_value = True
+        cache = AppInfoCache()
+        # Act
+        first_url = cache.get_module_url(self.root)
+        second_url = cache.get_module_url(self.root)
+        # Assert
+        self.assertEquals(first_url.path, '/module')
+        self.assertIs(first_url, second_url)
+        self.assertEquals(mock_is_registered_url.call_count, 1)
+
+    @patch('core_parser_app.components.module.api.is_registered_url')
+    def test_get_module_url_returns_none_without_module(self, mock_is_registered_url):
+        # Arrange
+        cache = AppInfoCache()
+        # Act # Assert
+        self.assertIsNone(cache.get_module_url(self.other))
+        self.assertFalse(mock_is_registered_url.called)
+
+    def test_clear_removes_elements(self):
+        # Arrange
+        cache = AppInfoCache()
+        cache.get_app_info_options(self.root)
+        cache.get_app_info_options(self.other)
+        # Act
+        cache.clear()
+        # Assert
+        self.assertEquals(len(cache), 0)
+
+
+class TestXPathCache(TestCase):
+
+    def setUp(self):
+        self.xml_tree = XSDTree.build_tree(SCHEMA)
+
+    def test_xpath_returns_same_nodes_as_lxml(self):
+        # Arrange
+        cache = XPathCache()
+        xpath = "/xs:schema/xs:element[@name='root']//mdcs:label"
+        # Act
+        result = cache.xpath(self.xml_tree, xpath, NAMESPACES)
+        # Assert
+        self.assertEquals(result, self.xml_tree.xpath(xpath, namespaces=NAMESPACES))
+        self.assertEquals(len(result), 1)
+
+    def test_get_compiles_expression_once_per_namespaces(self):
+        # Arrange
+        cache = XPathCache()
+        # Act
+        first_expression = cache.get('/xs:schema', NAMESPACES)
+        second_expression = cache.get('/xs:schema', dict(NAMESPACES))
+        cache.get('/xs:schema', {'xs': 'http://other.org'})
+        # Assert
+        self.assertIs(first_expression, second_expression)
+        self.assertEquals(cache.hits, 1)
+        self.assertEquals(cache.misses, 2)
+
+    def test_least_recently_used_expression_is_evicted_when_cache_is_full(self):
+        # Arrange
+        cache = XPathCache(max_size=2)
+        first_expression = cache.get('/first')
+        cache.get('/second')
+        cache.get('/first')
+        # Act
+        cache.get('/third')
+        # Assert
+        self.assertEquals(len(cache), 2)
+        self.assertIs(cache.get('/first'), first_expression)
+        cache.get('/second')
+        self.assertEquals(cache.misses, 4)
+
+    def test_clear_removes_expressions_and_resets_counters(self):
+        # Arrange
+        cache = XPathCache()
+        cache.get('/first')
+        cache.get('/first')
+        # Act
+        cache.clear()
+        # Assert
+        self.assertEquals(len(cache), 0)
+        self.assertEquals((cache.hits, cache.misses), (0, 0))
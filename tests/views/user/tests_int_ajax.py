@@ -0,0 +1,68 @@
+""" Integration tests for the user AJAX views
+"""
+import json
+
+from bson.objectid import ObjectId
+from django.test import RequestFactory
+from mock import patch
+
+from core_main_app.utils.integration_tests.integration_base_test_case import MongoIntegrationBaseTestCase
+from core_parser_app.components.data_structure_element import api as data_structure_element_api
+from core_parser_app.views.user import ajax as user_ajax
+from tests.components.data_structure_element.fixtures.fixtures import DataStructureElementMultipleLevelsFixture
+
+
+class TestSaveDataStructureElementValues(MongoIntegrationBaseTestCase):
+    fixture = DataStructureElementMultipleLevelsFixture()
+
+    def _post(self, values):
+        request = RequestFactory().post('/data-structure-element/values', {'values': json.dumps(values)})
+        return user_ajax.save_data_structure_element_values(request)
+
+    def test_save_returns_replaced_values(self):
+        # Arrange
+        first_id = str(self.fixture.data_structure_element_1_1_1.id)
+        second_id = str(self.fixture.data_structure_element_2.id)
+        # Act
+        response = self._post([{'id': first_id, 'value': 'new_1_1_1'}, {'id': second_id, 'value': 'new_2'}])
+        # Assert
+        self.assertEqual(json.loads(response.content), {'values': [{'id': first_id, 'replaced': 'value_1_1_1'},
+                                                                   {'id': second_id, 'replaced': 'value_2'}]})
+        self.assertEqual(data_structure_element_api.get_by_id(first_id).value, 'new_1_1_1')
+
+    def test_save_reports_error_of_each_invalid_item(self):
+        # Arrange
+        element_id = str(self.fixture.data_structure_element_2.id)
+        unknown_id = str(ObjectId())
+        # Act
+        response = self._post([{'id': 'invalid', 'value': 'new'}, {'id': element_id},
+                               {'id': unknown_id, 'value': 'new'}, {'id': element_id, 'value': 'new_2'},
+                               {'id': element_id, 'value': 'other'}])
+        # Assert
+        results = json.loads(response.content)['values']
+        self.assertEqual([result['id'] for result in results],
+                         ['invalid', element_id, unknown_id, element_id, element_id])
+        self.assertEqual(['error' in result for result in results], [True, True, True, False, True])
+        self.assertEqual(data_structure_element_api.get_by_id(element_id).value, 'new_2')
+
+    def test_save_sends_one_write(self):
+        # Act
+        with patch.object(data_structure_element_api.DataStructureElement, 'update_values',
+                          return_value={}) as mock_update_values:
+            self._post([{'id': str(ObjectId()), 'value': 'value'} for _ in range(10)])
+        # Assert
+        self.assertEqual(mock_update_values.call_count, 1)
+
+    def test_save_too_many_values_returns_bad_request(self):
+        # Act
+        with patch.object(user_ajax, 'PARSER_MAX_SAVED_VALUES', 2):
+            response = self._post([{'id': str(ObjectId()), 'value': 'value'} for _ in range(3)])
+        # Assert
+        self.assertEqual(response.status_code, 400)
+
+    def test_save_invalid_json_returns_bad_request(self):
+        # Act
+        request = RequestFactory().post('/data-structure-element/values', {'values': '[{'})
+        response = user_ajax.save_data_structure_element_values(request)
+        # Assert
+        self.assertEqual(response.status_code, 400)